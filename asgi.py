@@ -0,0 +1,195 @@
+"""
+Native ASGI application for the Discord interactions endpoint.
+
+This serves the same endpoints as the Flask app in ``main`` (same verification,
+same PING and APPLICATION_COMMAND handling, same ``/metrics`` scrape endpoint)
+without Flask's per-request event loop, so the async handlers in
+``trophybot.bot`` share one long-lived loop.
+Run it with an ASGI server, for example::
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+
+``python main.py`` still starts the Flask app as a compatibility mode.
+"""
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import main
+from trophybot import history, metrics
+
+MAX_BODY_SIZE = main.MAX_BODY_SIZE
+
+
+class _Headers:
+    """Case-insensitive read-only view over ASGI header pairs."""
+
+    __slots__ = ("_headers",)
+
+    def __init__(self, raw_headers):
+        """Index the ``(name, value)`` byte pairs from an ASGI scope."""
+        self._headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in raw_headers
+        }
+
+    def get(self, name, default=None):
+        """Return the header value for ``name``, or ``default``."""
+        return self._headers.get(name.lower(), default)
+
+
+class _Request:
+    """Minimal request object accepted by ``main._verify_discord_request``."""
+
+    __slots__ = ("headers", "_body")
+
+    def __init__(self, headers, body):
+        """Wrap already-read request headers and body bytes."""
+        self.headers = headers
+        self._body = body
+
+    def get_data(self):
+        """Return the raw request body."""
+        return self._body
+
+
+async def _read_body(receive):
+    """Read the request body, returning None once it exceeds MAX_BODY_SIZE."""
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+async def _send_response(send, result, headers=None):
+    """Send a view-style result: a JSON dict or a ``(text, status)`` tuple."""
+    if isinstance(result, tuple):
+        text, status = result
+        body = text.encode()
+        content_type = b"text/plain; charset=utf-8"
+    else:
+        status = 200
+        body = json.dumps(result).encode()
+        content_type = b"application/json"
+    await _send_body(send, status, body, content_type, headers)
+
+
+async def _send_body(send, status, body, content_type, headers=None):
+    raw_headers = [
+        (b"content-type", content_type),
+        (b"content-length", str(len(body)).encode()),
+    ]
+    if headers:
+        raw_headers.extend(
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers.items()
+        )
+    await send(
+        {"type": "http.response.start", "status": status, "headers": raw_headers}
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _interactions(scope, receive, send, application_id=None):
+    """Verify and dispatch one POST to the interactions endpoint."""
+    headers = _Headers(scope["headers"])
+    content_len_str = headers.get("Content-Length")
+    if content_len_str and content_len_str.isdigit():
+        too_large = int(content_len_str) > MAX_BODY_SIZE
+    else:
+        too_large = False
+    if too_large:
+        # The shared checks answer from the headers alone (404 for an unknown
+        # application, else 401 or 413), so the body is never read.
+        body = b""
+    else:
+        body = await _read_body(receive)
+        if body is None:
+            metrics.verifications.inc("too_large")
+            metrics.requests.inc(413)
+            return await _send_response(send, ("Payload too large", 413))
+
+    result, extra_headers = await main._serve_interaction(
+        _Request(headers, body), application_id
+    )
+    return await _send_response(send, result, extra_headers)
+
+
+async def _metrics(scope, receive, send):
+    """Serve metrics in Prometheus text format."""
+    body = metrics.registry.render().encode()
+    return await _send_body(send, 200, body, metrics.CONTENT_TYPE.encode())
+
+
+async def _history_export(scope, receive, send):
+    """Stream the roll history as NDJSON, reading each page off the event loop."""
+    failure = main._check_admin(_Headers(scope["headers"]))
+    if failure:
+        return await _send_response(send, failure)
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    chunks = history.store.export((query.get("channel") or [None])[0])
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", main.NDJSON.encode())],
+        }
+    )
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+# (path, method) -> handler
+_ROUTES = {
+    ("/", "POST"): _interactions,
+    ("/metrics", "GET"): _metrics,
+    ("/history/export", "GET"): _history_export,
+}
+_PATHS = frozenset(path for path, _ in _ROUTES)
+# POST /interactions/<application id> serves one of several applications.
+_APPLICATION_PREFIX = "/interactions/"
+
+
+async def app(scope, receive, send):
+    """ASGI entry point for Discord interactions."""
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return None
+    handler = _ROUTES.get((scope["path"], scope["method"]))
+    if handler is not None:
+        return await handler(scope, receive, send)
+    path = scope["path"]
+    prefix, _, application_id = path.rpartition("/")
+    if prefix + "/" == _APPLICATION_PREFIX and application_id:
+        if scope["method"] == "POST":
+            return await _interactions(scope, receive, send, application_id)
+        return await _send_response(send, ("Method Not Allowed", 405))
+    if path in _PATHS:
+        return await _send_response(send, ("Method Not Allowed", 405))
+    return await _send_response(send, ("Not Found", 404))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare the buffered dice engine against the per-die ``secrets`` path, and
+face lists against face-count histograms for large pools.
+
+Usage: ``python benchmarks/bench_dice.py [--repeat N]``
+"""
+
+import argparse
+import os
+import secrets
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from trophybot.dice import roll_histogram, roll_pool  # noqa: E402
+
+POOL_SIZES = (1, 3, 6, 20, 100, 1000)
+LARGE_POOL_SIZES = (1_000, 100_000, 1_000_000)
+
+
+def per_die_roll_pool(n: int) -> list:
+    """Roll a pool with one ``secrets.randbelow`` call per die (the old path)."""
+    return [secrets.randbelow(6) + 1 for _ in range(n)]
+
+
+def _dice_per_second(func, n: int, repeat: int) -> float:
+    number = max(1, 20_000 // n)
+    best = min(timeit.repeat(lambda: func(n), number=number, repeat=repeat))
+    return n * number / best
+
+
+def _peak_bytes(func, n: int) -> int:
+    tracemalloc.start()
+    func(n)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    """Print dice-per-second throughput for both engines at several pool sizes."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pool':>6} {'per-die dice/s':>16} {'buffered dice/s':>16} {'speedup':>8}")
+    for n in POOL_SIZES:
+        old = _dice_per_second(per_die_roll_pool, n, args.repeat)
+        new = _dice_per_second(roll_pool, n, args.repeat)
+        print(f"{n:>6} {old:>16,.0f} {new:>16,.0f} {new / old:>7.1f}x")
+
+    print()
+    print(f"{'pool':>9} {'list peak KiB':>14} {'histogram peak KiB':>19}")
+    for n in LARGE_POOL_SIZES:
+        list_peak = _peak_bytes(roll_pool, n) / 1024
+        histogram_peak = _peak_bytes(roll_histogram, n) / 1024
+        print(f"{n:>9,} {list_peak:>14,.0f} {histogram_peak:>19,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Measure in-process request latency with request logging on and off.
+
+"on" runs at DEBUG with records written to /dev/null by the writer thread;
+"off" runs at the production default (WARNING).
+
+Usage: ``python benchmarks/bench_logging.py [--requests N]``
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from nacl.signing import SigningKey
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import main as server  # noqa: E402
+from trophybot import log  # noqa: E402
+from trophybot.ratelimit import RateLimiter  # noqa: E402
+
+SIGNING_KEY = SigningKey.generate()
+BODY = json.dumps(
+    {
+        "type": 2,
+        "data": {
+            "name": "roll",
+            "options": [{"name": "light", "value": 2}, {"name": "dark", "value": 3}],
+        },
+    }
+).encode()
+
+
+def _headers():
+    timestamp = str(int(time.time()))
+    return {
+        "X-Signature-Ed25519": SIGNING_KEY.sign(
+            timestamp.encode() + BODY
+        ).signature.hex(),
+        "X-Signature-Timestamp": timestamp,
+        "Content-Type": "application/json",
+    }
+
+
+def _run(level: str, requests: int) -> list:
+    log.stop()
+    with open(os.devnull, "w") as devnull:
+        log.configure(level, stream=devnull)
+        client = server.app.test_client()
+        latencies = []
+        for _ in range(requests):
+            headers = _headers()
+            start = time.perf_counter()
+            resp = client.post("/", data=BODY, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert resp.status_code == 200
+        log.stop()
+    return sorted(latencies)
+
+
+def main():
+    """Print mean and p99 request latency with logging on and off."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+
+    server.VERIFY_KEY = SIGNING_KEY.verify_key
+    server.limiter = RateLimiter()  # Measure logging, not the rate limiter
+    _run("WARNING", 200)  # warm up
+    for label, level in (("off", "WARNING"), ("on", "DEBUG")):
+        latencies = _run(level, args.requests)
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(
+            f"logging {label:>3} ({level:<7}): "
+            f"mean {statistics.fmean(latencies) * 1e6:8.1f} µs  "
+            f"p99 {p99 * 1e6:8.1f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
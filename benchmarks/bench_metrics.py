@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of recording metrics on the request path.
+
+Compares the per-thread shards in ``trophybot.metrics`` with a single
+lock-protected dict, for counter increments and histogram observations, from
+one thread and from several threads at once.
+
+Usage: ``python benchmarks/bench_metrics.py [--operations N] [--threads T]``
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from trophybot.metrics import MetricsRegistry  # noqa: E402
+
+
+class LockedCounter:
+    """A counter guarded by one global lock (the approach the shards avoid)."""
+
+    def __init__(self):
+        """Start with no counts."""
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def inc(self, *labels, amount=1):
+        """Add ``amount`` under the lock."""
+        with self._lock:
+            self._counts[labels] = self._counts.get(labels, 0) + amount
+
+
+def _ns_per_op(record, operations: int, threads: int) -> float:
+    per_thread = operations // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(per_thread):
+            record()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def main():
+    """Print nanoseconds per recorded metric for each approach."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--operations", type=int, default=400_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "Bench.", ["command"])
+    histogram = registry.histogram("bench_seconds", "Bench.", ["command"])
+    locked = LockedCounter()
+    cases = {
+        "locked counter": lambda: locked.inc("roll"),
+        "sharded counter": lambda: counter.inc("roll"),
+        "sharded histogram": lambda: histogram.observe(0.0012, "roll"),
+    }
+
+    print(f"{'case':>18} {'threads':>8} {'ns/op':>8}")
+    for name, record in cases.items():
+        for threads in (1, args.threads):
+            ns = _ns_per_op(record, args.operations, threads)
+            print(f"{name:>18} {threads:>8} {ns:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
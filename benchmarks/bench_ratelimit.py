@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Measure the per-request cost of the user and guild rate limiter.
+
+Times ``RateLimiter.check`` for interactions spread over a steady set of users
+(every lookup hits an existing bucket) and for a stream of new users larger
+than the bucket cap (every lookup creates a bucket and evicts the idlest one).
+Limits are set high enough that no request is refused, so the figures are the
+overhead every admitted command pays.
+
+Usage: ``python benchmarks/bench_ratelimit.py [--requests N]``
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from trophybot.commands import Interaction  # noqa: E402
+from trophybot.ratelimit import RateLimiter, TokenBucketLimiter  # noqa: E402
+
+
+def _interactions(count: int, users: int, guilds: int):
+    return [
+        Interaction.from_payload(
+            {
+                "type": 2,
+                "guild_id": str(i % guilds),
+                "member": {"user": {"id": str(i % users)}},
+                "data": {"name": "roll"},
+            }
+        )
+        for i in range(count)
+    ]
+
+
+def _limiter(max_entries: int) -> RateLimiter:
+    return RateLimiter(
+        user=TokenBucketLimiter(1e9, 1e9, max_entries),
+        guild=TokenBucketLimiter(1e9, 1e9, max_entries),
+    )
+
+
+def _ns_per_check(limiter: RateLimiter, interactions) -> float:
+    check = limiter.check
+    start = time.perf_counter()
+    for interaction in interactions:
+        check(interaction)
+    return (time.perf_counter() - start) / len(interactions) * 1e9
+
+
+def main():
+    """Print nanoseconds per rate-limit check in each case."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+
+    cases = {
+        "1k users, 100 guilds (hits)": (_limiter(10_000), 1_000, 100),
+        "new user every request (evicts)": (_limiter(10_000), args.requests, 100),
+    }
+    print(f"{'case':>32} {'ns/check':>9}")
+    for name, (limiter, users, guilds) in cases.items():
+        interactions = _interactions(args.requests, users, guilds)
+        print(f"{name:>32} {_ns_per_check(limiter, interactions):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare the dice backends: the secure default, the seeded PRNG, and the secure
+default wrapped in a recorder (with a recording active, as in a recorded
+interaction).
+
+Usage: ``python benchmarks/bench_rng.py [--repeat N]``
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from trophybot.dice import (  # noqa: E402
+    EntropyPool,
+    RecordingBackend,
+    SeededPool,
+    recording,
+    roll_pool,
+)
+
+POOL_SIZES = (1, 5, 100, 10_000)
+
+
+def _dice_per_second(backend, n: int, repeat: int) -> float:
+    number = max(1, 50_000 // n)
+    with recording():
+        best = min(
+            timeit.repeat(
+                lambda: roll_pool(n, backend=backend), number=number, repeat=repeat
+            )
+        )
+    return n * number / best
+
+
+def main():
+    """Print dice-per-second throughput for each backend at several pool sizes."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = {
+        "secure": EntropyPool(clear_at_fork=False),
+        "seeded": SeededPool(1),
+        "recording": RecordingBackend(EntropyPool(clear_at_fork=False)),
+    }
+    header = " ".join(f"{name + ' dice/s':>18}" for name in backends)
+    print(f"{'pool':>6} {header}")
+    for n in POOL_SIZES:
+        rates = " ".join(
+            f"{_dice_per_second(backend, n, args.repeat):>18,.0f}"
+            for backend in backends.values()
+        )
+        print(f"{n:>6} {rates}")
+
+
+if __name__ == "__main__":
+    main()
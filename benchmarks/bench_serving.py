@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Compare serving modes for the interactions endpoint under concurrent load.
+
+Each mode is started as a local server process with a throwaway Ed25519 key,
+then driven over HTTP with ``/roll`` interactions, each signed as it is sent;
+the ``shed`` column counts replies admission control turned away.
+
+Modes: ``flask`` (the Flask development server, ``python main.py``), ``asgi``
+(uvicorn), and ``gunicorn`` / ``gunicorn-asgi`` (the production configuration in
+``gunicorn.conf.py``).
+
+Usage: ``python benchmarks/bench_serving.py [--modes flask gunicorn] [--requests N]``
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+from nacl.signing import SigningKey
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import loadgen  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODES = {
+    "flask": [sys.executable, "main.py"],
+    "asgi": [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "asgi:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        "{port}",
+        "--log-level",
+        "warning",
+    ],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+}
+MODES["gunicorn-asgi"] = MODES["gunicorn"]
+
+# Extra environment per mode.
+MODE_ENV = {"gunicorn-asgi": {"TROPHYBOT_ASGI": "1"}}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(mode: str, port: int, public_key: str) -> subprocess.Popen:
+    env = dict(os.environ, DISCORD_PUBLIC_KEY=public_key, PORT=str(port))
+    # The load comes from a handful of synthetic users; measure serving, not
+    # the rate limiter.
+    env.update(TROPHYBOT_USER_RATE="0", TROPHYBOT_GUILD_RATE="0")
+    env.update(MODE_ENV.get(mode, {}))
+    command = [part.format(port=port) for part in MODES[mode]]
+    return subprocess.Popen(
+        command,
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def _wait_ready(url: str, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.post(url, data=b""):
+                    return
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def run_mode(mode: str, total: int, concurrency: int) -> dict:
+    """Start ``mode`` and return throughput and latency figures for it."""
+    signing_key = SigningKey.generate()
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/"
+    server = _start_server(mode, port, signing_key.verify_key.encode().hex())
+    try:
+        asyncio.run(_wait_ready(url))
+        requests = loadgen.build_requests(total, ["roll_light_dark"])
+        elapsed, results = loadgen.run_http(url, signing_key, requests, concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+    summary = loadgen.summarize(elapsed, results)
+    return {
+        "mode": mode,
+        "rps": total / elapsed,
+        "shed": summary["shed"],
+        **summary["stages"]["total"],
+    }
+
+
+def main():
+    """Benchmark each requested serving mode and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    print(
+        f"{'mode':>13} {'req/s':>9} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} "
+        f"{'shed':>6}"
+    )
+    for mode in args.modes:
+        result = run_mode(mode, args.requests, args.concurrency)
+        print(
+            f"{result['mode']:>13} {result['rps']:>9.0f} {result['mean_ms']:>9.2f} "
+            f"{result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['shed']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Measure the cost of request tracing: a span with tracing off (no active trace)
+and on, and a whole in-process /roll request with Server-Timing off and on.
+
+Usage: ``python benchmarks/bench_tracing.py [--number N]``
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from nacl.signing import SigningKey  # noqa: E402
+
+import main as server  # noqa: E402
+from trophybot import tracing  # noqa: E402
+from trophybot.ratelimit import RateLimiter  # noqa: E402
+
+
+class _Request:
+    def __init__(self, headers, body):
+        self.headers = headers
+        self._body = body
+
+    def get_data(self):
+        return self._body
+
+
+def _span_ns(number: int) -> float:
+    def run():
+        with tracing.span("dice"):
+            pass
+
+    return min(timeit.repeat(run, number=number, repeat=5)) / number * 1e9
+
+
+def _request_us(number: int) -> float:
+    key = SigningKey.generate()
+    server.VERIFY_KEY = key.verify_key
+    server.limiter = RateLimiter()  # Measure tracing, not the rate limiter
+    requests = []
+    for i in range(number):
+        body = json.dumps(
+            {
+                "type": 2,
+                "id": f"bench-{time.time_ns()}-{i}",
+                "data": {"name": "roll", "options": [{"name": "light", "value": 3}]},
+            }
+        ).encode()
+        timestamp = str(int(time.time()))
+        signature = key.sign(timestamp.encode() + body).signature.hex()
+        headers = {
+            "X-Signature-Ed25519": signature,
+            "X-Signature-Timestamp": timestamp,
+        }
+        requests.append(_Request(headers, body))
+
+    async def run():
+        start = time.perf_counter()
+        for request in requests:
+            await server._serve_interaction(request)
+        return time.perf_counter() - start
+
+    return asyncio.run(run()) / number * 1e6
+
+
+def main():
+    """Print per-span and per-request costs with tracing off and on."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"span, no trace:    {_span_ns(args.number * 100):8.1f} ns")
+    with tracing.trace():
+        print(f"span, in a trace:  {_span_ns(args.number * 100):8.1f} ns")
+    for enabled in (False, True, False, True):
+        tracing.enabled = enabled
+        label = "on " if enabled else "off"
+        print(f"request, timing {label}: {_request_us(args.number):8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
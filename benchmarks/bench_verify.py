@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark Discord signature verification before and after key caching.
+
+Usage: ``python benchmarks/bench_verify.py [--number N]``
+"""
+
+import argparse
+import json
+import os
+import timeit
+
+from nacl.signing import SigningKey, VerifyKey
+
+SIGNING_KEY = SigningKey.generate()
+PUBLIC_KEY_HEX = SIGNING_KEY.verify_key.encode().hex()
+TIMESTAMP = "1700000000"
+BODY = json.dumps(
+    {
+        "type": 2,
+        "data": {
+            "name": "roll",
+            "options": [{"name": "light", "value": 2}, {"name": "dark", "value": 3}],
+        },
+    }
+).encode()
+SIGNATURE_HEX = SIGNING_KEY.sign(TIMESTAMP.encode() + BODY).signature.hex()
+os.environ["DISCORD_PUBLIC_KEY"] = PUBLIC_KEY_HEX
+CACHED_KEY = VerifyKey(bytes.fromhex(PUBLIC_KEY_HEX))
+
+
+def verify_per_request():
+    """Verify as the handler used to: rebuild the key and round-trip the body."""
+    public_key = os.environ.get("DISCORD_PUBLIC_KEY")
+    body = BODY.decode()
+    verify_key = VerifyKey(bytes.fromhex(public_key))
+    message = f"{TIMESTAMP}{body}".encode()
+    verify_key.verify(bytes.fromhex(SIGNATURE_HEX) + message)
+
+
+def verify_cached():
+    """Verify with the startup key over the raw body bytes."""
+    CACHED_KEY.verify(TIMESTAMP.encode() + BODY, bytes.fromhex(SIGNATURE_HEX))
+
+
+def main():
+    """Print per-call verification cost for both paths."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, func in (("per-request", verify_per_request), ("cached", verify_cached)):
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        results[name] = best / args.number * 1e6
+        print(f"{name:>12}: {results[name]:8.2f} µs/request")
+    saved = results["per-request"] - results["cached"]
+    print(f"{'saved':>12}: {saved:8.2f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Report what ``main.py`` spends its import time on.
+
+Runs ``python -X importtime`` in a fresh interpreter, then prints the total
+start-up time of the entry point and the modules with the largest cumulative
+import cost.
+
+Usage: ``python benchmarks/import_profile.py [--target "import main"] [--top N]``
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def profile_imports(target: str) -> list:
+    """Return ``(self_us, cumulative_us, module)`` rows for ``target``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", target],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        rows.append((int(self_us), int(cumulative_us), module.rstrip()))
+    return rows
+
+
+def main():
+    """Print the import-time report."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target", default="import main; main.app")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile_imports(args.target)
+    top_level = [row for row in rows if not row[2].startswith("  ")]
+    total_ms = sum(row[1] for row in top_level) / 1000
+    print(f"{args.target!r}: {total_ms:.1f} ms of imports")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for self_us, cumulative_us, module in sorted(rows, key=lambda r: -r[1])[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Signed-interaction load generator and end-to-end latency benchmark.
+
+Generates a local Ed25519 keypair, builds realistic signed PING and ``/roll``
+payloads covering every branch of ``trophybot.bot._roll_command``, and drives
+the interactions endpoint with configurable concurrency. Everything runs
+offline.
+
+Each request is signed just before it is sent, so admission control sees its
+real age; replies that admission control shed anyway are counted separately.
+
+In-process mode (the default) pushes each request through
+``main._process_interaction``, the same path as ``main.interactions``
+(deduplication, admission control and metrics included), inside a Flask
+request context and traced, so it reports the time in each traced stage
+(verification, parsing, dispatch, the handler and dice; later stages nest in
+earlier ones) plus rendering the response. HTTP mode posts to a running
+server and reports end-to-end latency; start the server with the public key
+printed by ``--print-public-key`` (pass the same ``--seed``)::
+
+    python benchmarks/loadgen.py --seed 01...ff --print-public-key
+    DISCORD_PUBLIC_KEY=<key> python main.py &
+    python benchmarks/loadgen.py --seed 01...ff --url http://127.0.0.1:8080/
+
+Usage: ``python benchmarks/loadgen.py [--requests N] [--concurrency C] [--json]``
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from nacl.signing import SigningKey
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+STAGES = ("verify", "parse", "dispatch", "handler", "dice", "response")
+
+# One payload per branch of _roll_command, plus PING and a batched /dice roll
+# equivalent to five roll_light_dark interactions.
+SCENARIOS: Dict[str, dict] = {
+    "ping": {"type": 1},
+    "roll_single": {"type": 2, "data": {"name": "roll"}},
+    "roll_light": {
+        "type": 2,
+        "data": {"name": "roll", "options": [{"name": "light", "value": 3}]},
+    },
+    "roll_light_zero": {
+        "type": 2,
+        "data": {"name": "roll", "options": [{"name": "light", "value": 0}]},
+    },
+    "roll_dark": {
+        "type": 2,
+        "data": {"name": "roll", "options": [{"name": "dark", "value": 2}]},
+    },
+    "roll_dark_zero": {
+        "type": 2,
+        "data": {"name": "roll", "options": [{"name": "dark", "value": 0}]},
+    },
+    "roll_light_dark": {
+        "type": 2,
+        "data": {
+            "name": "roll",
+            "options": [{"name": "light", "value": 2}, {"name": "dark", "value": 3}],
+        },
+    },
+    "roll_light_zero_dark": {
+        "type": 2,
+        "data": {
+            "name": "roll",
+            "options": [{"name": "light", "value": 0}, {"name": "dark", "value": 2}],
+        },
+    },
+    "roll_light_dark_zero": {
+        "type": 2,
+        "data": {
+            "name": "roll",
+            "options": [{"name": "light", "value": 2}, {"name": "dark", "value": 0}],
+        },
+    },
+    "dice_batch": {
+        "type": 2,
+        "data": {
+            "name": "dice",
+            "options": [{"name": "expr", "value": "2L3D x5"}],
+        },
+    },
+}
+
+
+def _add_interaction_fields(payload: dict, index: int) -> dict:
+    """Fill in the envelope fields Discord sends with every interaction."""
+    payload = dict(payload)
+    payload.update(
+        {
+            "id": str(1_100_000_000_000_000_000 + index),
+            "application_id": "1000000000000000001",
+            "token": f"loadgen-token-{index}",
+            "version": 1,
+        }
+    )
+    if payload["type"] == 2:
+        payload.update(
+            {
+                "guild_id": "1000000000000000002",
+                "channel_id": "1000000000000000003",
+                "member": {"user": {"id": str(1_000_000_000_000_000_100 + index % 50)}},
+            }
+        )
+    return payload
+
+
+class PreparedRequest:
+    """A pre-serialized interaction, signed when it is sent."""
+
+    __slots__ = ("scenario", "body")
+
+    def __init__(self, scenario: str, body: bytes):
+        """Store the scenario name and raw body."""
+        self.scenario = scenario
+        self.body = body
+
+
+class SignedRequest:
+    """A pre-serialized, signed interaction ready to send."""
+
+    __slots__ = ("scenario", "body", "headers")
+
+    def __init__(self, scenario: str, body: bytes, headers: Dict[str, str]):
+        """Store the scenario name, raw body and Discord headers."""
+        self.scenario = scenario
+        self.body = body
+        self.headers = headers
+
+
+def sign(signing_key: SigningKey, prepared: PreparedRequest) -> SignedRequest:
+    """Sign ``prepared`` the way Discord does, timestamped now."""
+    body = prepared.body
+    timestamp = str(int(time.time()))
+    signature = signing_key.sign(timestamp.encode() + body).signature.hex()
+    headers = {
+        "X-Signature-Ed25519": signature,
+        "X-Signature-Timestamp": timestamp,
+        "Content-Type": "application/json",
+        "Content-Length": str(len(body)),
+    }
+    return SignedRequest(prepared.scenario, body, headers)
+
+
+def build_requests(
+    total: int, scenarios: Optional[List[str]] = None
+) -> List[PreparedRequest]:
+    """Build ``total`` unsigned requests cycling through ``scenarios``."""
+    names = scenarios or list(SCENARIOS)
+    return [
+        PreparedRequest(
+            names[i % len(names)],
+            json.dumps(
+                _add_interaction_fields(SCENARIOS[names[i % len(names)]], i)
+            ).encode(),
+        )
+        for i in range(total)
+    ]
+
+
+def _run_in_process_request(server, loop, signed: SignedRequest) -> Dict[str, float]:
+    """Run one request through ``main._process_interaction``, traced."""
+    from flask import request
+
+    from trophybot import tracing
+
+    with server.app.test_request_context(
+        "/", method="POST", data=signed.body, headers=signed.headers
+    ):
+        with tracing.trace() as trace:
+            result = loop.run_until_complete(server._process_interaction(request))
+        start = time.perf_counter()
+        if isinstance(result, tuple):
+            raise RuntimeError(f"{signed.scenario}: request failed: {result}")
+        response = server.app.make_response(result)
+        response.get_data()
+        end = time.perf_counter()
+    # trace() records the total when the block exits.
+    assert trace.total is not None
+    timings = dict(trace.durations)
+    timings["response"] = end - start
+    timings["total"] = trace.total + timings["response"]
+    if result is server.BUSY_RESPONSE:
+        timings["shed"] = 1.0
+    return timings
+
+
+def run_in_process(
+    signing_key: SigningKey, requests: List[PreparedRequest], concurrency: int
+) -> Tuple[float, List[Dict[str, float]]]:
+    """Drive ``main.app`` in-process with ``concurrency`` worker threads."""
+    import main as server
+    from trophybot.ratelimit import RateLimiter
+
+    server.VERIFY_KEY = signing_key.verify_key
+    # The load comes from a handful of synthetic users; measure the pipeline,
+    # not the rate limiter.
+    server.limiter = RateLimiter()
+    local = threading.local()
+
+    def worker(prepared):
+        loop = getattr(local, "loop", None)
+        if loop is None:
+            loop = local.loop = asyncio.new_event_loop()
+        return _run_in_process_request(server, loop, sign(signing_key, prepared))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, requests))
+    return time.perf_counter() - start, results
+
+
+async def _drive_http(
+    url: str,
+    signing_key: SigningKey,
+    requests: List[PreparedRequest],
+    concurrency: int,
+):
+    import aiohttp
+
+    from main import BUSY_RESPONSE
+
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    results = []
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def one(prepared):
+            async with semaphore:
+                signed = sign(signing_key, prepared)
+                start = time.perf_counter()
+                async with session.post(
+                    url, data=signed.body, headers=signed.headers
+                ) as resp:
+                    body = await resp.read()
+                    if resp.status != 200:
+                        raise RuntimeError(
+                            f"{signed.scenario}: unexpected status {resp.status}"
+                        )
+                result = {"total": time.perf_counter() - start}
+                if json.loads(body) == BUSY_RESPONSE:
+                    result["shed"] = 1.0
+                results.append(result)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(signed) for signed in requests))
+        elapsed = time.perf_counter() - start
+    return elapsed, results
+
+
+def run_http(
+    url: str,
+    signing_key: SigningKey,
+    requests: List[PreparedRequest],
+    concurrency: int,
+) -> Tuple[float, List[Dict[str, float]]]:
+    """Sign and post ``requests`` to a running server at ``url``."""
+    return asyncio.run(_drive_http(url, signing_key, requests, concurrency))
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Return the ``pct`` percentile of already-sorted values."""
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+def summarize(elapsed: float, results: List[Dict[str, float]]) -> dict:
+    """Compute throughput and per-stage latency percentiles in milliseconds."""
+    summary: Dict[str, Any] = {
+        "requests": len(results),
+        "rps": len(results) / elapsed,
+        # Answered with admission control's busy reply instead of a roll.
+        "shed": sum(1 for r in results if "shed" in r),
+        "stages": {},
+    }
+    for stage in STAGES + ("total",):
+        values = sorted(r[stage] for r in results if stage in r)
+        if not values:
+            continue
+        summary["stages"][stage] = {
+            "mean_ms": statistics.fmean(values) * 1000,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    """Print a human-readable report."""
+    print(
+        f"requests: {summary['requests']}  throughput: {summary['rps']:.0f} req/s"
+        f"  shed: {summary['shed']}"
+    )
+    print(f"{'stage':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, figures in summary["stages"].items():
+        print(
+            f"{stage:>9} {figures['mean_ms']:>9.3f} {figures['p50_ms']:>9.3f} "
+            f"{figures['p95_ms']:>9.3f} {figures['p99_ms']:>9.3f}"
+        )
+
+
+def main():
+    """Parse arguments, generate load and report the results."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="POST to a running server instead of in-process")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS)
+    parser.add_argument("--seed", help="hex Ed25519 seed for a reproducible keypair")
+    parser.add_argument("--print-public-key", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    signing_key = (
+        SigningKey(bytes.fromhex(args.seed)) if args.seed else SigningKey.generate()
+    )
+    if args.print_public_key:
+        print(signing_key.verify_key.encode().hex())
+        return
+
+    requests = build_requests(args.requests, args.scenario)
+    if args.url:
+        elapsed, results = run_http(args.url, signing_key, requests, args.concurrency)
+    else:
+        elapsed, results = run_in_process(signing_key, requests, args.concurrency)
+    summary = summarize(elapsed, results)
+    summary["mode"] = "http" if args.url else "in-process"
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
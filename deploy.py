@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+import argparse
+import hashlib
 import json  # Added for parsing JSON responses
 import os
 import subprocess
@@ -7,6 +9,13 @@ import sys
 import requests
 from dotenv import load_dotenv
 
+# Allow importing trophybot package from src directory.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+import trophybot.bot  # noqa: E402,F401
+from trophybot.applications import ApplicationTable  # noqa: E402
+from trophybot.commands import registry  # noqa: E402
+
 # Load .env file for local development if it exists.
 # This ensures environment variables are loaded before they are accessed by the script.
 load_dotenv()
@@ -18,67 +27,18 @@ GCP_PROJECT = os.environ.get("GCP_PROJECT")
 GCP_REGION = os.environ.get("GCP_REGION", "us-central1")
 TEST_GUILD_ID = os.environ.get("TEST_GUILD_ID")  # optional for guild-scoped commands
 
-if not APP_ID or not BOT_TOKEN or not GCP_PROJECT:
-    print(
-        "Error: DISCORD_APP_ID, DISCORD_TOKEN, and GCP_PROJECT must be set in .env",
-        file=sys.stderr,
-    )
-    sys.exit(1)
+# Last-synced command hashes per scope URL, so unchanged deploys skip the API.
+STATE_FILE = os.environ.get("DISCORD_COMMANDS_STATE", ".discord-commands.json")
 
-BASE_URL = "https://discord.com/api/v10"
+BASE_URL = os.environ.get("DISCORD_API_BASE", "https://discord.com/api/v10")
 HEADERS = {"Authorization": f"Bot {BOT_TOKEN}", "Content-Type": "application/json"}
 
-# Define your slash commands here
-COMMANDS = [
-    {
-        "name": "roll",
-        "description": "Roll a six-sided die or pool",
-        "options": [
-            {
-                "name": "light",
-                "description": "Number of light dice",
-                "type": 4,  # INTEGER
-                "required": False,
-            },
-            {
-                "name": "dark",
-                "description": "Number of dark dice (default 0)",
-                "type": 4,  # INTEGER
-                "required": False,
-            },
-        ],
-    },
-    {
-        "name": "combat",
-        "description": "Trophy Gold endurance test",
-        "options": [
-            {
-                "name": "dark",
-                "description": "Number of dark dice",
-                "type": 4,
-                "required": True,
-            },
-            {
-                "name": "endurance",
-                "description": "Monster endurance value",
-                "type": 4,
-                "required": True,
-            },
-        ],
-    },
-    {
-        "name": "gold",
-        "description": "Trophy Gold loot roll",
-        "options": [
-            {
-                "name": "count",
-                "description": "Number of gold dice to roll",
-                "type": 4,
-                "required": True,
-            }
-        ],
-    },
-]
+# Slash command definitions come from the handlers registered in trophybot.bot;
+# an application listed in TROPHYBOT_APPLICATIONS gets only its own commands.
+APPLICATIONS = ApplicationTable.from_json(
+    os.environ.get("TROPHYBOT_APPLICATIONS"), registry
+)
+COMMANDS = APPLICATIONS.commands_for(APP_ID, registry).schemas()
 
 
 def _fetch_existing_commands(url: str, headers: dict, scope_description: str) -> list:
@@ -167,11 +127,98 @@ def _register_new_or_update_defined_commands(
     return failures
 
 
-def register_commands():
+def _canonical_option(opt: dict) -> dict:
+    canonical = {
+        "name": opt["name"],
+        "description": opt.get("description", ""),
+        "type": opt["type"],
+        "required": bool(opt.get("required", False)),
+    }
+    for limit in ("max_value", "max_length"):
+        if opt.get(limit) is not None:
+            canonical[limit] = opt[limit]
+    return canonical
+
+
+def canonical_commands(commands: list) -> bytes:
+    """
+    Serialize command definitions in a canonical form for hashing.
+
+    Only the fields deploy.py controls are kept, with Discord's defaults filled
+    in, so local definitions and the API's GET response hash the same.
+    """
+    canonical = []
+    for cmd in commands:
+        canonical.append(
+            {
+                "name": cmd["name"],
+                "description": cmd.get("description", ""),
+                "type": cmd.get("type", 1),  # CHAT_INPUT
+                "options": [_canonical_option(opt) for opt in cmd.get("options") or []],
+            }
+        )
+    canonical.sort(key=lambda cmd: cmd["name"])
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode()
+
+
+def commands_hash(commands: list) -> str:
+    """Return the SHA-256 of the canonical command definitions."""
+    return hashlib.sha256(canonical_commands(commands)).hexdigest()
+
+
+def _load_state(state_path: str) -> dict:
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(state_path: str, url: str, digest: str) -> None:
+    state = _load_state(state_path)
+    state[url] = digest
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def sync_commands(
+    url: str,
+    headers: dict,
+    commands: list,
+    session: requests.Session,
+    state_path: str = STATE_FILE,
+    force: bool = False,
+) -> str:
     """
-    Register slash commands with Discord API by fetching, deleting stale,
-    and updating/creating.
+    Make the commands at ``url`` match ``commands`` with at most two API calls.
+
+    Returns "cached" when the last sync recorded the same hash (no API calls),
+    "unchanged" when the remote commands already match (one GET), or
+    "updated" after a single bulk-overwrite PUT.
     """
+    local_hash = commands_hash(commands)
+    if not force and _load_state(state_path).get(url) == local_hash:
+        print(f"  Commands unchanged since last sync ({local_hash[:12]}); skipping.")
+        return "cached"
+
+    if not force:
+        resp = session.get(url, headers=headers)
+        resp.raise_for_status()
+        remote_hash = commands_hash(resp.json())
+        if remote_hash == local_hash:
+            print(f"  Remote commands already match ({local_hash[:12]}).")
+            _save_state(state_path, url, local_hash)
+            return "unchanged"
+
+    print(f"  Overwriting commands ({len(commands)}) in one request...")
+    resp = session.put(url, headers=headers, json=commands)
+    resp.raise_for_status()
+    _save_state(state_path, url, local_hash)
+    print(f"  ✓ Synced {', '.join(cmd['name'] for cmd in commands)}")
+    return "updated"
+
+
+def _commands_url() -> tuple:
     if TEST_GUILD_ID:
         print("DEBUG: TEST_GUILD_ID =", TEST_GUILD_ID)
         url = f"{BASE_URL}/applications/{APP_ID}/guilds/{TEST_GUILD_ID}/commands"
@@ -180,8 +227,29 @@ def register_commands():
         print("DEBUG: No TEST_GUILD_ID found")
         url = f"{BASE_URL}/applications/{APP_ID}/commands"
         scope = "global"
+    return url, scope
+
+
+def register_commands(incremental: bool = False, force: bool = False):
+    """
+    Register slash commands with the Discord API.
+
+    By default the commands are synced by hash with a single bulk overwrite.
+    With ``incremental`` the previous behaviour is used: fetch, delete stale,
+    and update/create each command.
+    """
+    url, scope = _commands_url()
     print(f"Registering commands ({scope}):")
 
+    if not incremental:
+        with requests.Session() as session:
+            try:
+                sync_commands(url, HEADERS, COMMANDS, session, force=force)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Command sync failed: {e}", file=sys.stderr)
+                sys.exit(1)
+        return
+
     existing_commands = _fetch_existing_commands(url, HEADERS, scope)
 
     current_command_names = {cmd["name"] for cmd in COMMANDS}
@@ -225,7 +293,27 @@ def main():
     Load local environment variables if in development, register Discord commands,
     and deploy to Cloud Run.
     """
-    register_commands()
+    parser = argparse.ArgumentParser(description="Register commands and deploy.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="register commands one by one instead of a single hashed sync",
+    )
+    parser.add_argument(
+        "--force-sync",
+        action="store_true",
+        help="overwrite the remote commands even if the hashes match",
+    )
+    args = parser.parse_args()
+
+    if not APP_ID or not BOT_TOKEN or not GCP_PROJECT:
+        print(
+            "Error: DISCORD_APP_ID, DISCORD_TOKEN, and GCP_PROJECT must be set in .env",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    register_commands(incremental=args.incremental, force=args.force_sync)
     deploy_cloud_run()
 
 
@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration for serving trophybot in production.
+
+Every setting can be overridden from the environment, so the same file works
+on Cloud Run and locally:
+
+- ``PORT``: listen port (default 8080)
+- ``WEB_CONCURRENCY``: worker processes (default: one per CPU)
+- ``GUNICORN_THREADS``: threads per worker for the gthread worker (default 8)
+- ``GUNICORN_KEEPALIVE``: seconds to hold idle keep-alive connections (default 75)
+- ``GUNICORN_GRACEFUL_TIMEOUT``: seconds workers get to finish on shutdown
+  (default 8, inside Cloud Run's 10-second SIGTERM window)
+- ``TROPHYBOT_ASGI``: set to 1 to serve ``asgi:app`` with uvicorn workers
+- ``TROPHYBOT_METRICS_DIR``: where workers share metrics snapshots (default: a
+  ``trophybot-metrics`` directory under the system temp directory)
+
+The app is preloaded in the master, so the verification key and handler
+tables are loaded once (see ``main.init``) and shared by every forked worker.
+Per-process state (the dice buffer, the log writer thread, the follow-up pool)
+resets itself after fork, so each worker refills its own dice buffer in
+``post_fork`` rather than inheriting the master's.
+"""
+
+import multiprocessing
+import os
+import tempfile
+
+_asgi = os.environ.get("TROPHYBOT_ASGI", "") == "1"
+
+wsgi_app = "asgi:app" if _asgi else "main:app"
+worker_class = "uvicorn.workers.UvicornWorker" if _asgi else "gthread"
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+preload_app = True
+
+# Every worker writes its metrics here so a scrape of any one sees them all.
+# Set before the app is preloaded, which is when trophybot.metrics reads it.
+os.environ.setdefault(
+    "TROPHYBOT_METRICS_DIR", os.path.join(tempfile.gettempdir(), "trophybot-metrics")
+)
+
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "75"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "8"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+
+# Recycle workers occasionally to bound memory growth; jitter avoids restarting
+# every worker at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = None
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "warning")
+
+
+def on_starting(server):
+    """Start from empty metrics, dropping snapshots left by a previous run."""
+    os.makedirs(os.environ["TROPHYBOT_METRICS_DIR"], exist_ok=True)
+    from trophybot import metrics
+
+    metrics.registry.clear_snapshots()
+
+
+def post_fork(server, worker):
+    """Pre-fill the worker's dice buffer, which is cleared on fork."""
+    import trophybot.dice
+
+    trophybot.dice.warm()
+
+
+def worker_exit(server, worker):
+    """Flush follow-ups, roll history, log records and metrics on worker exit."""
+    import main
+    from trophybot import history, log, metrics
+
+    main.followups.stop()
+    history.store.stop()
+    log.stop()
+    metrics.registry.flush()
+
+
+def child_exit(server, worker):
+    """Fold an exited worker's metrics snapshot into the exited-workers total."""
+    from trophybot import metrics
+
+    metrics.registry.retire(worker.pid)
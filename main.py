@@ -1,135 +1,460 @@
+"""
+Discord interactions endpoint.
+
+Start-up is kept short for scale-to-zero: only what the first request needs is
+imported here, the Flask app is built on first access to ``main.app`` (so the
+ASGI entry point never imports Flask), and :func:`init` loads the verification
+key, the payload handler table and the dice buffer in one step at import time.
+"""
+
+import hmac
+import json
 import os
 import sys
 import time
-from types import SimpleNamespace
+from contextlib import nullcontext
 
-from dotenv import load_dotenv
-from flask import Flask, request
 from nacl.exceptions import BadSignatureError
 from nacl.signing import VerifyKey
 
-load_dotenv()
+# Local development reads .env; Cloud Run (which sets K_SERVICE) injects the
+# environment directly, so python-dotenv is not even imported there.
+if "K_SERVICE" not in os.environ:
+    from dotenv import load_dotenv
 
-app = Flask(__name__)
+    load_dotenv()
 
 # Allow importing trophybot package from src directory.
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
 
-from trophybot.bot import roll_command  # noqa: E402
+# Importing trophybot.bot registers the command handlers.
+import trophybot.bot  # noqa: E402,F401
+import trophybot.dice  # noqa: E402
+import trophybot.history  # noqa: E402
+from trophybot import (
+    metrics,  # noqa: E402
+    tracing,  # noqa: E402
+)
+from trophybot.admission import AdmissionController  # noqa: E402
+from trophybot.applications import ApplicationTable  # noqa: E402
+from trophybot.commands import (  # noqa: E402
+    CHANNEL_MESSAGE_WITH_SOURCE,
+    EPHEMERAL,
+    Interaction,
+    registry,
+)
+from trophybot.dedup import ResponseCache, body_digest  # noqa: E402
+from trophybot.followup import (  # noqa: E402
+    DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE,
+    DISCORD_API,
+    FollowupDispatcher,
+)
+from trophybot.log import configure as configure_logging  # noqa: E402
+from trophybot.log import get_logger  # noqa: E402
+from trophybot.profiling import PROFILE_HEADER, Profiler  # noqa: E402
+from trophybot.ratelimit import RateLimiter  # noqa: E402
 
+configure_logging()
+log = get_logger("main")
 
-def _verify_discord_request(current_request):
-    """Verify the incoming request from Discord."""
-    DISCORD_PUBLIC_KEY = os.environ.get("DISCORD_PUBLIC_KEY")
+
+def _load_verify_key(public_key_hex):
+    """Build the Discord VerifyKey once, failing fast if the key is malformed."""
+    if not public_key_hex:
+        return None
+    try:
+        return VerifyKey(bytes.fromhex(public_key_hex))
+    except (ValueError, TypeError) as e:
+        raise RuntimeError(f"DISCORD_PUBLIC_KEY is malformed: {e}") from e
+
+
+VERIFY_KEY = None  # Set by init()
+# Applications served at /interactions/<application id>, set by init().
+applications = ApplicationTable()
+MAX_BODY_SIZE = 8 * 1024  # 8KB
+
+# Bearer token for the admin endpoints (the history export); unset disables them.
+ADMIN_TOKEN = os.environ.get("TROPHYBOT_ADMIN_TOKEN") or None
+NDJSON = "application/x-ndjson"
+
+# Commands named in TROPHYBOT_DEFER_COMMANDS (comma-separated) are acknowledged
+# immediately and completed by the follow-up worker pool.
+DEFERRED_COMMANDS = frozenset(
+    name.strip()
+    for name in os.environ.get("TROPHYBOT_DEFER_COMMANDS", "").split(",")
+    if name.strip()
+)
+responses = ResponseCache(
+    max_entries=int(os.environ.get("TROPHYBOT_DEDUP_ENTRIES", "10000"))
+)
+limiter = RateLimiter.from_env(os.environ)
+# Limits from TROPHYBOT_{USER,GUILD}_{RATE,BURST}; over-limit commands get this
+# canned reply, seen only by the invoking user, without reaching any handler.
+RATE_LIMITED_RESPONSE = {
+    "type": CHANNEL_MESSAGE_WITH_SOURCE,
+    "data": {
+        "content": "🎲 Slow down! Too many rolls, try again in a moment.",
+        "flags": EPHEMERAL,
+    },
+}
+# Interactions past Discord's deadline, or beyond TROPHYBOT_MAX_IN_FLIGHT in
+# progress, are shed with this reply instead of being handled late.
+admission = AdmissionController.from_env(os.environ)
+BUSY_RESPONSE = {
+    "type": CHANNEL_MESSAGE_WITH_SOURCE,
+    "data": {
+        "content": "🎲 The dice are busy right now, try again in a moment.",
+        "flags": EPHEMERAL,
+    },
+}
+profiler = Profiler.from_env(os.environ)
+followups = FollowupDispatcher(
+    base_url=os.environ.get("DISCORD_API_BASE", DISCORD_API),
+    workers=int(os.environ.get("TROPHYBOT_FOLLOWUP_WORKERS", "4")),
+    max_queue=int(os.environ.get("TROPHYBOT_FOLLOWUP_QUEUE", "256")),
+)
+
+
+def _check_request_headers(current_request, verify_key=None):
+    """Check the signature headers and declared body size of a request."""
     signature = current_request.headers.get("X-Signature-Ed25519")
     timestamp = current_request.headers.get("X-Signature-Timestamp")
 
-    if signature is None or timestamp is None or DISCORD_PUBLIC_KEY is None:
-        print("DEBUG: Missing signature/timestamp/public_key")
+    if signature is None or timestamp is None or (verify_key or VERIFY_KEY) is None:
+        log.info("Missing signature/timestamp/public_key")
+        metrics.verifications.inc("missing_headers")
         return ("Unauthorized", 401)
 
     # Max size check for body
-    max_size = 8 * 1024  # 8KB
     content_len_str = current_request.headers.get("Content-Length")
     if content_len_str:
         try:
             content_len = int(content_len_str)
-            if content_len > max_size:
-                print(f"DEBUG: Payload too large: {content_len} bytes")
+            if content_len > MAX_BODY_SIZE:
+                log.info("Payload too large", content_length=content_len)
+                metrics.verifications.inc("too_large")
                 return ("Payload too large", 413)
         except ValueError:
-            print(f"DEBUG: Invalid Content-Length: {content_len_str}")
+            log.info("Invalid Content-Length", content_length=content_len_str)
+            metrics.verifications.inc("bad_content_length")
             return ("Bad Request", 400)
     # else: Consider if missing Content-Length should be an error.
     # For now, proceed as Discord should send it.
+    return None
 
-    body = current_request.get_data(as_text=True)  # Get body for signature verification
+
+def _check_signature(current_request, verify_key=None):
+    """
+    Check the Ed25519 signature and freshness of a request.
+
+    ``verify_key`` is the requested application's key; by default the
+    DISCORD_PUBLIC_KEY one.
+    """
+    signature = current_request.headers.get("X-Signature-Ed25519")
+    timestamp = current_request.headers.get("X-Signature-Timestamp")
+    body = current_request.get_data()  # Raw bytes, exactly as Discord signed them
     try:
-        verify_key = VerifyKey(bytes.fromhex(DISCORD_PUBLIC_KEY))
-        message_to_verify = f"{timestamp}{body}".encode()
-        # Assuming existing signature method is correct: signature_bytes + message_bytes
-        verify_key.verify(bytes.fromhex(signature) + message_to_verify)
+        (verify_key or VERIFY_KEY).verify(
+            timestamp.encode() + body, bytes.fromhex(signature)
+        )
     except (BadSignatureError, ValueError, TypeError) as e:
-        print(f"DEBUG: Invalid request signature: {e}")
+        log.info("Invalid request signature", error=e)
+        metrics.verifications.inc("bad_signature")
         return ("Invalid request signature", 401)
 
     # Timestamp check
     try:
         req_ts = int(timestamp)
     except ValueError:
-        print("DEBUG: Invalid request timestamp format")
+        log.info("Invalid request timestamp format")
+        metrics.verifications.inc("bad_timestamp")
         return ("Invalid request timestamp", 401)
     if abs(time.time() - req_ts) > 300:  # 5 minutes
-        print("DEBUG: Stale request timestamp")
+        log.info("Stale request timestamp")
+        metrics.verifications.inc("stale_timestamp")
         return ("Stale request timestamp", 401)
+    metrics.verifications.inc("ok")
     return None  # Verification successful
 
 
-def _handle_ping_request(_payload):
+def _verify_discord_request(current_request):
+    """Verify the incoming request from Discord."""
+    return _check_request_headers(current_request) or _check_signature(current_request)
+
+
+async def _handle_ping_request(_payload):
     """Handle a PING request from Discord."""
-    print("DEBUG: Handling PING")
+    log.debug("Handling PING")
     return {"type": 1}
 
 
 async def _handle_application_command(payload):
     """Handle an APPLICATION_COMMAND request from Discord."""
-    print("DEBUG: Handling Application Command")
-    data = payload.get("data", {})
-    name = data.get("name")
-    print(f"DEBUG: Command name: {name}")
-
-    async def send_message_for_handler(message_content: str):
-        print(
-            f"DEBUG: send_message_for_handler creating response for: {message_content}"
-        )
-        return {"type": 4, "data": {"content": message_content}}
+    interaction = Interaction.from_payload(payload)
+    log.debug("Handling application command", command=interaction.name)
+    limited = limiter.check(interaction)
+    if limited:
+        log.info("Rate limited", scope=limited, command=interaction.name)
+        metrics.rate_limited.inc(limited)
+        return RATE_LIMITED_RESPONSE
+    commands = applications.commands_for(payload.get("application_id"), registry)
+    if (
+        interaction.name in DEFERRED_COMMANDS
+        and interaction.name in commands
+        and followups.submit(interaction)
+    ):
+        return {"type": DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE}
+    return await commands.dispatch(interaction)
+
+
+async def _handle_message_component(payload):
+    """Handle a MESSAGE_COMPONENT request (a button click) from Discord."""
+    interaction = Interaction.from_payload(payload)
+    log.debug("Handling message component", custom_id=interaction.custom_id)
+    limited = limiter.check(interaction)
+    if limited:
+        log.info("Rate limited", scope=limited, custom_id=interaction.custom_id)
+        metrics.rate_limited.inc(limited)
+        return RATE_LIMITED_RESPONSE
+    commands = applications.commands_for(payload.get("application_id"), registry)
+    return await commands.dispatch_component(interaction)
 
-    options = data.get("options", [])  # Default to empty list
 
-    interaction_data_obj = SimpleNamespace(options=options)
-    fake_interaction_obj = SimpleNamespace(
-        response=SimpleNamespace(send_message=send_message_for_handler),
-        data=interaction_data_obj,
+async def _dispatch_interaction(payload):
+    """Route a verified interaction payload to its handler."""
+    # Fields are only rendered, off the request thread, when DEBUG is enabled.
+    log.debug(
+        "Validated request",
+        payload_type=payload.get("type"),
+        data=payload.get("data"),
     )
 
-    if name == "roll":
-        print("DEBUG: Routing to roll_command.callback")
-        return await roll_command.callback(fake_interaction_obj)
+    handler = _PAYLOAD_HANDLERS.get(payload.get("type"))
+    if handler is None:
+        log.warning("Unhandled payload type", payload_type=payload.get("type"))
+        metrics.interactions.inc("unknown")
+        return {}
+    metrics.interactions.inc(payload["type"])
+    with tracing.span("dispatch"):
+        return await handler(payload)
+
+
+async def _admit_and_dispatch(current_request, payload):
+    """Dispatch ``payload`` if admission control lets it in, else reply busy."""
+    if payload.get("type") == 1:  # PINGs are always answered
+        return await _dispatch_interaction(payload)
+    age = admission.age(current_request.headers.get("X-Signature-Timestamp"))
+    metrics.request_age_seconds.observe(age)
+    metrics.in_flight.observe(admission.in_flight)
+    shed = admission.admit(age)
+    if shed:
+        log.info("Shed interaction", reason=shed, age=age)
+        metrics.shed.inc(shed)
+        return BUSY_RESPONSE
+    try:
+        return await _dispatch_interaction(payload)
+    finally:
+        admission.release()
+
+
+def _profile_requested(headers) -> bool:
+    """Return whether the request carries the admin token in PROFILE_HEADER."""
+    if ADMIN_TOKEN is None:
+        return False
+    value = headers.get(PROFILE_HEADER)
+    return value is not None and hmac.compare_digest(
+        value.encode(), ADMIN_TOKEN.encode()
+    )
+
+
+async def _serve_interaction(current_request, application_id=None):
+    """
+    Process an interaction request, returning ``(result, headers)``.
 
-    print(f"DEBUG: Unknown command: {name}")
-    return {"type": 4, "data": {"content": f"Unknown command: {name}"}}
+    ``application_id`` comes from the ``/interactions/<id>`` path and selects
+    the key to verify with; requests to ``/`` use DISCORD_PUBLIC_KEY.
+    ``headers`` is None unless the request was traced, when it holds the
+    Server-Timing header. Traced requests are those with TROPHYBOT_SERVER_TIMING
+    on and those picked for profiling.
+    """
+    verify_key = None
+    if application_id is not None:
+        application = applications.get(application_id)
+        if application is None:
+            log.info("Unknown application", application_id=application_id)
+            metrics.verifications.inc("unknown_application")
+            metrics.requests.inc(404)
+            return ("Unknown application", 404), None
+        verify_key = application.verify_key
+    profile = profiler.sample() or _profile_requested(current_request.headers)
+    if not (tracing.enabled or profile):
+        return await _process_interaction(current_request, verify_key), None
+    with profiler.capture() if profile else nullcontext(), tracing.trace() as trace:
+        result = await _process_interaction(current_request, verify_key)
+    return result, {"Server-Timing": trace.header()}
 
 
-@app.route("/", methods=["POST"])
-async def interactions():  # Made async
-    """Flask route for Discord interactions."""
-    verification_result = _verify_discord_request(request)
-    if verification_result:
-        return verification_result
+async def _process_interaction(current_request, verify_key=None):
+    """
+    Verify, parse and dispatch one interaction request, recording its metrics.
+
+    ``current_request`` needs ``headers.get()`` and ``get_data()``; both the
+    Flask view and the ASGI app pass their request through here. Retried
+    deliveries are answered from ``responses``: an identical redelivery before
+    signature verification, a re-signed one before any dice are rolled.
+    """
+    start = time.perf_counter()
+    result = await _answer_interaction(current_request, verify_key)
+    metrics.request_seconds.observe(time.perf_counter() - start)
+    metrics.requests.inc(result[1] if isinstance(result, tuple) else 200)
+    return result
+
+
+async def _answer_interaction(current_request, verify_key=None):
+    """Produce the response for one interaction request."""
+    header_failure = _check_request_headers(current_request, verify_key)
+    if header_failure:
+        return header_failure
+
+    signature = current_request.headers.get("X-Signature-Ed25519")
+    # The key is part of the check: a body verified for one application must
+    # not be answered from cache on another application's endpoint.
+    digest = (body_digest(current_request.get_data()), verify_key)
+    cached = responses.get(signature, digest)
+    if cached is not None:
+        log.debug("Answered duplicate delivery from cache", key="signature")
+        metrics.duplicates.inc("signature")
+        return cached
+
+    with tracing.span("verify"):
+        signature_failure = _check_signature(current_request, verify_key)
+    if signature_failure:
+        return signature_failure
 
     # Parse JSON payload *after* signature verification
-    payload = request.get_json(silent=True)
+    try:
+        with tracing.span("parse"):
+            payload = json.loads(current_request.get_data())
+    except ValueError:
+        payload = None
     if not payload:
-        print("DEBUG: Bad Request, no JSON payload or failed to parse")
+        log.info("Bad Request, no JSON payload or failed to parse")
         return ("Bad Request", 400)
 
-    # Optional: More detailed debug logging of received valid request
-    print(f"DEBUG: Validated request. Payload type: {payload.get('type')}")
-    if payload.get("type") == 2:  # Application Command
-        print(f"DEBUG: Command data: {payload.get('data')}")
+    interaction_id = payload.get("id")
+    cached = responses.get(interaction_id)
+    if cached is None:
+        result = await _admit_and_dispatch(current_request, payload)
+        if result is BUSY_RESPONSE:
+            # Not cached: Discord's retry should get a real answer.
+            return result
+        if isinstance(result, dict):
+            responses.put(interaction_id, result)
+    else:
+        log.debug("Answered duplicate delivery from cache", key="id")
+        metrics.duplicates.inc("id")
+        result = cached
+    if isinstance(result, dict):
+        responses.put(signature, result, digest)
+    return result
+
+
+async def interactions(application_id=None):
+    """Flask route for Discord interactions, optionally for one application."""
+    from flask import request
+
+    result, headers = await _serve_interaction(request, application_id)
+    if headers is None:
+        return result
+    if isinstance(result, tuple):
+        return (*result, headers)
+    return result, headers
+
+
+def _check_admin(headers):
+    """Require ``Authorization: Bearer <TROPHYBOT_ADMIN_TOKEN>``."""
+    expected = f"Bearer {ADMIN_TOKEN}".encode() if ADMIN_TOKEN else None
+    provided = (headers.get("Authorization") or "").encode()
+    if expected is None or not hmac.compare_digest(provided, expected):
+        log.info("Rejected admin request")
+        return ("Forbidden", 403)
+    return None
+
+
+def history_export_view():
+    """Flask route streaming the roll history as NDJSON."""
+    from flask import Response, request
+
+    failure = _check_admin(request.headers)
+    if failure:
+        return failure
+    chunks = trophybot.history.store.export(request.args.get("channel"))
+    return Response(chunks, mimetype=NDJSON)
 
-    # Ping request
-    if payload.get("type") == 1:
-        return _handle_ping_request(payload)
 
-    # Application command request
-    if payload.get("type") == 2:
-        return await _handle_application_command(payload)
+def metrics_view():
+    """Flask route serving metrics in Prometheus text format."""
+    return metrics.registry.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
+def create_app():
+    """Build the Flask app serving the interactions and metrics endpoints."""
+    from flask import Flask
+
+    flask_app = Flask(__name__)
+    flask_app.add_url_rule("/", view_func=interactions, methods=["POST"])
+    flask_app.add_url_rule(
+        "/interactions/<application_id>", view_func=interactions, methods=["POST"]
+    )
+    flask_app.add_url_rule("/metrics", view_func=metrics_view, methods=["GET"])
+    flask_app.add_url_rule(
+        "/history/export", view_func=history_export_view, methods=["GET"]
+    )
+    return flask_app
+
+
+def __getattr__(name):
+    # Build the Flask app on first use of ``main.app`` (e.g. by gunicorn or
+    # ``from main import app``) rather than at import time.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Payload type -> handler, filled in by init().
+_PAYLOAD_HANDLERS = {}
+
+
+def init():
+    """
+    Warm everything the first request needs, in one step.
+
+    Loads the verification keys (failing fast if one is malformed), fills the
+    payload handler table and pre-fills the dice entropy buffer.
+    """
+    global VERIFY_KEY, applications
+    VERIFY_KEY = _load_verify_key(os.environ.get("DISCORD_PUBLIC_KEY"))
+    try:
+        applications = ApplicationTable.from_json(
+            os.environ.get("TROPHYBOT_APPLICATIONS"), registry
+        )
+    except (ValueError, KeyError, AttributeError) as e:
+        raise RuntimeError(f"TROPHYBOT_APPLICATIONS is malformed: {e!r}") from e
+    _PAYLOAD_HANDLERS.update(
+        {
+            1: _handle_ping_request,  # PING
+            2: _handle_application_command,  # APPLICATION_COMMAND
+            3: _handle_message_component,  # MESSAGE_COMPONENT
+        }
+    )
+    trophybot.dice.warm()
+
 
-    print("DEBUG: Unhandled payload type or scenario")
-    return {}
+init()
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    app.run(host="0.0.0.0", port=port)
+    create_app().run(host="0.0.0.0", port=port)
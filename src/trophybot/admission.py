@@ -0,0 +1,89 @@
+"""
+Deadline-aware admission control.
+
+Discord waits 3 seconds for an interaction response. Once an instance is
+saturated, work it accepts late fails anyway and slows down the requests that
+could still succeed, so :class:`AdmissionController` turns work away early
+with a cheap reply instead:
+
+* ``deadline``: the request is already too old to answer in time. Its age is
+  measured from ``X-Signature-Timestamp``, when Discord signed it, so it
+  includes every queue in front of the handler (the load balancer, the
+  server's accept backlog, a busy event loop).
+* ``capacity``: this process already has ``max_in_flight`` interactions in
+  progress.
+
+The timestamp has one-second resolution, so a request is only shed when it
+would miss the deadline even if it was signed at the very end of that second:
+shedding never turns away a request that could have been answered in time.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+# Discord's deadline for the initial interaction response, in seconds.
+DISCORD_DEADLINE = 3.0
+
+
+class AdmissionController:
+    """Caps in-flight interactions and sheds those past their deadline."""
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        deadline: float = DISCORD_DEADLINE,
+        margin: float = 0.5,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Admit at most ``max_in_flight`` interactions at once (0 for no cap).
+
+        ``margin`` is the time kept back from ``deadline`` to compute and
+        deliver the response; a ``deadline`` of 0 turns the age check off.
+        """
+        self.max_in_flight = max_in_flight
+        self.deadline = deadline
+        self.margin = margin
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @classmethod
+    def from_env(cls, environ) -> "AdmissionController":
+        """
+        Build a controller from ``TROPHYBOT_MAX_IN_FLIGHT``,
+        ``TROPHYBOT_DEADLINE_SECONDS`` and ``TROPHYBOT_DEADLINE_MARGIN``.
+        """
+        return cls(
+            max_in_flight=int(environ.get("TROPHYBOT_MAX_IN_FLIGHT", 64)),
+            deadline=float(environ.get("TROPHYBOT_DEADLINE_SECONDS", DISCORD_DEADLINE)),
+            margin=float(environ.get("TROPHYBOT_DEADLINE_MARGIN", 0.5)),
+        )
+
+    def age(self, timestamp: str) -> float:
+        """Return the seconds since Discord signed a request, never negative."""
+        return max(0.0, self._clock() - int(timestamp))
+
+    def admit(self, age: float) -> Optional[str]:
+        """
+        Take an in-flight slot for a request of ``age`` seconds.
+
+        Returns None when admitted, and the caller must then :meth:`release`
+        the slot; otherwise returns why the request was shed ("deadline" or
+        "capacity") and no slot is taken.
+        """
+        # ``age`` is measured from a whole-second timestamp, so the request may
+        # be up to a second younger than it looks.
+        if self.deadline and age - 1 > self.deadline - self.margin:
+            return "deadline"
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return "capacity"
+            self.in_flight += 1
+        return None
+
+    def release(self) -> None:
+        """Give back a slot taken by :meth:`admit`."""
+        with self._lock:
+            self.in_flight -= 1
@@ -0,0 +1,93 @@
+"""
+Several Discord applications served by one deployment.
+
+Each application (bot identity) signs its interactions with its own key and
+may expose its own subset of the commands. ``TROPHYBOT_APPLICATIONS`` lists
+them as JSON, keyed by application ID::
+
+    {
+      "111111111111111111": {"public_key": "ab12…"},
+      "222222222222222222": {"public_key": "cd34…", "commands": ["roll", "odds"]}
+    }
+
+Every key is parsed once at start-up, so a malformed one fails the deployment
+rather than a request, and finding an application's key or commands is a
+single dict lookup. Each application points its Interactions Endpoint URL at
+``/interactions/<application id>``, which selects the key to verify with
+before the body is trusted.
+"""
+
+import json
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from nacl.signing import VerifyKey
+
+from trophybot.commands import CommandRegistry
+
+
+class Application(NamedTuple):
+    """One application's verification key and command set."""
+
+    verify_key: VerifyKey
+    commands: CommandRegistry
+
+
+class ApplicationTable:
+    """Applications by ID."""
+
+    def __init__(self):
+        """Create an empty table."""
+        self._applications: Dict[str, Application] = {}
+
+    def add(
+        self,
+        application_id: str,
+        public_key: str,
+        commands: CommandRegistry,
+        names: Optional[Iterable[str]] = None,
+    ) -> Application:
+        """
+        Register an application with its hex ``public_key``.
+
+        It gets every command in ``commands``, or only those in ``names``.
+        Raises ValueError for a malformed key or an unknown command name.
+        """
+        try:
+            verify_key = VerifyKey(bytes.fromhex(public_key))
+        except (ValueError, TypeError) as e:
+            raise ValueError(
+                f"Public key of application {application_id} is malformed: {e}"
+            ) from e
+        if names is not None:
+            commands = commands.subset(names)
+        application = Application(verify_key, commands)
+        self._applications[str(application_id)] = application
+        return application
+
+    def get(self, application_id: Optional[str]) -> Optional[Application]:
+        """Return the application with ``application_id``, or None."""
+        return self._applications.get(application_id)  # type: ignore[arg-type]
+
+    def commands_for(
+        self, application_id: Optional[str], default: CommandRegistry
+    ) -> CommandRegistry:
+        """Return the command set of ``application_id``, or ``default``."""
+        application = self._applications.get(application_id)  # type: ignore[arg-type]
+        return default if application is None else application.commands
+
+    def __len__(self) -> int:
+        """Return the number of applications."""
+        return len(self._applications)
+
+    @classmethod
+    def from_json(cls, text: Optional[str], commands: CommandRegistry):
+        """Build a table from ``TROPHYBOT_APPLICATIONS``; empty when unset."""
+        table = cls()
+        for application_id, config in json.loads(text or "{}").items():
+            table.add(
+                application_id,
+                config["public_key"],
+                commands,
+                config.get("commands"),
+            )
+        return table
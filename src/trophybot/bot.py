@@ -1,35 +1,218 @@
+import asyncio
+import os
+import re
+from typing import List
+
 import trophybot.dice
+import trophybot.history
+import trophybot.log
+import trophybot.odds
+import trophybot.rules
+from trophybot.commands import (
+    ACTION_ROW,
+    BUTTON,
+    CUSTOM_ID_LIMIT,
+    DANGER,
+    EPHEMERAL,
+    SECONDARY,
+    STRING,
+    Option,
+    registry,
+)
+from trophybot.parser import MAX_LENGTH as MAX_EXPRESSION_LENGTH
+from trophybot.parser import ExpressionError, compile_expression
+from trophybot.tracing import span
+
+# Pools larger than this are rolled as face counts and rendered as a summary,
+# keeping memory flat and replies under Discord's 2,000-character limit.
+LARGE_POOL_THRESHOLD = 100
+# Most dice of one kind a command rolls: large pools are cheap in memory but
+# not in CPU, and every reply has to beat Discord's 3-second deadline.
+MAX_POOL = 10_000
+TOO_MANY_DICE = f"🎲 At most {MAX_POOL:,} dice of each kind."
+
+# /history shows this many rolls by default, and never more than HISTORY_MAX.
+HISTORY_DEFAULT = 10
+HISTORY_MAX = 25
+# Discord rejects messages longer than this.
+MESSAGE_LIMIT = 2000
+# Longest user text quoted back in an error reply.
+ECHO_LIMIT = 100
+
+_POOL_OPTIONS = (
+    Option("light", "Number of light dice", max_value=MAX_POOL),
+    Option("dark", "Number of dark dice (default 0)", max_value=MAX_POOL),
+)
+
+
+# Button state lives in custom_id ("reroll:<light>.<dark>" or
+# "push:<light faces>.<dark faces>"), so a click can be served by any instance.
+_REROLL_STATE = re.compile(r"^(\d{1,5})\.(\d{1,5})$")
+_PUSH_STATE = re.compile(r"^([1-6]*)\.([1-6]*)$")
+
 
+def _too_many(*counts) -> bool:
+    """Return whether any of ``counts`` (None for not given) exceeds MAX_POOL."""
+    return any(count is not None and count > MAX_POOL for count in counts)
 
-class _Command:
-    def __init__(self, callback):
-        self.callback = callback
+
+async def _send_roll(interaction, content: str, components=None):
+    """Reply with a roll and add it to the channel's history."""
+    trophybot.history.store.record(interaction, content)
+    if components:
+        return await interaction.response.send_message(content, components)
+    return await interaction.response.send_message(content)
 
 
 async def _handle_single_d6_roll(interaction):
     """Handle rolling a single d6 when no options are provided."""
-    result = trophybot.dice.roll_d6()
-    return await interaction.response.send_message(f"🎲 You rolled: {result}")
+    with span("dice"):
+        result = trophybot.dice.roll_d6()
+    return await _send_roll(interaction, f"🎲 You rolled: {result}")
+
+
+def _roll_dice(count: int):
+    """
+    Roll ``count`` dice for display, returning ``(faces, counts)``.
+
+    Pools above LARGE_POOL_THRESHOLD are rolled straight into a face-count
+    histogram and ``faces`` is None; smaller pools keep every face in order.
+    """
+    with span("dice"):
+        if count > LARGE_POOL_THRESHOLD:
+            return None, trophybot.dice.roll_histogram(count)
+        return trophybot.dice.roll_pool(count), None
+
+
+def _highest(faces, counts) -> int:
+    """Return the highest die of a pool rolled by ``_roll_dice``."""
+    if faces is not None:
+        return max(faces)
+    return trophybot.dice.histogram_highest(counts)
+
+
+def _format_pool(label: str, faces=None, counts=None) -> str:
+    """
+    Render a pool as its faces, or as a per-face summary for large pools.
+
+    The summary (e.g. "Dark: 6×41 5×38 …") has at most six entries, so the
+    message stays short however many dice were rolled.
+    """
+    if faces is None and trophybot.dice.histogram_size(counts) <= LARGE_POOL_THRESHOLD:
+        faces = trophybot.dice.histogram_faces(counts)
+    if faces is not None:
+        return f"{label} {' '.join(map(str, faces))}"
+    summary = " ".join(
+        f"{face}×{counts[face - 1]}" for face in range(6, 0, -1) if counts[face - 1]
+    )
+    return f"{label}: {summary}"
+
+
+def _pool_result(light=None, dark=None) -> str:
+    """
+    Describe a light/dark pool roll and its highest die.
+
+    ``light`` and ``dark`` are ``(faces, counts)`` pairs from ``_roll_dice``,
+    or None for a colour that was not rolled. Per the rules, dark dice win ties
+    with light dice.
+    """
+    message_parts = []
+    highest_light = highest_dark = 0
+    if light is not None:
+        highest_light = _highest(*light)
+        message_parts.append(_format_pool("Light", *light))
+    if dark is not None:
+        highest_dark = _highest(*dark)
+        message_parts.append(_format_pool("Dark", *dark))
+    highest_roll_type, highest_roll_val = trophybot.rules.highest_die(
+        highest_light, highest_dark
+    )
+    roll_summary_str = " ".join(message_parts)
+    return f"{roll_summary_str} => {highest_roll_type} {highest_roll_val} is highest"
+
+
+def _combat_result(counts, endurance: int) -> str:
+    """Compare the two highest dark dice against a monster's endurance."""
+    top_two = trophybot.rules.combat_dice(counts)
+    total = sum(top_two)
+    if trophybot.rules.defeats(total, endurance):
+        outcome = "Monster defeated!"
+    else:
+        outcome = "The monster endures."
+    total_str = " + ".join(map(str, top_two))
+    if len(top_two) > 1:
+        total_str += f" = {total}"
+    return (
+        f"{_format_pool('Dark', counts=counts)} => {total_str} "
+        f"vs Endurance {endurance}: {outcome}"
+    )
+
+
+def _gold_result(counts) -> str:
+    """Total a gold roll."""
+    return (
+        f"{_format_pool('Gold', counts=counts)} => "
+        f"{trophybot.rules.gold_total(counts)} gold"
+    )
+
+
+def _button(label: str, style: int, custom_id: str):
+    return {"type": BUTTON, "style": style, "label": label, "custom_id": custom_id}
+
+
+def _pool_size(pool) -> int:
+    """Return the number of dice in a pool from ``_roll_dice``, or 0 for None."""
+    if pool is None:
+        return 0
+    faces, counts = pool
+    return len(faces) if faces is not None else trophybot.dice.histogram_size(counts)
+
+
+def _face_digits(pool):
+    """Return a pool's faces as a digit string, or None if only counts are kept."""
+    if pool is None:
+        return ""
+    faces = pool[0]
+    return None if faces is None else "".join(map(str, faces))
+
+
+def _pool_buttons(light=None, dark=None):
+    """
+    Return the Reroll and Push your luck buttons for a pool roll.
+
+    Reroll carries the pool size and Push the faces rolled, so its result can
+    be extended by one dark die. Push is left off when the faces don't fit in a
+    custom_id, and for large pools, which keep face counts only.
+    """
+    reroll = f"reroll:{_pool_size(light)}.{_pool_size(dark)}"
+    buttons = [_button("Reroll", SECONDARY, reroll)]
+    light_digits, dark_digits = _face_digits(light), _face_digits(dark)
+    if light_digits is not None and dark_digits is not None:
+        push = f"push:{light_digits}.{dark_digits}"
+        if len(push) <= CUSTOM_ID_LIMIT:
+            buttons.append(_button("Push your luck", DANGER, push))
+    return [{"type": ACTION_ROW, "components": buttons}]
+
+
+async def _send_pool_roll(interaction, light=None, dark=None, prefix: str = ""):
+    """Reply with a pool roll from ``_roll_dice`` and its buttons."""
+    return await _send_roll(
+        interaction,
+        prefix + _pool_result(light, dark),
+        _pool_buttons(light, dark),
+    )
 
 
 async def _handle_light_dice_roll(interaction, light_dice_count: int):
     """Handle rolling light dice when dark dice are not involved or are zero."""
     # Precondition: light_dice_count > 0
-    rolls = trophybot.dice.roll_pool(light_dice_count)
-    highest = max(rolls)
-    return await interaction.response.send_message(
-        f"Light {' '.join(map(str, rolls))} => Light {highest} is highest"
-    )
+    return await _send_pool_roll(interaction, light=_roll_dice(light_dice_count))
 
 
 async def _handle_dark_dice_roll(interaction, dark_dice_count: int):
     """Handle rolling dark dice when light dice are not specified or are zero."""
     # Precondition: dark_dice_count > 0
-    dark_rolls = trophybot.dice.roll_pool(dark_dice_count)
-    highest_dark = max(dark_rolls)
-    return await interaction.response.send_message(
-        f"Dark {' '.join(map(str, dark_rolls))} => Dark {highest_dark} is highest"
-    )
+    return await _send_pool_roll(interaction, dark=_roll_dice(dark_dice_count))
 
 
 async def _handle_combined_dice_roll(
@@ -37,56 +220,22 @@ async def _handle_combined_dice_roll(
 ):
     """Handle rolling both light and dark dice."""
     # Preconditions: dark_dice_count > 0. light_dice_count >= 0.
-    light_rolls = []
-    if light_dice_count > 0:
-        light_rolls = trophybot.dice.roll_pool(light_dice_count)
+    light = _roll_dice(light_dice_count) if light_dice_count > 0 else None
 
     # dark_dice_count is > 0
     assert isinstance(dark_dice_count, int) and dark_dice_count > 0, (
         "Logical error: dark_dice_count should be a positive integer here."
     )
-    dark_rolls = trophybot.dice.roll_pool(dark_dice_count)
-
-    all_rolls_tagged = []
-    # We only add light rolls to all_rolls_tagged if light_dice_count > 0
-    all_rolls_tagged.extend([(roll, "Light") for roll in light_rolls])
-    all_rolls_tagged.extend([(roll, "Dark") for roll in dark_rolls])
-
-    # Since dark_rolls is non-empty, all_rolls_tagged will be non-empty.
-    # To handle ties where dark dice win, we use a tuple as the key for max().
-    # The 1st element is the roll value, the 2nd is a preference score (Dark > Light)
-    highest_roll_val, highest_roll_type = max(
-        all_rolls_tagged, key=lambda x: (x[0], 1 if x[1] == "Dark" else 0)
-    )
-
-    message_parts = []
-    if light_rolls:  # True if light_dice_count > 0
-        message_parts.append(f"Light {' '.join(map(str, light_rolls))}")
-    message_parts.append(
-        f"Dark {' '.join(map(str, dark_rolls))}"
-    )  # dark_rolls is never empty here
-
-    roll_summary_str = " ".join(message_parts)
-    return await interaction.response.send_message(
-        f"{roll_summary_str} => {highest_roll_type} {highest_roll_val} is highest"
-    )
+    return await _send_pool_roll(interaction, light, _roll_dice(dark_dice_count))
 
 
+@registry.command("roll", "Roll a six-sided die or pool", _POOL_OPTIONS)
 async def _roll_command(interaction):
     """Roll a d6 or pool as the generic /roll command."""
-    options_list = (
-        interaction.data.options
-        if hasattr(interaction.data, "options") and interaction.data.options is not None
-        else []
-    )
-
-    parsed_options = {}
-    if options_list:
-        for opt in options_list:
-            parsed_options[opt["name"]] = opt["value"]
-
-    light_dice_count = parsed_options.get("light")
-    dark_dice_count = parsed_options.get("dark")
+    light_dice_count = interaction.options.get("light")
+    dark_dice_count = interaction.options.get("dark")
+    if _too_many(light_dice_count, dark_dice_count):
+        return await interaction.response.send_message(TOO_MANY_DICE)
 
     # Case 1: No options provided (plain /roll)
     if light_dice_count is None and dark_dice_count is None:
@@ -121,4 +270,251 @@ async def _roll_command(interaction):
         )
 
 
-roll_command = _Command(_roll_command)
+def _percent(probability: float) -> str:
+    return f"{probability * 100:.1f}%"
+
+
+def _format_odds(light_dice_count: int, dark_dice_count: int) -> str:
+    """Render the highest-die distribution for a light/dark pool."""
+    table = trophybot.odds.pool_probabilities(light_dice_count, dark_dice_count)
+    lines = [f"Odds for Light {light_dice_count} Dark {dark_dice_count}:"]
+    for face in range(6, 0, -1):
+        lines.append(
+            f"{face}: {_percent(table.probability(face))} "
+            f"(Light {_percent(table.probability(face, 'Light'))}, "
+            f"Dark {_percent(table.probability(face, 'Dark'))})"
+        )
+    lines.append(f"Dark die highest: {_percent(table.dark_probability())}")
+    return "\n".join(lines)
+
+
+@registry.command("odds", "Show the odds of the highest die for a pool", _POOL_OPTIONS)
+async def _odds_command(interaction):
+    """Report the highest-die odds for a pool as the /odds command."""
+    light_dice_count = interaction.options.get("light") or 0
+    dark_dice_count = interaction.options.get("dark") or 0
+
+    if light_dice_count < 0 or dark_dice_count < 0:
+        return await interaction.response.send_message(
+            "🎲 Dice counts must not be negative."
+        )
+    if light_dice_count == 0 and dark_dice_count == 0:
+        return await interaction.response.send_message("🎲 No dice to roll.")
+    if _too_many(light_dice_count, dark_dice_count):
+        return await interaction.response.send_message(TOO_MANY_DICE)
+    return await interaction.response.send_message(
+        _format_odds(light_dice_count, dark_dice_count)
+    )
+
+
+@registry.command(
+    "combat",
+    "Trophy Gold endurance test",
+    [
+        Option("dark", "Number of dark dice", required=True, max_value=MAX_POOL),
+        Option("endurance", "Monster endurance value", required=True),
+    ],
+)
+async def _combat_command(interaction):
+    """Roll dark dice and compare the two highest against monster endurance."""
+    dark_dice_count = interaction.options.get("dark") or 0
+    endurance = interaction.options.get("endurance") or 0
+    if dark_dice_count <= 0:
+        return await interaction.response.send_message("🎲 No dice rolled.")
+    if _too_many(dark_dice_count):
+        return await interaction.response.send_message(TOO_MANY_DICE)
+
+    with span("dice"):
+        counts = trophybot.dice.roll_histogram(dark_dice_count)
+    return await _send_roll(interaction, _combat_result(counts, endurance))
+
+
+@registry.command(
+    "gold",
+    "Trophy Gold loot roll",
+    [Option("count", "Number of gold dice to roll", required=True, max_value=MAX_POOL)],
+)
+async def _gold_command(interaction):
+    """Roll gold dice and total them."""
+    gold_dice_count = interaction.options.get("count") or 0
+    if gold_dice_count <= 0:
+        return await interaction.response.send_message("🎲 No dice rolled.")
+    if _too_many(gold_dice_count):
+        return await interaction.response.send_message(TOO_MANY_DICE)
+
+    with span("dice"):
+        counts = trophybot.dice.roll_histogram(gold_dice_count)
+    return await _send_roll(interaction, _gold_result(counts))
+
+
+def _faces_for_display(faces):
+    """Return ``(faces, counts)`` for a slice of a batch, as ``_roll_dice`` does."""
+    if len(faces) > LARGE_POOL_THRESHOLD:
+        return None, trophybot.dice.histogram(faces)
+    return faces, None
+
+
+def _roll_result(roll, faces) -> str:
+    """Apply the rules for ``roll`` (a compiled ``parser.Roll``) to its faces."""
+    if roll.kind == "d6":
+        return f"🎲 {faces[0]}"
+    if roll.kind == "gold":
+        return _gold_result(trophybot.dice.histogram(faces))
+    if roll.kind == "combat":
+        return _combat_result(trophybot.dice.histogram(faces), roll.endurance)
+    light = _faces_for_display(faces[: roll.light]) if roll.light else None
+    dark = _faces_for_display(faces[roll.light :]) if roll.dark else None
+    return _pool_result(light, dark)
+
+
+def _shorten(text: str, limit: int = ECHO_LIMIT) -> str:
+    """Cut user text to ``limit`` characters for quoting back in a reply."""
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _run_expression(rolls) -> str:
+    """Roll every die of a compiled expression in one batch and report each roll."""
+    with span("dice"):
+        faces = trophybot.dice.roll_pool(sum(roll.dice for roll in rolls))
+    lines: List[str] = []
+    offset = 0
+    for roll in rolls:
+        result = _roll_result(roll, faces[offset : offset + roll.dice])
+        lines.append(result if len(rolls) == 1 else f"{len(lines) + 1}. {result}")
+        offset += roll.dice
+    return "\n".join(lines)[:MESSAGE_LIMIT]
+
+
+@registry.command(
+    "dice",
+    "Roll a dice expression, e.g. 2L3D x5, gold 4 or combat 3 vs 7",
+    [
+        Option(
+            "expr",
+            "Dice expression",
+            type=STRING,
+            required=True,
+            max_length=MAX_EXPRESSION_LENGTH,
+        )
+    ],
+)
+async def _dice_command(interaction):
+    """Roll several pools, gold or combat rolls in one interaction."""
+    text = interaction.options.get("expr") or ""
+    try:
+        rolls = compile_expression(text)
+    except ExpressionError as e:
+        return await interaction.response.send_message(
+            f"🎲 Couldn't roll {_shorten(text)!r}: {e}."
+        )
+    return await _send_roll(interaction, _run_expression(rolls))
+
+
+def _format_history(entries) -> str:
+    """Render history entries, dropping the oldest until the message fits."""
+    lines = ["Recent rolls (newest first):"]
+    lines.extend(
+        f"<t:{int(entry.ts)}:t> {entry.user_name or 'Someone'}: {entry.content}"
+        for entry in entries
+    )
+    while len(lines) > 2 and len("\n".join(lines)) > MESSAGE_LIMIT:
+        lines.pop()
+    return "\n".join(lines)[:MESSAGE_LIMIT]
+
+
+@registry.command(
+    "history",
+    "Show recent rolls in this channel",
+    [Option("count", f"Number of rolls to show (default {HISTORY_DEFAULT})")],
+)
+async def _history_command(interaction):
+    """Show the channel's latest rolls."""
+    count = interaction.options.get("count") or HISTORY_DEFAULT
+    count = max(1, min(count, HISTORY_MAX))
+    store = trophybot.history.store
+    if store.db_path:
+        # Reads SQLite: keep it off the event loop.
+        entries = await asyncio.to_thread(store.recent, interaction.channel_id, count)
+    else:
+        entries = store.recent(interaction.channel_id, count)
+    if not entries:
+        return await interaction.response.send_message(
+            "🎲 No rolls in this channel yet."
+        )
+    return await interaction.response.send_message(_format_history(entries))
+
+
+async def _bad_button(interaction):
+    return await interaction.response.send_message(
+        "🎲 Couldn't read that button.", flags=EPHEMERAL
+    )
+
+
+@registry.component("reroll")
+async def _reroll_button(interaction):
+    """Roll the same light/dark pool again."""
+    match = _REROLL_STATE.match(interaction.custom_id.partition(":")[2])
+    if not match:
+        return await _bad_button(interaction)
+    light_count, dark_count = int(match[1]), int(match[2])
+    if light_count + dark_count <= 0 or _too_many(light_count, dark_count):
+        return await _bad_button(interaction)
+    light = _roll_dice(light_count) if light_count else None
+    dark = _roll_dice(dark_count) if dark_count else None
+    return await _send_pool_roll(interaction, light, dark)
+
+
+@registry.component("push")
+async def _push_button(interaction):
+    """Keep a pool's faces and add one more dark die."""
+    match = _PUSH_STATE.match(interaction.custom_id.partition(":")[2])
+    if not match or not (match[1] or match[2]):
+        return await _bad_button(interaction)
+    light_faces = [int(face) for face in match[1]]
+    with span("dice"):
+        pushed = trophybot.dice.roll_pool(1)
+    dark_faces = [int(face) for face in match[2]] + pushed
+    light = (light_faces, None) if light_faces else None
+    return await _send_pool_roll(
+        interaction, light, (dark_faces, None), prefix="Pushed: "
+    )
+
+
+roll_command = registry["roll"]
+odds_command = registry["odds"]
+combat_command = registry["combat"]
+gold_command = registry["gold"]
+history_command = registry["history"]
+dice_command = registry["dice"]
+
+
+def main() -> None:
+    """
+    Run the bot over the Discord Gateway (the ``trophybot`` console script).
+
+    Reads the bot token from DISCORD_TOKEN. TROPHYBOT_SHARDS overrides the
+    shard count Discord recommends and TROPHYBOT_SHARD_PROCESSES the number of
+    processes the shards are spread across (default: one per CPU).
+    """
+    if "K_SERVICE" not in os.environ:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+    import trophybot.gateway
+
+    token = os.environ.get("DISCORD_TOKEN")
+    if not token:
+        raise SystemExit("DISCORD_TOKEN is not set")
+    shards = os.environ.get("TROPHYBOT_SHARDS")
+    processes = os.environ.get("TROPHYBOT_SHARD_PROCESSES")
+    # main.py configures logging for the HTTP modes; nothing else does here.
+    trophybot.log.configure()
+    try:
+        trophybot.gateway.run(
+            token,
+            shard_count=int(shards) if shards else None,
+            processes=int(processes) if processes else None,
+            api_base=os.environ.get("DISCORD_API_BASE", trophybot.gateway.DISCORD_API),
+        )
+    finally:
+        trophybot.log.stop()
@@ -0,0 +1,324 @@
+"""
+Slash-command registry and interaction types.
+
+Handlers in :mod:`trophybot.bot` register themselves here together with their
+option schema. The registry routes interactions by name with a single dict
+lookup and is also the source of the command definitions that ``deploy.py``
+registers with Discord.
+"""
+
+import logging
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+)
+
+import trophybot.dice
+from trophybot import metrics, tracing
+from trophybot.log import get_logger
+
+# Recorded dice draws are logged whatever TROPHYBOT_LOG_LEVEL is: recording is
+# opt-in (TROPHYBOT_RECORD_DRAWS=1) and the records are only useful if kept.
+draws_log = get_logger("draws")
+draws_log.logger.setLevel(logging.INFO)
+
+# Discord application command option types.
+STRING = 3
+INTEGER = 4
+
+# Discord interaction callback types.
+CHANNEL_MESSAGE_WITH_SOURCE = 4
+
+# Discord message component types and button styles.
+ACTION_ROW = 1
+BUTTON = 2
+SECONDARY = 2
+DANGER = 4
+
+# custom_id is limited to this many characters.
+CUSTOM_ID_LIMIT = 100
+
+# Message flag: only the invoking user sees the message.
+EPHEMERAL = 1 << 6
+
+
+class Option:
+    """Schema for one slash-command option."""
+
+    __slots__ = ("name", "description", "type", "required", "max_value", "max_length")
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        type: int = INTEGER,
+        required: bool = False,
+        max_value: Optional[int] = None,
+        max_length: Optional[int] = None,
+    ):
+        """
+        Describe an option; options are optional integers unless stated.
+
+        Discord enforces ``max_value`` and ``max_length`` in its client, but
+        handlers still have to check them: nothing stops a crafted interaction
+        from exceeding them.
+        """
+        self.name = name
+        self.description = description
+        self.type = type
+        self.required = required
+        self.max_value = max_value
+        self.max_length = max_length
+
+    def to_schema(self) -> Dict[str, Any]:
+        """Return the Discord API representation of this option."""
+        schema = {
+            "name": self.name,
+            "description": self.description,
+            "type": self.type,
+            "required": self.required,
+        }
+        if self.max_value is not None:
+            schema["max_value"] = self.max_value
+        if self.max_length is not None:
+            schema["max_length"] = self.max_length
+        return schema
+
+
+class Command:
+    """A slash command: its schema and the coroutine that handles it."""
+
+    __slots__ = ("name", "description", "options", "callback")
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        options: Sequence[Option] = (),
+        callback: Optional[Callable[["Interaction"], Awaitable[Any]]] = None,
+    ):
+        """Create a command; a command without a callback is schema-only."""
+        self.name = name
+        self.description = description
+        self.options = tuple(options)
+        self.callback = callback
+
+    def to_schema(self) -> Dict[str, Any]:
+        """Return the Discord API representation of this command."""
+        return {
+            "name": self.name,
+            "description": self.description,
+            "options": [option.to_schema() for option in self.options],
+        }
+
+
+class Response:
+    """Builds interaction responses for the HTTP endpoint."""
+
+    __slots__ = ()
+
+    async def send_message(
+        self,
+        content: str,
+        components: Optional[List[Dict[str, Any]]] = None,
+        flags: int = 0,
+    ) -> Dict[str, Any]:
+        """Return a CHANNEL_MESSAGE_WITH_SOURCE response with ``content``."""
+        data: Dict[str, Any] = {"content": content}
+        if components:
+            data["components"] = components
+        if flags:
+            data["flags"] = flags
+        return {"type": CHANNEL_MESSAGE_WITH_SOURCE, "data": data}
+
+
+# Responses carry no per-request state, so one instance serves every request.
+RESPONSE = Response()
+
+
+class Interaction:
+    """An incoming command interaction with its options parsed into a dict."""
+
+    __slots__ = ("name", "options", "response", "payload")
+
+    def __init__(
+        self,
+        name: Optional[str],
+        options: Dict[str, Any],
+        response: Any = RESPONSE,
+        payload: Optional[Dict[str, Any]] = None,
+    ):
+        """Wrap a command ``name`` and its ``options`` keyed by option name."""
+        self.name = name
+        self.options = options
+        self.response = response
+        self.payload = payload if payload is not None else {}
+
+    @classmethod
+    def from_payload(
+        cls, payload: Dict[str, Any], response: Any = RESPONSE
+    ) -> "Interaction":
+        """Build an interaction from an APPLICATION_COMMAND or component payload."""
+        data = payload.get("data") or {}
+        options = {opt["name"]: opt.get("value") for opt in data.get("options") or ()}
+        return cls(data.get("name"), options, response, payload)
+
+    @property
+    def custom_id(self) -> str:
+        """Return the ``custom_id`` of the clicked component, or ""."""
+        return (self.payload.get("data") or {}).get("custom_id") or ""
+
+    @property
+    def channel_id(self) -> Optional[str]:
+        """Return the ID of the channel the interaction was sent from."""
+        return self.payload.get("channel_id")
+
+    @property
+    def guild_id(self) -> Optional[str]:
+        """Return the ID of the guild, or None for a direct message."""
+        return self.payload.get("guild_id")
+
+    @property
+    def user(self) -> Dict[str, Any]:
+        """Return the invoking user (``member.user`` in guilds, else ``user``)."""
+        member = self.payload.get("member") or {}
+        return member.get("user") or self.payload.get("user") or {}
+
+    @property
+    def user_id(self) -> Optional[str]:
+        """Return the ID of the invoking user."""
+        return self.user.get("id")
+
+    @property
+    def user_name(self) -> Optional[str]:
+        """Return the invoking user's display name in this channel."""
+        member = self.payload.get("member") or {}
+        user = self.user
+        return member.get("nick") or user.get("global_name") or user.get("username")
+
+
+class CommandRegistry:
+    """
+    Maps command names to :class:`Command` objects.
+
+    Message components (buttons) are routed by the prefix of their
+    ``custom_id``, up to the first ``:``; the rest of the ``custom_id`` is the
+    component's state, so handling a click needs nothing stored server-side.
+    """
+
+    def __init__(self):
+        """Create an empty registry."""
+        self._commands: Dict[str, Command] = {}
+        self._components: Dict[str, Command] = {}
+
+    def add(self, command: Command) -> Command:
+        """Register ``command``, replacing any command with the same name."""
+        self._commands[command.name] = command
+        return command
+
+    def command(
+        self, name: str, description: str, options: Sequence[Option] = ()
+    ) -> Callable:
+        """Register the decorated coroutine as the handler for ``name``."""
+
+        def decorator(callback):
+            self.add(Command(name, description, options, callback))
+            return callback
+
+        return decorator
+
+    def component(self, prefix: str) -> Callable:
+        """Register the decorated coroutine for ``custom_id``s of ``prefix:...``."""
+
+        def decorator(callback):
+            self._components[prefix] = Command(prefix, "", (), callback)
+            return callback
+
+        return decorator
+
+    def subset(self, names: Iterable[str]) -> "CommandRegistry":
+        """
+        Return a registry with only the commands called ``names``.
+
+        Components are kept: a button only exists on a reply from one of the
+        commands. Raises ValueError for a name that is not registered.
+        """
+        subset = CommandRegistry()
+        for name in names:
+            if name not in self._commands:
+                raise ValueError(f"Unknown command: {name}")
+            subset.add(self._commands[name])
+        subset._components = self._components
+        return subset
+
+    def __getitem__(self, name: str) -> Command:
+        """Return the command registered as ``name``."""
+        return self._commands[name]
+
+    def __contains__(self, name: object) -> bool:
+        """Return whether a command called ``name`` is registered."""
+        return name in self._commands
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """Return the Discord API definitions of every registered command."""
+        return [command.to_schema() for command in self._commands.values()]
+
+    async def dispatch(self, interaction: Interaction) -> Any:
+        """Run the handler for ``interaction`` and return its response."""
+        command = self._commands.get(interaction.name)  # type: ignore[arg-type]
+        if command is None or command.callback is None:
+            metrics.commands.inc("unknown")
+            return await interaction.response.send_message(
+                f"Unknown command: {interaction.name}"
+            )
+        return await self._run(command, interaction)
+
+    async def dispatch_component(self, interaction: Interaction) -> Any:
+        """Run the handler for a component interaction by its custom_id prefix."""
+        prefix = interaction.custom_id.partition(":")[0]
+        command = self._components.get(prefix)
+        if command is None:
+            metrics.commands.inc("unknown")
+            return await interaction.response.send_message(
+                f"Unknown component: {prefix}"
+            )
+        return await self._run(command, interaction)
+
+    async def _run(self, command: Command, interaction: Interaction) -> Any:
+        """Run ``command``'s handler, recording its metrics and dice draws."""
+        start = time.perf_counter()
+        try:
+            with tracing.span("handler"):
+                if isinstance(
+                    trophybot.dice.get_backend(), trophybot.dice.RecordingBackend
+                ):
+                    return await self._dispatch_recorded(command, interaction)
+                return await command.callback(interaction)  # type: ignore[misc]
+        finally:
+            metrics.command_seconds.observe(time.perf_counter() - start, command.name)
+            metrics.commands.inc(command.name)
+
+    @staticmethod
+    async def _dispatch_recorded(command: Command, interaction: Interaction) -> Any:
+        """Run a handler, logging the dice it drew so the roll can be replayed."""
+        with trophybot.dice.recording() as draws:
+            try:
+                return await command.callback(interaction)  # type: ignore[misc]
+            finally:
+                draws_log.info(
+                    "Dice draws",
+                    interaction_id=interaction.payload.get("id"),
+                    command=command.name,
+                    options=interaction.options,
+                    draws=trophybot.dice.format_draws(draws),
+                )
+
+
+registry = CommandRegistry()
@@ -0,0 +1,86 @@
+"""
+Bounded cache of interaction responses for answering Discord retries.
+
+Discord may deliver the same interaction more than once. Responses are kept
+for the same 5-minute window that request timestamps are accepted for, keyed
+both by request signature (so an identical redelivery is answered before any
+verification) and by interaction ID (so a re-signed redelivery is answered
+without rolling again). Entries live in insertion order, so expiry and
+eviction only ever look at the oldest entry and every operation is O(1).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+DEFAULT_TTL = 300.0  # Matches the timestamp window in main._verify_discord_request
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+def body_digest(body: bytes) -> bytes:
+    """Return a short digest identifying a request body."""
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class ResponseCache:
+    """Time-limited, size-bounded mapping from keys to responses."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Keep at most ``max_entries`` responses for ``ttl`` seconds each."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of live or not-yet-purged entries."""
+        return len(self._entries)
+
+    def _purge(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            oldest_key = next(iter(entries))
+            if entries[oldest_key][0] > now and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+
+    def get(self, key: Any, check: Any = None) -> Optional[Any]:
+        """
+        Return the response stored under ``key``, or None.
+
+        When ``check`` is given it must equal the value stored alongside the
+        response (e.g. a body digest) for the entry to count as a hit.
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, stored_check, response = entry
+            if expires <= self._clock():
+                del self._entries[key]
+                return None
+        if stored_check != check:
+            return None
+        return response
+
+    def put(self, key: Any, response: Any, check: Any = None) -> None:
+        """Store ``response`` under ``key`` until the TTL elapses."""
+        if key is None:
+            return
+        now = self._clock()
+        with self._lock:
+            # Keys are stored once; a re-store keeps the original position so
+            # the dict stays ordered by expiry.
+            if key not in self._entries:
+                self._entries[key] = (now + self.ttl, check, response)
+            self._purge(now)
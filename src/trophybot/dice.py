@@ -1,22 +1,301 @@
 """
 Roll dice for the Trophy RPG system.
 
-This module provides functions to roll a single d6 and a pool of d6s.
+This module provides functions to roll a single d6 and a pool of d6s, either as
+a list of faces or as a face-count histogram.
+
+Dice are drawn from a shared :class:`EntropyPool`, which reads the OS CSPRNG in
+bulk and converts the bytes into unbiased d6 faces by rejection sampling, so a
+pool of any size costs a handful of C-level operations instead of one
+``secrets.randbelow`` call per die.
+
+The source of faces is pluggable: any object with a ``faces(n) -> bytes``
+method is a backend. Besides the secure default there is :class:`SeededPool`
+(a fast, reproducible PRNG for simulations and tests), :class:`RecordingBackend`
+(keeps the faces each interaction drew, see :func:`recording`) and
+:class:`ReplayBackend` (plays recorded faces back). The backend is chosen per
+process with :func:`set_backend` (or ``TROPHYBOT_DICE_SEED`` and
+``TROPHYBOT_RECORD_DRAWS``), per block with :func:`use_backend`, or per call
+with the ``backend`` argument of the rolling functions.
 """
 
-import secrets
-from typing import List
+import os
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, List, Optional, Protocol, Tuple
+
+# Bytes 0..251 map onto faces 1..6 (42 bytes per face); 252..255 are rejected so
+# that every face is equally likely.
+_ACCEPT_LIMIT = 252
+_FACE_TABLE = bytes((b % 6) + 1 if b < _ACCEPT_LIMIT else 0 for b in range(256))
+_REJECTED = bytes(range(_ACCEPT_LIMIT, 256))
+
+DEFAULT_CHUNK_SIZE = 4096
+# Faces drawn per step when building a histogram, bounding memory for huge pools.
+HISTOGRAM_CHUNK_SIZE = 64 * 1024
+
+# Number of dice showing each face: index 0 counts ones, index 5 counts sixes.
+Histogram = Tuple[int, int, int, int, int, int]
+
+
+class Backend(Protocol):
+    """A source of d6 faces."""
+
+    def faces(self, n: int) -> bytes:
+        """Return ``n`` faces (values 1-6) as bytes."""
+        ...
+
+
+def bytes_to_faces(data: bytes) -> bytes:
+    """Convert random bytes to d6 faces (1-6), dropping biased values."""
+    return data.translate(_FACE_TABLE, _REJECTED)
+
+
+class EntropyPool:
+    """
+    Buffered source of d6 faces backed by a CSPRNG byte source.
+
+    Faces are kept as a ``bytearray`` of values 1-6. The buffer is refilled in
+    chunks of ``chunk_size`` random bytes, and is cleared in forked children so
+    that worker processes never share (and repeat) buffered dice.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        source: Callable[[int], bytes] = os.urandom,
+        clear_at_fork: bool = True,
+    ):
+        """Create a pool reading ``chunk_size`` bytes at a time from ``source``."""
+        self._chunk_size = chunk_size
+        self._source = source
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        if clear_at_fork and hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self.clear)
+
+    def clear(self) -> None:
+        """Discard any buffered faces."""
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+
+    def prefill(self) -> None:
+        """Fill the buffer with one chunk of faces ahead of the first roll."""
+        with self._lock:
+            if len(self._buffer) < self._chunk_size:
+                self._buffer += bytes_to_faces(self._source(self._chunk_size))
+
+    def faces(self, n: int) -> bytes:
+        """Return ``n`` independent, uniformly distributed faces as bytes."""
+        if n <= 0:
+            return b""
+        with self._lock:
+            buffer = self._buffer
+            while len(buffer) < n:
+                # Request enough bytes to cover the shortfall after rejections
+                # (4/256 expected loss) in a single read where possible.
+                missing = n - len(buffer)
+                wanted = max(self._chunk_size, missing + (missing >> 5) + 16)
+                buffer += bytes_to_faces(self._source(wanted))
+            result = bytes(buffer[:n])
+            del buffer[:n]
+        return result
+
+
+class SeededPool(EntropyPool):
+    """
+    Reproducible faces from ``random.Random(seed)``, for simulations and tests.
+
+    The same seed and the same sequence of rolls give the same faces. Not for
+    live games: the seed makes every roll predictable, and forked processes
+    repeat each other's rolls.
+    """
+
+    def __init__(self, seed=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """Draw from a Mersenne Twister seeded with ``seed``."""
+        self.seed = seed
+        super().__init__(chunk_size, random.Random(seed).randbytes, False)
+
+
+# Faces drawn by a RecordingBackend in the current context, if recording.
+_draws: ContextVar[Optional[bytearray]] = ContextVar("dice_draws", default=None)
+
+
+class RecordingBackend:
+    """Wraps a backend and records the faces drawn inside :func:`recording`."""
+
+    def __init__(self, inner: Backend):
+        """Record the faces drawn from ``inner``."""
+        self.inner = inner
+
+    def prefill(self) -> None:
+        """Pre-fill the wrapped backend, if it buffers."""
+        prefill = getattr(self.inner, "prefill", None)
+        if prefill is not None:
+            prefill()
+
+    def faces(self, n: int) -> bytes:
+        """Draw ``n`` faces from the wrapped backend, keeping a copy."""
+        result = self.inner.faces(n)
+        draws = _draws.get()
+        if draws is not None:
+            draws += result
+        return result
+
+
+class ReplayBackend:
+    """Plays back recorded faces, in order, so a roll can be reproduced exactly."""
+
+    def __init__(self, faces: bytes):
+        """Replay ``faces`` (values 1-6, as recorded)."""
+        self._faces = bytes(faces)
+        self._offset = 0
+
+    @classmethod
+    def from_digits(cls, digits: str) -> "ReplayBackend":
+        """Replay faces logged as a digit string, e.g. ``"3526"``."""
+        return cls(bytes(int(digit) for digit in digits))
+
+    def faces(self, n: int) -> bytes:
+        """Return the next ``n`` recorded faces."""
+        end = self._offset + max(n, 0)
+        if end > len(self._faces):
+            raise RuntimeError(
+                f"Replay needs {end} faces but only {len(self._faces)} were recorded"
+            )
+        result = self._faces[self._offset : end]
+        self._offset = end
+        return result
 
 
-def roll_d6() -> int:
+def format_draws(faces: bytes) -> str:
+    """Render recorded faces as a digit string, the form ReplayBackend reads."""
+    return "".join(map(str, faces))
+
+
+@contextmanager
+def recording() -> Iterator[bytearray]:
+    """Collect the faces a RecordingBackend draws in this block (and its tasks)."""
+    draws = bytearray()
+    token = _draws.set(draws)
+    try:
+        yield draws
+    finally:
+        _draws.reset(token)
+
+
+def _backend_from_env() -> Backend:
+    seed = os.environ.get("TROPHYBOT_DICE_SEED")
+    backend: Backend = _pool if seed is None else SeededPool(seed)
+    if os.environ.get("TROPHYBOT_RECORD_DRAWS") == "1":
+        backend = RecordingBackend(backend)
+    return backend
+
+
+_pool = EntropyPool()
+_backend = _backend_from_env()
+# Overrides _backend for the current context (see use_backend).
+_override: ContextVar[Optional[Backend]] = ContextVar("dice_backend", default=None)
+
+
+def get_backend() -> Backend:
+    """Return the backend rolls in this context use."""
+    return _override.get() or _backend
+
+
+def set_backend(backend: Backend) -> Backend:
+    """Make ``backend`` this process's default, returning the previous one."""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+
+@contextmanager
+def use_backend(backend: Backend) -> Iterator[Backend]:
+    """Roll with ``backend`` inside this block (and tasks started from it)."""
+    token = _override.set(backend)
+    try:
+        yield backend
+    finally:
+        _override.reset(token)
+
+
+def _faces(n: int, backend: Optional[Backend]) -> bytes:
+    return (backend or _override.get() or _backend).faces(n)
+
+
+def warm() -> None:
+    """Pre-fill the default backend's buffer so the first roll reads no entropy."""
+    prefill = getattr(_backend, "prefill", None)
+    if prefill is not None:
+        prefill()
+
+
+def roll_d6(backend: Optional[Backend] = None) -> int:
     """Roll a six-sided die."""
-    return secrets.randbelow(6) + 1
+    return _faces(1, backend)[0]
 
 
 # Alias for roll_d6
 roll = roll_d6
 
 
-def roll_pool(n: int) -> List[int]:
+def roll_pool(n: int, backend: Optional[Backend] = None) -> List[int]:
     """Roll a pool of six-sided dice."""
-    return [roll_d6() for _ in range(n)]
+    return list(_faces(n, backend))
+
+
+def histogram(faces: Iterable[int]) -> Histogram:
+    """Count how many of ``faces`` show each value 1-6."""
+    counts = [0] * 6
+    for face in faces:
+        counts[face - 1] += 1
+    return tuple(counts)  # type: ignore[return-value]
+
+
+def roll_histogram(n: int, backend: Optional[Backend] = None) -> Histogram:
+    """Roll a pool of ``n`` six-sided dice, returning only the face counts."""
+    counts = [0] * 6
+    remaining = n
+    while remaining > 0:
+        step = min(remaining, HISTOGRAM_CHUNK_SIZE)
+        faces = _faces(step, backend)
+        for index in range(6):
+            counts[index] += faces.count(index + 1)
+        remaining -= step
+    return tuple(counts)  # type: ignore[return-value]
+
+
+def histogram_size(counts: Histogram) -> int:
+    """Return the number of dice in a histogram."""
+    return sum(counts)
+
+
+def histogram_total(counts: Histogram) -> int:
+    """Return the sum of all dice in a histogram."""
+    return sum(face * count for face, count in enumerate(counts, start=1))
+
+
+def histogram_highest(counts: Histogram) -> int:
+    """Return the highest face rolled, or 0 for an empty histogram."""
+    for face in range(6, 0, -1):
+        if counts[face - 1]:
+            return face
+    return 0
+
+
+def histogram_top(counts: Histogram, k: int) -> List[int]:
+    """Return the ``k`` highest faces in descending order."""
+    top: List[int] = []
+    for face in range(6, 0, -1):
+        if len(top) >= k:
+            break
+        top.extend([face] * min(counts[face - 1], k - len(top)))
+    return top
+
+
+def histogram_faces(counts: Histogram) -> List[int]:
+    """Expand a histogram into its faces in descending order."""
+    return histogram_top(counts, histogram_size(counts))
@@ -0,0 +1,241 @@
+"""
+Deferred interaction responses.
+
+A deferred command is acknowledged straight away with
+DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE (type 5), which keeps Discord's 3-second
+deadline however long the command takes. A bounded pool of worker threads then
+runs the command handler and edits the original response through the
+interaction webhook, reusing one keep-alive HTTP session. Rate-limited (429)
+and server-error (5xx) edits are retried a few times, and a command that fails
+is answered with an error message, so a deferred reply is always finished.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from trophybot import metrics
+from trophybot.commands import CommandRegistry, Interaction, registry
+from trophybot.log import get_logger
+
+DISCORD_API = "https://discord.com/api/v10"
+DEFERRED_CHANNEL_MESSAGE_WITH_SOURCE = 5
+
+# Sent in place of the result when a deferred command fails, so the user is
+# never left with the "thinking…" placeholder.
+FOLLOWUP_ERROR = "🎲 Something went wrong rolling that."
+# Longest wait honoured from a 429's Retry-After before retrying.
+MAX_RETRY_AFTER = 10.0
+
+log = get_logger("followup")
+
+
+class FollowupDispatcher:
+    """
+    Bounded worker pool that completes deferred interactions.
+
+    Worker threads and the HTTP session are created on first use in each
+    process, so the dispatcher can be built before a pre-forking server forks
+    and costs nothing at start-up.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DISCORD_API,
+        workers: int = 4,
+        max_queue: int = 256,
+        timeout: float = 5.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        session_factory: Optional[Callable[[], Any]] = None,
+        commands: CommandRegistry = registry,
+    ):
+        """Configure the pool; nothing is started until the first submit."""
+        self.base_url = base_url.rstrip("/")
+        self._commands = commands
+        self._workers = workers
+        self._max_queue = max_queue
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff = backoff
+        self._session_factory = session_factory
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._threads: list = []
+        self._session: Any = None
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_ack_to_followup: Optional[float] = None
+        self._ack_to_followup_total = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Fresh state per process: nothing queued or started before a fork
+            # belongs to this process.
+            self._queue = queue.Queue(maxsize=self._max_queue)
+            # requests is imported here, not at module load, to keep it off the
+            # start-up path when no command is deferred.
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._session = (self._session_factory or requests.Session)()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._threads = [
+                threading.Thread(
+                    target=self._run_worker, name=f"followup-{i}", daemon=True
+                )
+                for i in range(self._workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, interaction: Interaction) -> bool:
+        """
+        Queue ``interaction`` for deferred handling.
+
+        Returns False when the queue is full, in which case the caller should
+        answer inline instead of acknowledging.
+        """
+        self._ensure_started()
+        depth = self._queue.qsize()
+        try:
+            self._queue.put_nowait((interaction, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            metrics.followups.inc("rejected")
+            return False
+        with self._stats_lock:
+            self.submitted += 1
+        metrics.followups.inc("queued")
+        metrics.followup_queue_depth.observe(depth)
+        return True
+
+    def _run_worker(self) -> None:
+        loop = asyncio.new_event_loop()
+        work_queue = self._queue
+        while True:
+            item = work_queue.get()
+            try:
+                if item is None:
+                    return
+                self._complete(loop, *item)
+            finally:
+                work_queue.task_done()
+
+    def _complete(self, loop, interaction: Interaction, acked_at: float) -> None:
+        try:
+            result = loop.run_until_complete(self._commands.dispatch(interaction))
+        except Exception:  # pylint: disable=broad-except
+            self._fail()
+            log.exception("Deferred command failed", command=interaction.name)
+            self._finish_with_error(interaction)
+            return
+        try:
+            self._edit_original(interaction, result["data"])
+        except Exception:  # pylint: disable=broad-except
+            self._fail()
+            log.exception("Follow-up could not be sent", command=interaction.name)
+            return
+        elapsed = time.monotonic() - acked_at
+        with self._stats_lock:
+            self.completed += 1
+            self.last_ack_to_followup = elapsed
+            self._ack_to_followup_total += elapsed
+        metrics.followups.inc("completed")
+        metrics.ack_to_followup_seconds.observe(elapsed)
+        log.debug(
+            "Follow-up sent",
+            command=interaction.name,
+            ack_to_followup_ms=round(elapsed * 1000, 3),
+            queue_depth=self._queue.qsize(),
+        )
+
+    def _fail(self) -> None:
+        with self._stats_lock:
+            self.failed += 1
+        metrics.followups.inc("failed")
+
+    def _finish_with_error(self, interaction: Interaction) -> None:
+        try:
+            self._edit_original(interaction, {"content": FOLLOWUP_ERROR})
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Error follow-up could not be sent", command=interaction.name)
+
+    def _edit_original(self, interaction: Interaction, data: Dict[str, Any]) -> None:
+        application_id = interaction.payload["application_id"]
+        token = interaction.payload["token"]
+        url = f"{self.base_url}/webhooks/{application_id}/{token}/messages/@original"
+        assert self._session is not None
+        for attempt in range(self._retries + 1):
+            resp = self._session.patch(url, json=data, timeout=self._timeout)
+            if attempt == self._retries or not (
+                resp.status_code == 429 or resp.status_code >= 500
+            ):
+                break
+            delay = self._retry_delay(resp, attempt)
+            log.info(
+                "Retrying follow-up",
+                command=interaction.name,
+                status=resp.status_code,
+                delay_s=delay,
+            )
+            time.sleep(delay)
+        resp.raise_for_status()
+
+    def _retry_delay(self, resp, attempt: int) -> float:
+        """Seconds to wait: Retry-After for a 429, else exponential backoff."""
+        if resp.status_code == 429:
+            try:
+                return min(float(resp.headers["Retry-After"]), MAX_RETRY_AFTER)
+            except (KeyError, ValueError):
+                pass
+        return self._backoff * 2**attempt
+
+    def join(self) -> None:
+        """Block until every queued interaction has been followed up."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Finish queued work, then stop the workers and close the session."""
+        if self._pid != os.getpid():
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._session is not None:
+            self._session.close()
+        self._pid = None
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, counters and acknowledgement-to-follow-up times."""
+        with self._stats_lock:
+            mean = (
+                self._ack_to_followup_total / self.completed if self.completed else None
+            )
+            return {
+                "queue_depth": self._queue.qsize(),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "failed": self.failed,
+                "last_ack_to_followup": self.last_ack_to_followup,
+                "mean_ack_to_followup": mean,
+            }
@@ -0,0 +1,384 @@
+"""
+Discord Gateway client.
+
+The bot can run without a public HTTP endpoint by holding a Gateway websocket
+open instead: Discord pushes ``INTERACTION_CREATE`` events down the socket, the
+handlers registered in :mod:`trophybot.bot` answer them through the same
+:class:`~trophybot.commands.CommandRegistry`, and the response goes back on
+the interaction callback endpoint.
+
+:class:`GatewayClient` runs one shard on asyncio. It sends heartbeats at the
+interval from HELLO and reconnects when one goes unacknowledged. It resumes
+the session after a dropped connection, an op 7 RECONNECT or a resumable
+INVALID_SESSION, and identifies afresh otherwise. Traffic is requested with
+``compress=zlib-stream``: each connection shares one inflate context, and a
+message is complete when its data ends with the zlib sync-flush suffix.
+
+:func:`run` asks Discord how many shards to use, splits them across a pool of
+processes so a large bot uses every core, and runs each process's shards on
+one event loop. aiohttp (the ``gateway`` extra) is imported on first use.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+import trophybot.bot  # noqa: F401  (registers the command handlers)
+from trophybot import metrics
+from trophybot.commands import CommandRegistry, Interaction
+from trophybot.commands import registry as default_registry
+from trophybot.followup import DISCORD_API
+from trophybot.log import get_logger
+from trophybot.log import stop as stop_logging
+
+GATEWAY_VERSION = 10
+ZLIB_SUFFIX = b"\x00\x00\xff\xff"
+# Shards in the same identify bucket must identify at least this far apart.
+IDENTIFY_INTERVAL = 5.0
+
+# Interaction types: a slash command and a button click.
+APPLICATION_COMMAND = 2
+MESSAGE_COMPONENT = 3
+
+# Gateway opcodes.
+DISPATCH = 0
+HEARTBEAT = 1
+IDENTIFY = 2
+RESUME = 6
+RECONNECT = 7
+INVALID_SESSION = 9
+HELLO = 10
+HEARTBEAT_ACK = 11
+
+# Close codes after which reconnecting cannot help (bad token, bad shard,
+# bad intents and so on).
+FATAL_CLOSE_CODES = frozenset({4004, 4010, 4011, 4012, 4013, 4014})
+# Close codes after which the session cannot be resumed.
+SESSION_CLOSE_CODES = frozenset({4007, 4009})
+# Close code sent when dropping a connection we intend to resume; codes 1000
+# and 1001 would end the session.
+RESUME_CLOSE_CODE = 4000
+
+log = get_logger("gateway")
+
+
+class GatewayError(RuntimeError):
+    """Raised when Discord closes the Gateway with a non-recoverable code."""
+
+
+class GatewayClient:
+    """One Gateway shard: connects, keeps the session alive, answers commands."""
+
+    def __init__(
+        self,
+        token: str,
+        url: str,
+        shard: Sequence[int] = (0, 1),
+        intents: int = 0,
+        api_base: str = DISCORD_API,
+        commands: CommandRegistry = default_registry,
+        identify_delay: float = 0.0,
+        backoff: Sequence[float] = (1.0, 5.0),
+    ):
+        """
+        Configure a shard; nothing connects until :meth:`run`.
+
+        ``identify_delay`` holds back the first IDENTIFY to respect Discord's
+        identify rate limit, and ``backoff`` is the range of the random delay
+        before reconnecting.
+        """
+        self.token = token
+        self.url = url
+        self.shard = list(shard)
+        self.intents = intents
+        self.api_base = api_base.rstrip("/")
+        self._commands = commands
+        self._identify_delay = identify_delay
+        self._backoff = tuple(backoff)
+        self.session_id: Optional[str] = None
+        self.resume_url: Optional[str] = None
+        self.sequence: Optional[int] = None
+        self._http: Any = None
+        self._ws: Any = None
+        self._acked = True
+        self._closing = False
+        self._dropped = False
+        self._tasks: Set["asyncio.Task[Any]"] = set()
+
+    async def run(self) -> None:
+        """
+        Hold the Gateway connection open until :meth:`close` is called.
+
+        Raises GatewayError if Discord closes the connection with a fatal code.
+        """
+        import aiohttp
+
+        headers = {"Authorization": f"Bot {self.token}"}
+        async with aiohttp.ClientSession(headers=headers) as http:
+            self._http = http
+            try:
+                while not self._closing:
+                    try:
+                        await self._connect()
+                    except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                        log.warning("Gateway connection failed", error=e)
+                    if not self._closing:
+                        await asyncio.sleep(random.uniform(*self._backoff))
+            finally:
+                if self._tasks:
+                    await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        """Close the connection and end :meth:`run`."""
+        self._closing = True
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _connect(self) -> None:
+        import aiohttp
+
+        url = (self.resume_url if self.session_id else None) or self.url
+        query = f"v={GATEWAY_VERSION}&encoding=json&compress=zlib-stream"
+        self._dropped = False
+        async with self._http.ws_connect(f"{url}?{query}", max_msg_size=0) as ws:
+            self._ws = ws
+            heartbeat: Optional["asyncio.Task[None]"] = None
+            inflator = zlib.decompressobj()
+            buffer = bytearray()
+            try:
+                async for message in ws:
+                    if message.type == aiohttp.WSMsgType.BINARY:
+                        buffer.extend(message.data)
+                        if not buffer.endswith(ZLIB_SUFFIX):
+                            continue
+                        data = inflator.decompress(bytes(buffer))
+                        buffer.clear()
+                    elif message.type == aiohttp.WSMsgType.TEXT:
+                        data = message.data
+                    else:
+                        break
+                    payload = json.loads(data)
+                    if payload["op"] == HELLO:
+                        interval = payload["d"]["heartbeat_interval"] / 1000
+                        heartbeat = asyncio.create_task(self._heartbeat(ws, interval))
+                        await self._identify_or_resume(ws)
+                    else:
+                        await self._handle(ws, payload)
+            finally:
+                if heartbeat is not None:
+                    heartbeat.cancel()
+                self._ws = None
+        self._check_close_code(ws.close_code)
+
+    def _check_close_code(self, code: Optional[int]) -> None:
+        if self._closing or self._dropped:
+            return
+        if code in FATAL_CLOSE_CODES:
+            raise GatewayError(f"Gateway closed with code {code}")
+        if code in SESSION_CLOSE_CODES:
+            self.session_id = None
+            self.sequence = None
+        log.info("Gateway closed", code=code, shard=self.shard)
+
+    async def _send(self, ws, op: int, data: Any) -> None:
+        await ws.send_str(json.dumps({"op": op, "d": data}))
+
+    async def _drop(self, ws) -> None:
+        """Close the connection so :meth:`run` reconnects."""
+        self._dropped = True
+        await ws.close(code=RESUME_CLOSE_CODE)
+
+    async def _heartbeat(self, ws, interval: float) -> None:
+        self._acked = True
+        # The first beat is jittered so shards that reconnect together spread out.
+        await asyncio.sleep(interval * random.random())
+        while True:
+            if not self._acked:
+                log.warning(
+                    "Heartbeat not acknowledged; reconnecting", shard=self.shard
+                )
+                await self._drop(ws)
+                return
+            self._acked = False
+            await self._send(ws, HEARTBEAT, self.sequence)
+            await asyncio.sleep(interval)
+
+    async def _identify_or_resume(self, ws) -> None:
+        if self.session_id is not None:
+            await self._send(
+                ws,
+                RESUME,
+                {
+                    "token": self.token,
+                    "session_id": self.session_id,
+                    "seq": self.sequence,
+                },
+            )
+            return
+        if self._identify_delay:
+            await asyncio.sleep(self._identify_delay)
+            self._identify_delay = 0.0
+        await self._send(
+            ws,
+            IDENTIFY,
+            {
+                "token": self.token,
+                "intents": self.intents,
+                "shard": self.shard,
+                "properties": {
+                    "os": sys.platform,
+                    "browser": "trophybot",
+                    "device": "trophybot",
+                },
+            },
+        )
+
+    async def _handle(self, ws, payload: Dict[str, Any]) -> None:
+        op = payload["op"]
+        if op == DISPATCH:
+            self.sequence = payload.get("s", self.sequence)
+            self._handle_dispatch(payload["t"], payload["d"])
+        elif op == HEARTBEAT_ACK:
+            self._acked = True
+        elif op == HEARTBEAT:
+            await self._send(ws, HEARTBEAT, self.sequence)
+        elif op == RECONNECT:
+            log.info("Gateway asked us to reconnect", shard=self.shard)
+            await self._drop(ws)
+        elif op == INVALID_SESSION:
+            if not payload.get("d"):
+                self.session_id = None
+                self.sequence = None
+            log.info("Invalid session", resumable=bool(payload.get("d")))
+            await asyncio.sleep(random.uniform(*self._backoff))
+            await self._drop(ws)
+
+    def _handle_dispatch(self, event: str, data: Dict[str, Any]) -> None:
+        if event == "READY":
+            self.session_id = data["session_id"]
+            self.resume_url = data.get("resume_gateway_url")
+            log.info("Gateway ready", shard=self.shard)
+        elif event == "INTERACTION_CREATE":
+            task = asyncio.create_task(self._answer(data))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _answer(self, payload: Dict[str, Any]) -> None:
+        """Run the command for an interaction and post its response."""
+        metrics.interactions.inc(payload.get("type"))
+        if payload.get("type") == APPLICATION_COMMAND:
+            dispatch = self._commands.dispatch
+        elif payload.get("type") == MESSAGE_COMPONENT:
+            dispatch = self._commands.dispatch_component
+        else:
+            return
+        interaction = Interaction.from_payload(payload)
+        try:
+            result = await dispatch(interaction)
+            url = f"{self.api_base}/interactions/{payload['id']}/{payload['token']}"
+            async with self._http.post(f"{url}/callback", json=result) as resp:
+                if resp.status >= 400:
+                    log.warning(
+                        "Interaction callback rejected",
+                        status=resp.status,
+                        command=interaction.name,
+                    )
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Gateway command failed", command=interaction.name)
+
+
+def shard_groups(shard_count: int, processes: int) -> List[List[int]]:
+    """Split shard IDs round-robin across at most ``processes`` processes."""
+    processes = max(1, min(processes, shard_count))
+    return [list(range(i, shard_count, processes)) for i in range(processes)]
+
+
+async def fetch_gateway(token: str, api_base: str = DISCORD_API) -> Dict[str, Any]:
+    """Return Discord's ``GET /gateway/bot`` answer: URL, shards, limits."""
+    import aiohttp
+
+    headers = {"Authorization": f"Bot {token}"}
+    async with aiohttp.ClientSession(headers=headers) as http:
+        async with http.get(f"{api_base.rstrip('/')}/gateway/bot") as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+
+async def run_shards(
+    token: str,
+    url: str,
+    shard_ids: Sequence[int],
+    shard_count: int,
+    max_concurrency: int = 1,
+    api_base: str = DISCORD_API,
+) -> None:
+    """Run ``shard_ids`` on this event loop until one fails fatally."""
+    clients = [
+        GatewayClient(
+            token,
+            url,
+            (shard_id, shard_count),
+            api_base=api_base,
+            # Identify buckets are shard_id % max_concurrency; each bucket
+            # identifies one shard per IDENTIFY_INTERVAL.
+            identify_delay=(shard_id // max_concurrency) * IDENTIFY_INTERVAL,
+        )
+        for shard_id in shard_ids
+    ]
+    try:
+        await asyncio.gather(*(client.run() for client in clients))
+    finally:
+        for client in clients:
+            await client.close()
+
+
+def _run_process(*args) -> None:
+    try:
+        asyncio.run(run_shards(*args))
+    finally:
+        # Flush this process's queued log records before it is torn down.
+        stop_logging()
+
+
+def run(
+    token: str,
+    shard_count: Optional[int] = None,
+    processes: Optional[int] = None,
+    api_base: str = DISCORD_API,
+) -> None:
+    """
+    Run the bot over the Gateway until a shard fails fatally.
+
+    ``shard_count`` defaults to Discord's recommendation and ``processes`` to
+    one per CPU; a single process runs in this one.
+    """
+    info = asyncio.run(fetch_gateway(token, api_base))
+    shard_count = shard_count or info["shards"]
+    max_concurrency = info.get("session_start_limit", {}).get("max_concurrency", 1)
+    groups = shard_groups(shard_count, processes or os.cpu_count() or 1)
+    log.info("Starting Gateway shards", shards=shard_count, processes=len(groups))
+    if len(groups) == 1:
+        _run_process(
+            token, info["url"], groups[0], shard_count, max_concurrency, api_base
+        )
+        return
+    outcomes: "queue.SimpleQueue[Optional[BaseException]]" = queue.SimpleQueue()
+    # Leaving the block terminates the other processes once one has failed.
+    with multiprocessing.Pool(len(groups)) as pool:
+        for group in groups:
+            pool.apply_async(
+                _run_process,
+                (token, info["url"], group, shard_count, max_concurrency, api_base),
+                callback=lambda _: outcomes.put(None),
+                error_callback=outcomes.put,
+            )
+        for _ in groups:
+            error = outcomes.get()
+            if error is not None:
+                raise error
@@ -0,0 +1,309 @@
+"""
+Per-channel roll history.
+
+Every roll is appended to a bounded in-memory ring buffer for its channel.
+When ``TROPHYBOT_HISTORY_DB`` names an SQLite file, rolls are also queued for a
+background writer thread that inserts them in batches, one transaction per
+batch, so a request never waits on disk. ``/history`` reads the ring buffer,
+which only holds the rolls this process served; with a database it reads the
+database too, so it sees every worker's rolls once they are written.
+:meth:`HistoryStore.export` streams the stored log as NDJSON a page at a time.
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, NamedTuple, Optional
+
+from trophybot.log import get_logger
+
+log = get_logger("history")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rolls (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    channel_id TEXT,
+    user_id TEXT,
+    user_name TEXT,
+    command TEXT,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rolls_channel ON rolls (channel_id, id);
+"""
+_INSERT = (
+    "INSERT INTO rolls (ts, channel_id, user_id, user_name, command, content) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_COLUMNS = "ts, channel_id, user_id, user_name, command, content"
+
+
+class HistoryEntry(NamedTuple):
+    """One roll as shown in the channel."""
+
+    ts: float
+    channel_id: Optional[str]
+    user_id: Optional[str]
+    user_name: Optional[str]
+    command: Optional[str]
+    content: str
+
+
+class HistoryStore:
+    """
+    Recent rolls per channel, optionally persisted to SQLite in batches.
+
+    The writer thread is started on first use in each process, like the
+    follow-up pool, so the store can be built before a pre-forking server forks.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        per_channel: int = 50,
+        max_channels: int = 1000,
+        batch_size: int = 200,
+        linger: float = 0.5,
+        max_queue: int = 10_000,
+    ):
+        """
+        Keep ``per_channel`` rolls for up to ``max_channels`` channels.
+
+        With ``db_path`` set, the writer commits up to ``batch_size`` rolls at
+        a time, waiting at most ``linger`` seconds to fill a batch. Rolls that
+        arrive while ``max_queue`` are already waiting are kept in memory only.
+        """
+        self.db_path = db_path
+        self.per_channel = per_channel
+        self.max_channels = max_channels
+        self.batch_size = batch_size
+        self.linger = linger
+        self._max_queue = max_queue
+        self._recent: "OrderedDict[Any, Deque[HistoryEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        # One read connection per thread (and process), for recent().
+        self._readers = threading.local()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, interaction: Any, content: str) -> HistoryEntry:
+        """Remember the roll ``content`` was sent in reply to ``interaction``."""
+        entry = HistoryEntry(
+            time.time(),
+            interaction.channel_id,
+            interaction.user_id,
+            interaction.user_name,
+            interaction.name,
+            content,
+        )
+        with self._lock:
+            rolls = self._recent.get(entry.channel_id)
+            if rolls is None:
+                rolls = self._recent[entry.channel_id] = deque(maxlen=self.per_channel)
+                if len(self._recent) > self.max_channels:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(entry.channel_id)
+            rolls.append(entry)
+        if self.db_path:
+            self._ensure_started()
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self.dropped += 1
+        return entry
+
+    def recent(self, channel_id: Optional[str], limit: int) -> List[HistoryEntry]:
+        """
+        Return up to ``limit`` of the channel's latest rolls, newest first.
+
+        With a database this includes every process's written rolls, plus this
+        process's rolls still waiting for the writer; it then reads SQLite, so
+        call it off the event loop.
+        """
+        with self._lock:
+            rolls = list(self._recent.get(channel_id, ()))
+        rolls.reverse()
+        if not self.db_path:
+            return rolls[:limit]
+        merged = set(self._recent_stored(channel_id, limit)).union(rolls[:limit])
+        return sorted(merged, key=lambda entry: entry.ts, reverse=True)[:limit]
+
+    def _recent_stored(self, channel_id, limit: int) -> List[HistoryEntry]:
+        import sqlite3
+
+        try:
+            conn = getattr(self._readers, "conn", None)
+            if conn is None or self._readers.pid != os.getpid():
+                conn = self._readers.conn = self._connect()
+                self._readers.pid = os.getpid()
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM rolls WHERE channel_id IS ? "
+                "ORDER BY id DESC LIMIT ?",
+                (channel_id, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            log.exception("Could not read roll history")
+            return []
+        return [HistoryEntry(*row) for row in rows]
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Nothing queued before a fork belongs to this process.
+            self._queue = queue.Queue(maxsize=self._max_queue)
+            self._writer = threading.Thread(
+                target=self._run_writer, name="history-writer", daemon=True
+            )
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def _connect(self, check_same_thread: bool = True):
+        # sqlite3 is imported on first use to keep it off the start-up path.
+        import sqlite3
+
+        assert self.db_path is not None
+        conn = sqlite3.connect(
+            self.db_path, timeout=10.0, check_same_thread=check_same_thread
+        )
+        # WAL lets exports (and other workers) read while a batch is written.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _next_batch(self) -> list:
+        """Block for one roll, then gather more until the batch or linger runs out."""
+        work_queue = self._queue
+        batch = [work_queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size and batch[-1] is not None:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(
+                    work_queue.get(timeout=remaining)
+                    if remaining > 0
+                    else work_queue.get_nowait()
+                )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_writer(self) -> None:
+        import sqlite3
+
+        conn = self._connect()
+        work_queue = self._queue
+        while True:
+            batch = self._next_batch()
+            rows = [entry for entry in batch if entry is not None]
+            try:
+                if rows:
+                    with conn:
+                        conn.executemany(_INSERT, rows)
+                    self.written += len(rows)
+            except sqlite3.Error:
+                self.failed += len(rows)
+                log.exception("Could not write roll history", rolls=len(rows))
+            finally:
+                for _ in batch:
+                    work_queue.task_done()
+            if len(rows) < len(batch):
+                conn.close()
+                return
+
+    def join(self) -> None:
+        """Block until every queued roll has been written."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Write any queued rolls, then stop the writer thread."""
+        if self._pid != os.getpid() or self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        self._pid = None
+
+    def export(
+        self, channel_id: Optional[str] = None, page_size: int = 500
+    ) -> Iterator[bytes]:
+        """
+        Yield the roll log as NDJSON, oldest first, one chunk per page.
+
+        Reads SQLite with keyset pagination, so memory use is bounded by
+        ``page_size`` however long the log is. Without a database the
+        in-memory history is exported instead.
+        """
+        if not self.db_path:
+            yield from self._export_recent(channel_id, page_size)
+            return
+        # The export may be resumed from a different thread for each page (the
+        # ASGI app reads pages off the event loop); it is never used concurrently.
+        conn = self._connect(check_same_thread=False)
+        try:
+            last_id = 0
+            while True:
+                if channel_id is None:
+                    rows = conn.execute(
+                        f"SELECT id, {_COLUMNS} FROM rolls WHERE id > ? "
+                        "ORDER BY id LIMIT ?",
+                        (last_id, page_size),
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        f"SELECT id, {_COLUMNS} FROM rolls "
+                        "WHERE channel_id = ? AND id > ? ORDER BY id LIMIT ?",
+                        (channel_id, last_id, page_size),
+                    ).fetchall()
+                if not rows:
+                    return
+                last_id = rows[-1][0]
+                yield _ndjson(HistoryEntry(*row[1:]) for row in rows)
+        finally:
+            conn.close()
+
+    def _export_recent(self, channel_id, page_size) -> Iterator[bytes]:
+        with self._lock:
+            channels = [channel_id] if channel_id is not None else list(self._recent)
+            entries = [e for c in channels for e in self._recent.get(c, ())]
+        entries.sort(key=lambda entry: entry.ts)
+        for start in range(0, len(entries), page_size):
+            yield _ndjson(entries[start : start + page_size])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return channel and writer counters."""
+        return {
+            "channels": len(self._recent),
+            "queue_depth": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+def _ndjson(entries) -> bytes:
+    return "".join(
+        json.dumps(entry._asdict(), ensure_ascii=False) + "\n" for entry in entries
+    ).encode()
+
+
+store = HistoryStore(
+    db_path=os.environ.get("TROPHYBOT_HISTORY_DB") or None,
+    per_channel=int(os.environ.get("TROPHYBOT_HISTORY_SIZE", "50")),
+    max_channels=int(os.environ.get("TROPHYBOT_HISTORY_CHANNELS", "1000")),
+)
+atexit.register(store.stop)
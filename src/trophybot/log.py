@@ -0,0 +1,142 @@
+"""
+Leveled, non-blocking structured logging.
+
+Request handlers log through :func:`get_logger`, which returns a standard
+:mod:`logging` logger wrapped so that keyword arguments become structured
+fields::
+
+    log.debug("routing command", command=name)
+
+Records below the configured level are dropped by the level check before any
+formatting happens. Records that pass are put on an in-memory queue without
+being formatted; a background :class:`logging.handlers.QueueListener` thread
+renders them as JSON lines (``severity``/``message`` as read by Cloud Logging)
+and writes them out, so handlers never block on stdout.
+
+The level comes from ``TROPHYBOT_LOG_LEVEL`` and defaults to ``WARNING``.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Any, Optional
+
+LOGGER_NAME = "trophybot"
+DEFAULT_LEVEL = "WARNING"
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Render ``record`` and its structured fields as JSON."""
+        entry = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "time": record.created,
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records as-is so formatting happens on the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger adapter that turns keyword arguments into structured fields."""
+
+    def process(self, msg, kwargs):
+        """Move non-logging keyword arguments into ``extra["fields"]``."""
+        fields = {
+            key: kwargs.pop(key)
+            for key in list(kwargs)
+            if key not in ("exc_info", "stack_info", "stacklevel", "extra")
+        }
+        if fields:
+            extra = kwargs.setdefault("extra", {})
+            extra["fields"] = fields
+        return msg, kwargs
+
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+# Where the listener writes, kept so a forked child can restart it.
+_stream: Any = None
+
+
+def _start_listener(stream) -> None:
+    global _listener, _stream
+    _stream = stream
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(
+        _queue, output, respect_handler_level=False
+    )
+    _listener.start()
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive fork(); start a fresh one in the child.
+    global _queue, _lock
+    _lock = threading.Lock()
+    if _listener is not None:
+        _queue = queue.SimpleQueue()
+        root = logging.getLogger(LOGGER_NAME)
+        for handler in root.handlers:
+            if isinstance(handler, _DeferredQueueHandler):
+                handler.queue = _queue
+        _start_listener(_stream)
+
+
+def stop() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def configure(level: Optional[str] = None, stream=None) -> logging.Logger:
+    """
+    Set up queue-based logging for the ``trophybot`` logger hierarchy.
+
+    Safe to call more than once; later calls only update the level.
+    """
+    root = logging.getLogger(LOGGER_NAME)
+    level_name = (
+        level or os.environ.get("TROPHYBOT_LOG_LEVEL") or DEFAULT_LEVEL
+    ).upper()
+    root.setLevel(level_name)
+    with _lock:
+        if _listener is None:
+            _start_listener(stream or sys.stdout)
+            root.handlers = [_DeferredQueueHandler(_queue)]
+            root.propagate = False
+    return root
+
+
+def get_logger(name: Optional[str] = None) -> StructuredLogger:
+    """Return a structured logger below the ``trophybot`` logger."""
+    full_name = f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME
+    return StructuredLogger(logging.getLogger(full_name), {})
+
+
+atexit.register(stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,478 @@
+"""
+Counters and fixed-bucket latency histograms in Prometheus text format.
+
+Recording never takes a lock: each thread adds into its own shard (a plain
+dict). Registering a thread's shard is a single dict assignment, and when the
+thread ends its shard is appended to a queue of retired shards; both are
+atomic under the GIL, so short-lived threads (Flask runs each async view on a
+new one) take no lock either. A scrape takes the lock to fold the retired
+shards into the process totals, then sums those and the live shards.
+
+Under a multi-process server (gunicorn workers) each process only sees its own
+shards, so when ``TROPHYBOT_METRICS_DIR`` is set every process also writes its
+totals to ``<dir>/<pid>.json`` every ``TROPHYBOT_METRICS_FLUSH_SECONDS``
+(default 5) and a scrape of any worker merges the other workers' snapshots in.
+When a worker exits, the master folds its snapshot into one cumulative
+``exited.json`` (:meth:`MetricsRegistry.retire`), so counters never go
+backwards when a worker is recycled and the directory holds one file per live
+worker; :meth:`MetricsRegistry.clear_snapshots` removes them all when the
+server starts.
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from trophybot.log import get_logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds, in seconds, for latency histograms.
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+log = get_logger("metrics")
+
+# (metric name, label values) -> counter value, or histogram cells
+_Key = Tuple[str, Tuple[Any, ...]]
+
+# Totals of exited workers, written by the gunicorn master.
+EXITED_SNAPSHOT = "exited.json"
+
+# Retired shards queued before a thread registering a new shard folds them in,
+# so the queue stays bounded even if nothing scrapes.
+FOLD_RETIRED_AFTER = 256
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels."""
+
+    __slots__ = ("name", "help", "labelnames", "_registry")
+    kind = "counter"
+
+    def __init__(self, registry, name: str, help: str, labelnames: Sequence[str]):
+        """Create a counter; use :meth:`MetricsRegistry.counter` instead."""
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+
+    def inc(self, *labels: Any, amount: int = 1) -> None:
+        """Add ``amount`` to the count for ``labels`` (one per label name)."""
+        shard = self._registry._shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+
+class Histogram:
+    """
+    Observed values counted into fixed buckets, optionally split by labels.
+
+    Each label set keeps one cell per bucket (plus +Inf) and a running sum;
+    buckets are only made cumulative when rendered.
+    """
+
+    __slots__ = ("name", "help", "labelnames", "buckets", "_registry")
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry,
+        name: str,
+        help: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float],
+    ):
+        """Create a histogram; use :meth:`MetricsRegistry.histogram` instead."""
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._registry = registry
+
+    def observe(self, value: float, *labels: Any) -> None:
+        """Record ``value`` for ``labels`` (one per label name)."""
+        shard = self._registry._shard()
+        key = (self.name, labels)
+        cells = shard.get(key)
+        if cells is None:
+            cells = shard[key] = [0] * (len(self.buckets) + 2)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+
+def _merge(totals: Dict[_Key, Any], items: Iterable[Tuple[_Key, Any]]) -> None:
+    for key, value in items:
+        if isinstance(value, list):
+            cells = totals.get(key)
+            if cells is None:
+                totals[key] = list(value)
+            else:
+                for i, cell in enumerate(value):
+                    cells[i] += cell
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+class _ShardOwner:
+    """Lives in a thread's local storage, so it is freed when the thread ends."""
+
+    __slots__ = ("__weakref__",)
+
+
+def _entries(totals: Dict[_Key, Any]) -> list:
+    return [[name, list(labels), value] for (name, labels), value in totals.items()]
+
+
+def _items(entries: list) -> Iterable[Tuple[_Key, Any]]:
+    return (((name, tuple(labels)), value) for name, labels, value in entries)
+
+
+def _load(path: str) -> Any:
+    """Return the JSON in ``path``, or None if it is missing or half-written."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _dump(path: str, data: Any) -> None:
+    """Replace ``path`` with ``data`` as JSON, atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Metric definitions plus the per-thread shards that record into them."""
+
+    def __init__(self, snapshot_dir: Optional[str] = None, flush_interval=5.0):
+        """Optionally share totals with other processes through ``snapshot_dir``."""
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, Any] = {}
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop every recorded value (run in a child process after fork)."""
+        self._local = threading.local()
+        # Live threads' shards, by id, ended threads' shards waiting to be
+        # folded, and the folded totals.
+        self._shards: Dict[int, Dict[_Key, Any]] = {}
+        self._retiring: "deque[Dict[_Key, Any]]" = deque()
+        self._retired: Dict[_Key, Any] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        """Define and return a :class:`Counter`."""
+        return self._define(Counter(self, name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Define and return a :class:`Histogram`."""
+        return self._define(Histogram(self, name, help, labelnames, buckets))
+
+    def _define(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already defined")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _shard(self) -> Dict[_Key, Any]:
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        # First record on this thread. Dict assignment is atomic, so
+        # registering the shard takes no lock.
+        shard: Dict[_Key, Any] = {}
+        owner = _ShardOwner()
+        weakref.finalize(owner, self._retiring.append, shard)
+        self._shards[id(shard)] = shard
+        self._local.shard = shard
+        self._local.owner = owner
+        if self.snapshot_dir and self._flusher is None:
+            self._start_flusher()
+        # Without scrapes retired shards would pile up; fold them here, but
+        # never wait for the lock to do it.
+        if len(self._retiring) >= FOLD_RETIRED_AFTER and self._lock.acquire(False):
+            try:
+                self._fold_retired()
+            finally:
+                self._lock.release()
+        return shard
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run_flusher, name="metrics-flush", daemon=True
+                )
+                self._flusher.start()
+
+    def _fold_retired(self) -> None:
+        # Called with the lock held: fold ended threads' shards into the
+        # retired totals. A shard registered before reset() (e.g. a parent
+        # thread's, after fork) is dropped instead.
+        while self._retiring:
+            shard = self._retiring.popleft()
+            if self._shards.pop(id(shard), None) is shard:
+                _merge(self._retired, shard.items())
+
+    def collect(self) -> Dict[_Key, Any]:
+        """Return this process's totals, summed over every thread."""
+        totals: Dict[_Key, Any] = {}
+        with self._lock:
+            # Only folding removes a shard from _shards, so each is counted
+            # once: either as live or in the retired totals.
+            self._fold_retired()
+            shards = list(self._shards.values())
+            _merge(totals, self._retired.items())
+        for shard in shards:
+            # Copying the items is atomic, so a thread recording meanwhile
+            # cannot break the iteration.
+            _merge(totals, list(shard.items()))
+        return totals
+
+    def _snapshot_path(self, pid: int) -> str:
+        assert self.snapshot_dir is not None
+        return os.path.join(self.snapshot_dir, f"{pid}.json")
+
+    def flush(self) -> None:
+        """Write this process's totals to its snapshot file, if configured."""
+        if not self.snapshot_dir:
+            return
+        _dump(self._snapshot_path(os.getpid()), _entries(self.collect()))
+
+    def _run_flusher(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                log.warning("Could not write metrics snapshot", error=e)
+
+    def clear_snapshots(self) -> None:
+        """Remove every process's snapshot file from ``snapshot_dir``."""
+        if not self.snapshot_dir or not os.path.isdir(self.snapshot_dir):
+            return
+        for name in os.listdir(self.snapshot_dir):
+            if name.endswith((".json", ".json.tmp")):
+                os.remove(os.path.join(self.snapshot_dir, name))
+
+    def _read_exited(self) -> Dict[str, Any]:
+        assert self.snapshot_dir is not None
+        exited = _load(os.path.join(self.snapshot_dir, EXITED_SNAPSHOT))
+        return exited or {"generation": 0, "folded": [], "entries": []}
+
+    def retire(self, pid: int) -> None:
+        """
+        Fold exited worker ``pid``'s snapshot into the exited-workers total.
+
+        Run by the gunicorn master once the worker has been reaped, so its pid
+        cannot have been reused yet.
+        """
+        if not self.snapshot_dir:
+            return
+        path = self._snapshot_path(pid)
+        entries = _load(path)
+        if entries is None:
+            return
+        exited = self._read_exited()
+        totals: Dict[_Key, Any] = {}
+        _merge(totals, _items(exited["entries"]))
+        _merge(totals, _items(entries))
+        generation = exited["generation"]
+        exited_path = os.path.join(self.snapshot_dir, EXITED_SNAPSHOT)
+        # Until the worker's own snapshot is gone, readers are told to skip it.
+        _dump(
+            exited_path,
+            {
+                "generation": generation + 1,
+                "folded": [pid],
+                "entries": _entries(totals),
+            },
+        )
+        os.remove(path)
+        _dump(
+            exited_path,
+            {"generation": generation + 2, "folded": [], "entries": _entries(totals)},
+        )
+
+    def _read_snapshots(self, totals: Dict[_Key, Any]) -> None:
+        assert self.snapshot_dir is not None
+        own = f"{os.getpid()}.json"
+        for _ in range(3):
+            exited = self._read_exited()
+            skip = {own, EXITED_SNAPSHOT} | {f"{pid}.json" for pid in exited["folded"]}
+            others: Dict[_Key, Any] = {}
+            _merge(others, _items(exited["entries"]))
+            for name in os.listdir(self.snapshot_dir):
+                if not name.endswith(".json") or name in skip:
+                    continue
+                entries = _load(os.path.join(self.snapshot_dir, name))
+                if entries is not None:
+                    # Otherwise removed or half-written; the next scrape catches up.
+                    _merge(others, _items(entries))
+            # A worker folded in meanwhile may have been missed: read again.
+            if self._read_exited()["generation"] == exited["generation"]:
+                break
+        _merge(totals, others.items())
+
+    def render(self) -> str:
+        """Render all metrics, including other processes' snapshots."""
+        totals = self.collect()
+        if self.snapshot_dir and os.path.isdir(self.snapshot_dir):
+            self._read_snapshots(totals)
+        by_metric: Dict[str, list] = {name: [] for name in self._metrics}
+        for (name, labels), value in totals.items():
+            if name in by_metric:
+                by_metric[name].append((labels, value))
+
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in sorted(by_metric[name], key=lambda x: str(x[0])):
+                if metric.kind == "counter":
+                    lines.append(
+                        f"{name}{_labels(metric.labelnames, labels)} {_number(value)}"
+                    )
+                else:
+                    lines.extend(self._histogram_lines(metric, labels, value))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(metric: Histogram, labels, cells) -> List[str]:
+        names, name = metric.labelnames, metric.name
+        lines = []
+        cumulative = 0
+        bounds = [_number(float(b)) for b in metric.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, cells):
+            cumulative += count
+            le = _labels(names, labels, f'le="{bound}"')
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        lines.append(f"{name}_sum{_labels(names, labels)} {_number(cells[-1])}")
+        lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+        return lines
+
+
+registry = MetricsRegistry(
+    snapshot_dir=os.environ.get("TROPHYBOT_METRICS_DIR") or None,
+    flush_interval=float(os.environ.get("TROPHYBOT_METRICS_FLUSH_SECONDS", "5")),
+)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset)
+
+# The metrics recorded by the interactions endpoint and command registry.
+verifications = registry.counter(
+    "trophybot_verifications_total",
+    "Interaction requests by verification outcome.",
+    ["outcome"],
+)
+requests = registry.counter(
+    "trophybot_requests_total",
+    "Interaction requests by response status.",
+    ["status"],
+)
+request_seconds = registry.histogram(
+    "trophybot_request_duration_seconds",
+    "Time to verify, dispatch and answer an interaction request.",
+)
+duplicates = registry.counter(
+    "trophybot_duplicate_deliveries_total",
+    "Redelivered interactions answered from the response cache, by cache key.",
+    ["key"],
+)
+rate_limited = registry.counter(
+    "trophybot_rate_limited_total",
+    "Commands turned away by the rate limiter, by the scope that was exhausted.",
+    ["scope"],
+)
+interactions = registry.counter(
+    "trophybot_interactions_total",
+    "Verified interactions by payload type.",
+    ["type"],
+)
+commands = registry.counter(
+    "trophybot_commands_total",
+    "Slash commands handled, by command name.",
+    ["command"],
+)
+command_seconds = registry.histogram(
+    "trophybot_command_duration_seconds",
+    "Time spent in each slash-command handler.",
+    ["command"],
+)
+shed = registry.counter(
+    "trophybot_shed_total",
+    "Interactions turned away by admission control, by reason.",
+    ["reason"],
+)
+request_age_seconds = registry.histogram(
+    "trophybot_request_age_seconds",
+    "Age of interactions on admission, from X-Signature-Timestamp (1 s "
+    "resolution): the time spent queued before reaching a handler.",
+    buckets=(0.5, 1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0, 5.0, 10.0),
+)
+in_flight = registry.histogram(
+    "trophybot_in_flight_interactions",
+    "Interactions already in progress in this process when one is admitted.",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128),
+)
+followups = registry.counter(
+    "trophybot_followups_total",
+    "Deferred interactions by outcome: queued, rejected because the queue was "
+    "full, completed or failed.",
+    ["outcome"],
+)
+followup_queue_depth = registry.histogram(
+    "trophybot_followup_queue_depth",
+    "Deferred interactions already waiting in this process when one is queued.",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+ack_to_followup_seconds = registry.histogram(
+    "trophybot_ack_to_followup_seconds",
+    "Time from the deferred acknowledgement to the follow-up edit.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
@@ -0,0 +1,139 @@
+"""
+Exact outcome probabilities for Trophy light/dark dice pools.
+
+For a pool of ``light`` light dice and ``dark`` dark dice, the highest die is
+``m`` with dark colour when the highest dark die is ``m`` and no light die
+exceeds it (dark wins ties), and with light colour when the highest light die
+is ``m`` and every dark die is below it. Counting outcomes gives closed forms::
+
+    dark(m)  = (m**dark - (m - 1)**dark) * m**light
+    light(m) = (m**light - (m - 1)**light) * (m - 1)**dark
+
+out of ``6 ** (light + dark)`` equally likely rolls. Tables are memoized per
+``(light, dark)``.
+
+Exact counts grow with the pool (``6 ** (light + dark)`` has a digit per 1.3
+dice), so :func:`pool_probabilities`, which the ``/odds`` reply uses, only
+counts pools up to EXACT_POOL_LIMIT dice and evaluates the same closed forms
+in floating point, with ``m / 6`` in place of ``m``, for larger ones.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+FACES = range(1, 7)
+
+# Pools up to this many dice get exact probabilities from pool_odds.
+EXACT_POOL_LIMIT = 100
+
+
+class PoolOdds(NamedTuple):
+    """Outcome counts for the highest die of a light/dark pool."""
+
+    light: int
+    dark: int
+    total: int
+    # Index ``face - 1`` holds the number of rolls whose highest die is that face
+    # and colour.
+    light_counts: Tuple[int, ...]
+    dark_counts: Tuple[int, ...]
+
+    def probability(self, face: int, colour: Optional[str] = None) -> Fraction:
+        """Return the probability that the highest die is ``face`` (and colour)."""
+        if colour == "Light":
+            count = self.light_counts[face - 1]
+        elif colour == "Dark":
+            count = self.dark_counts[face - 1]
+        else:
+            count = self.light_counts[face - 1] + self.dark_counts[face - 1]
+        return Fraction(count, self.total)
+
+    def dark_probability(self) -> Fraction:
+        """Return the probability that the highest die is dark."""
+        return Fraction(sum(self.dark_counts), self.total)
+
+
+class PoolProbabilities(NamedTuple):
+    """Highest-die probabilities of a light/dark pool, as floats."""
+
+    light: int
+    dark: int
+    # Index ``face - 1`` holds the probability that the highest die is that face
+    # and colour.
+    light_probabilities: Tuple[float, ...]
+    dark_probabilities: Tuple[float, ...]
+
+    def probability(self, face: int, colour: Optional[str] = None) -> float:
+        """Return the probability that the highest die is ``face`` (and colour)."""
+        light = self.light_probabilities[face - 1]
+        dark = self.dark_probabilities[face - 1]
+        if colour == "Light":
+            return light
+        if colour == "Dark":
+            return dark
+        return light + dark
+
+    def dark_probability(self) -> float:
+        """Return the probability that the highest die is dark."""
+        return sum(self.dark_probabilities)
+
+
+@lru_cache(maxsize=256)
+def pool_odds(light: int, dark: int) -> PoolOdds:
+    """Return the exact highest-die distribution for ``light`` and ``dark`` dice."""
+    if light < 0 or dark < 0:
+        raise ValueError("Dice counts must not be negative")
+    if light == 0 and dark == 0:
+        return PoolOdds(0, 0, 1, (0,) * 6, (0,) * 6)
+    light_counts = []
+    dark_counts = []
+    for m in FACES:
+        if light:
+            light_counts.append((m**light - (m - 1) ** light) * (m - 1) ** dark)
+        else:
+            light_counts.append(0)
+        if dark:
+            dark_counts.append((m**dark - (m - 1) ** dark) * m**light)
+        else:
+            dark_counts.append(0)
+    return PoolOdds(
+        light, dark, 6 ** (light + dark), tuple(light_counts), tuple(dark_counts)
+    )
+
+
+def _float_probabilities(light: int, dark: int) -> PoolProbabilities:
+    """Evaluate the closed forms in floating point: constant time in pool size."""
+    light_probabilities = []
+    dark_probabilities = []
+    for m in FACES:
+        upto, below = m / 6, (m - 1) / 6
+        light_probabilities.append(
+            (upto**light - below**light) * below**dark if light else 0.0
+        )
+        dark_probabilities.append(
+            (upto**dark - below**dark) * upto**light if dark else 0.0
+        )
+    return PoolProbabilities(
+        light, dark, tuple(light_probabilities), tuple(dark_probabilities)
+    )
+
+
+@lru_cache(maxsize=256)
+def pool_probabilities(light: int, dark: int) -> PoolProbabilities:
+    """
+    Return the highest-die distribution for ``light`` and ``dark`` dice.
+
+    Exact (then rounded) up to EXACT_POOL_LIMIT dice, floating point above it.
+    """
+    if light < 0 or dark < 0:
+        raise ValueError("Dice counts must not be negative")
+    if light + dark > EXACT_POOL_LIMIT:
+        return _float_probabilities(light, dark)
+    table = pool_odds(light, dark)
+    return PoolProbabilities(
+        light,
+        dark,
+        tuple(float(table.probability(face, "Light")) for face in FACES),
+        tuple(float(table.probability(face, "Dark")) for face in FACES),
+    )
@@ -0,0 +1,107 @@
+"""
+Dice expressions for the ``/dice`` command.
+
+An expression is one or more rolls separated by ``;``, each optionally
+repeated with ``x<n>``::
+
+    2L3D x5          five rolls of 2 light and 3 dark dice
+    gold 4           four gold dice, totalled
+    combat 3 vs 7    three dark dice, two highest against endurance 7
+    d6               a single die
+    2L3D; gold 4     one pool roll, then one gold roll
+
+Case and spacing are ignored. :func:`compile_expression` turns the text into a
+tuple of :class:`Roll` and caches the result, so repeated expressions (a table
+rolling the same pool all session) are parsed once.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+# Limits keep one reply within Discord's 2,000-character message limit.
+MAX_ROLLS = 20
+MAX_DICE = 300
+MAX_LENGTH = 200
+
+# Numbers are at most four digits: anything longer is over the limits anyway,
+# and int() refuses very long digit strings with a plain ValueError.
+_REPEAT = re.compile(r"^(?P<body>.*?)\s*[x×]\s*(?P<times>\d{1,4})$")
+_POOL = re.compile(r"^(?:(?P<light>\d{1,4})\s*l)?\s*(?:(?P<dark>\d{1,4})\s*d)?$")
+_GOLD = re.compile(r"^gold\s*(?P<count>\d{1,4})$")
+_COMBAT = re.compile(r"^combat\s*(?P<dark>\d{1,4})\s*vs\s*(?P<endurance>\d{1,4})$")
+
+
+class ExpressionError(ValueError):
+    """Raised for text that is not a valid dice expression."""
+
+
+class Roll(NamedTuple):
+    """One compiled roll: what to roll and which rule reads the result."""
+
+    kind: str  # "d6", "pool", "gold" or "combat"
+    light: int = 0
+    dark: int = 0
+    gold: int = 0
+    endurance: int = 0
+
+    @property
+    def dice(self) -> int:
+        """Return the number of dice this roll needs."""
+        return 1 if self.kind == "d6" else self.light + self.dark + self.gold
+
+
+def _compile_roll(text: str) -> Roll:
+    if text == "d6":
+        return Roll("d6")
+    match = _GOLD.match(text)
+    if match:
+        count = int(match["count"])
+        if count <= 0:
+            raise ExpressionError("gold needs at least one die")
+        return Roll("gold", gold=count)
+    match = _COMBAT.match(text)
+    if match:
+        dark, endurance = int(match["dark"]), int(match["endurance"])
+        if dark <= 0:
+            raise ExpressionError("combat needs at least one dark die")
+        return Roll("combat", dark=dark, endurance=endurance)
+    match = _POOL.match(text)
+    if match and (match["light"] or match["dark"]):
+        light, dark = int(match["light"] or 0), int(match["dark"] or 0)
+        if light + dark <= 0:
+            raise ExpressionError(f"no dice to roll in {text!r}")
+        return Roll("pool", light=light, dark=dark)
+    raise ExpressionError(f"can't read {text!r}")
+
+
+@lru_cache(maxsize=512)
+def compile_expression(text: str) -> Tuple[Roll, ...]:
+    """
+    Compile ``text`` into the rolls it describes, in order.
+
+    Raises ExpressionError if the text is longer than MAX_LENGTH characters,
+    is not an expression or asks for more than MAX_ROLLS rolls or MAX_DICE
+    dice in total.
+    """
+    if len(text) > MAX_LENGTH:
+        raise ExpressionError(f"expressions are at most {MAX_LENGTH} characters")
+    rolls: List[Roll] = []
+    for part in text.lower().split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        times = 1
+        match = _REPEAT.match(part)
+        if match:
+            part, times = match["body"], int(match["times"])
+            if times <= 0:
+                raise ExpressionError("repeat count must be at least 1")
+        if len(rolls) + times > MAX_ROLLS:
+            raise ExpressionError(f"at most {MAX_ROLLS} rolls at once")
+        rolls.extend([_compile_roll(part)] * times)
+    if not rolls:
+        raise ExpressionError("empty expression")
+    if sum(roll.dice for roll in rolls) > MAX_DICE:
+        raise ExpressionError(f"at most {MAX_DICE} dice at once")
+    return tuple(rolls)
@@ -0,0 +1,109 @@
+"""
+Per-user and per-guild token-bucket rate limiting.
+
+Each key (a user or guild ID) gets a bucket holding up to ``burst`` tokens that
+refills at ``rate`` tokens per second; a command spends one. Buckets live in an
+OrderedDict kept in least-recently-used order, so lookup, refill and eviction
+of the idlest bucket are all O(1), and memory is capped at ``max_entries``
+buckets per scope. An evicted key simply starts again with a full bucket.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+DEFAULT_MAX_ENTRIES = 10_000
+
+
+class TokenBucketLimiter:
+    """Token buckets for one scope, in a bounded LRU mapping."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Allow ``burst`` requests at once per key, refilled at ``rate``/s."""
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self._clock = clock
+        # key -> [tokens, last refill time]
+        self._buckets: "OrderedDict[Any, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of buckets held."""
+        return len(self._buckets)
+
+    def allow(self, key: Any) -> bool:
+        """Spend a token for ``key``, returning False if its bucket is empty."""
+        now = self._clock()
+        buckets = self._buckets
+        with self._lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [self.burst, now]
+                if len(buckets) > self.max_entries:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                tokens = bucket[0] + (now - bucket[1]) * self.rate
+                bucket[0] = tokens if tokens < self.burst else self.burst
+                bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+
+class RateLimiter:
+    """Applies a per-user and a per-guild limit to each interaction."""
+
+    def __init__(
+        self,
+        user: Optional[TokenBucketLimiter] = None,
+        guild: Optional[TokenBucketLimiter] = None,
+    ):
+        """Limit by user and/or guild; a scope given as None is unlimited."""
+        self.user = user
+        self.guild = guild
+
+    @classmethod
+    def from_env(cls, environ) -> "RateLimiter":
+        """
+        Build limits from ``TROPHYBOT_{USER,GUILD}_{RATE,BURST}``.
+
+        Rates are commands per second; a rate of 0 turns that scope off.
+        ``TROPHYBOT_RATELIMIT_ENTRIES`` caps the buckets held per scope.
+        """
+        max_entries = int(
+            environ.get("TROPHYBOT_RATELIMIT_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+
+        def scope(name, rate, burst):
+            rate = float(environ.get(f"TROPHYBOT_{name}_RATE", rate))
+            burst = float(environ.get(f"TROPHYBOT_{name}_BURST", burst))
+            if rate <= 0:
+                return None
+            return TokenBucketLimiter(rate, burst, max_entries)
+
+        return cls(user=scope("USER", 1, 5), guild=scope("GUILD", 20, 100))
+
+    def check(self, interaction) -> Optional[str]:
+        """
+        Return the scope ("user" or "guild") that is over its limit, or None.
+
+        The user is checked first, so a single user who is being limited does
+        not also drain their guild's bucket.
+        """
+        if self.user is not None and interaction.user_id is not None:
+            if not self.user.allow(interaction.user_id):
+                return "user"
+        if self.guild is not None and interaction.guild_id is not None:
+            if not self.guild.allow(interaction.guild_id):
+                return "guild"
+        return None
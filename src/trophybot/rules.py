@@ -0,0 +1,37 @@
+"""
+Trophy outcome rules, shared by the bot's commands and the simulator.
+
+Each rule works on the highest dice or face counts of a roll, so it applies
+equally to a handful of dice in a reply and to millions of simulated pools.
+"""
+
+from typing import List, Tuple
+
+import trophybot.dice
+
+
+def highest_die(highest_light: int, highest_dark: int) -> Tuple[str, int]:
+    """
+    Return the colour and value of a pool's deciding die.
+
+    Either argument may be 0 when no dice of that colour were rolled. Per the
+    rules, dark dice win ties with light dice.
+    """
+    if highest_dark and highest_dark >= highest_light:
+        return "Dark", highest_dark
+    return "Light", highest_light
+
+
+def combat_dice(counts: trophybot.dice.Histogram) -> List[int]:
+    """Return the dark dice that count in combat: the two highest."""
+    return trophybot.dice.histogram_top(counts, 2)
+
+
+def defeats(total: int, endurance: int) -> bool:
+    """Return whether a combat total beats a monster's endurance."""
+    return total >= endurance
+
+
+def gold_total(counts: trophybot.dice.Histogram) -> int:
+    """Return the gold a roll is worth: the sum of its dice."""
+    return trophybot.dice.histogram_total(counts)
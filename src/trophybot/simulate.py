@@ -0,0 +1,326 @@
+"""
+Monte Carlo simulator for Trophy rolls.
+
+Simulates millions of risk rolls (light and dark pools), combat rolls against a
+monster's endurance, or gold rolls, and reports the outcome distribution::
+
+    python -m trophybot.simulate risk --light 2 --dark 1 --rolls 10000000
+    python -m trophybot.simulate combat --dark 3 --endurance 9 --format json
+    python -m trophybot.simulate gold --count 4 --output gold.csv
+
+Pools are generated in vectorised batches with NumPy when it is installed (the
+``simulate`` extra), falling back to the bot's own dice engine otherwise, and
+the work is split across a process pool. Each batch is reduced to the raw
+statistics the rules need (highest light and dark die, the two highest dark
+dice, or the total), and the outcome rules from :mod:`trophybot.rules`, the same
+functions the bot's commands use, are applied once per distinct statistic when
+the results are summarised. Results go to stdout or ``--output`` as CSV or
+JSON; throughput is reported on stderr.
+"""
+
+import argparse
+import csv
+import json
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import trophybot.dice
+import trophybot.odds
+import trophybot.rules
+
+# Dice generated per vectorised batch, bounding each worker's memory.
+BATCH_DICE = 1 << 20
+# Work items per worker, so faster workers pick up the slack.
+CHUNKS_PER_WORKER = 4
+
+
+class Simulation(NamedTuple):
+    """What to simulate: a mode and its dice."""
+
+    mode: str  # "risk", "combat" or "gold"
+    light: int = 0
+    dark: int = 0
+    gold: int = 0
+    endurance: int = 0
+
+    @property
+    def dice(self) -> int:
+        """Return the number of dice in each roll."""
+        return self.light + self.dark + self.gold
+
+    @property
+    def bins(self) -> int:
+        """Return the number of distinct raw statistics a roll can produce."""
+        return 6 * self.dice + 1 if self.mode == "gold" else 49
+
+
+def _numpy():
+    """Return the numpy module, or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def statistics_numpy(sim: Simulation, faces) -> Any:
+    """
+    Reduce a ``(rolls, dice)`` array of faces to one statistic index per roll.
+
+    Risk rolls give ``highest_light * 7 + highest_dark`` and combat rolls
+    ``highest * 7 + second_highest`` (0 for a missing die); gold rolls give
+    the total.
+    """
+    np = _numpy()
+    if sim.mode == "gold":
+        return faces.sum(axis=1, dtype=np.int64)
+    if sim.mode == "risk":
+        zeros = np.zeros(faces.shape[0], dtype=np.int64)
+        light = faces[:, : sim.light].max(axis=1) if sim.light else zeros
+        dark = faces[:, sim.light :].max(axis=1) if sim.dark else zeros
+        return light.astype(np.int64) * 7 + dark
+    if sim.dark == 1:
+        return faces[:, 0].astype(np.int64) * 7
+    ordered = np.partition(faces, sim.dark - 2, axis=1)
+    return ordered[:, -1].astype(np.int64) * 7 + ordered[:, -2]
+
+
+def statistic_python(sim: Simulation, backend) -> int:
+    """Roll once with ``backend`` and return its statistic index."""
+    if sim.mode == "gold":
+        counts = trophybot.dice.roll_histogram(sim.dice, backend=backend)
+        return trophybot.dice.histogram_total(counts)
+    if sim.mode == "risk":
+        light = trophybot.dice.roll_histogram(sim.light, backend=backend)
+        dark = trophybot.dice.roll_histogram(sim.dark, backend=backend)
+        return trophybot.dice.histogram_highest(
+            light
+        ) * 7 + trophybot.dice.histogram_highest(dark)
+    top = trophybot.dice.histogram_top(
+        trophybot.dice.roll_histogram(sim.dark, backend=backend), 2
+    )
+    return top[0] * 7 + (top[1] if len(top) > 1 else 0)
+
+
+def simulate_chunk(sim: Simulation, rolls: int, seed: int, chunk: int) -> List[int]:
+    """Simulate ``rolls`` rolls and return the count of each statistic index."""
+    np = _numpy()
+    if np is None:
+        backend = trophybot.dice.SeededPool(f"{seed}:{chunk}")
+        counts = [0] * sim.bins
+        for _ in range(rolls):
+            counts[statistic_python(sim, backend)] += 1
+        return counts
+
+    rng = np.random.default_rng([seed, chunk])
+    batch = max(1, BATCH_DICE // sim.dice)
+    totals = np.zeros(sim.bins, dtype=np.int64)
+    remaining = rolls
+    while remaining > 0:
+        size = min(batch, remaining)
+        faces = rng.integers(1, 7, size=(size, sim.dice), dtype=np.uint8)
+        totals += np.bincount(statistics_numpy(sim, faces), minlength=sim.bins)
+        remaining -= size
+    return totals.tolist()
+
+
+def _chunks(rolls: int, workers: int) -> List[int]:
+    pieces = max(1, min(rolls, workers * CHUNKS_PER_WORKER))
+    size, extra = divmod(rolls, pieces)
+    return [size + (1 if i < extra else 0) for i in range(pieces)]
+
+
+def run(
+    sim: Simulation, rolls: int, workers: int = 1, seed: Optional[int] = None
+) -> List[int]:
+    """
+    Simulate ``rolls`` rolls across ``workers`` processes.
+
+    Returns the count of each statistic index. The same seed gives the same
+    counts for the same number of workers.
+    """
+    seed = secrets.randbits(63) if seed is None else seed
+    sizes = _chunks(rolls, workers)
+    totals = [0] * sim.bins
+    if workers <= 1:
+        for i, size in enumerate(sizes):
+            counts = simulate_chunk(sim, size, seed, i)
+            totals = [a + b for a, b in zip(totals, counts)]
+        return totals
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(simulate_chunk, sim, size, seed, i)
+            for i, size in enumerate(sizes)
+        ]
+        # Aggregate as chunks finish rather than holding every result.
+        for future in as_completed(futures):
+            totals = [a + b for a, b in zip(totals, future.result())]
+    return totals
+
+
+def _decode_pair(index: int):
+    return divmod(index, 7)
+
+
+def _outcome(sim: Simulation, index: int) -> Any:
+    """Apply the bot's outcome rule to one statistic index."""
+    if sim.mode == "risk":
+        return trophybot.rules.highest_die(*_decode_pair(index))
+    if sim.mode == "combat":
+        top = trophybot.rules.combat_dice(
+            trophybot.dice.histogram(f for f in _decode_pair(index) if f)
+        )
+        return sum(top)
+    return index
+
+
+def outcomes(sim: Simulation, counts: List[int]) -> List[Dict[str, Any]]:
+    """Apply the bot's outcome rules to aggregated statistics."""
+    rolls = sum(counts)
+    merged: Dict[Any, int] = {}
+    for index, count in enumerate(counts):
+        if count:
+            key = _outcome(sim, index)
+            merged[key] = merged.get(key, 0) + count
+
+    rows = []
+    if sim.mode == "risk":
+        exact = trophybot.odds.pool_odds(sim.light, sim.dark)
+        for colour in ("Dark", "Light"):
+            for face in range(6, 0, -1):
+                count = merged.get((colour, face), 0)
+                rows.append(
+                    {
+                        "colour": colour,
+                        "face": face,
+                        "count": count,
+                        "probability": count / rolls,
+                        "exact": float(exact.probability(face, colour)),
+                    }
+                )
+    elif sim.mode == "combat":
+        for total in sorted(merged):
+            rows.append(
+                {
+                    "total": total,
+                    "defeated": trophybot.rules.defeats(total, sim.endurance),
+                    "count": merged[total],
+                    "probability": merged[total] / rolls,
+                }
+            )
+    else:
+        for total in sorted(merged):
+            rows.append(
+                {
+                    "gold": total,
+                    "count": merged[total],
+                    "probability": merged[total] / rolls,
+                }
+            )
+    return rows
+
+
+def summary(sim: Simulation, rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Return the headline figure for a simulation's outcome rows."""
+    if sim.mode == "risk":
+        return {
+            "dark_probability": sum(
+                row["probability"] for row in rows if row["colour"] == "Dark"
+            )
+        }
+    if sim.mode == "combat":
+        return {
+            "defeat_probability": sum(
+                row["probability"] for row in rows if row["defeated"]
+            )
+        }
+    return {"mean_gold": sum(row["gold"] * row["probability"] for row in rows)}
+
+
+def write_csv(rows: List[Dict[str, Any]], stream) -> None:
+    """Write outcome rows as CSV, one row at a time."""
+    writer = csv.DictWriter(stream, fieldnames=list(rows[0]))
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m trophybot.simulate",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    modes = parser.add_subparsers(dest="mode", required=True)
+    risk = modes.add_parser("risk", help="highest die of a light/dark pool")
+    risk.add_argument("--light", type=int, default=0)
+    risk.add_argument("--dark", type=int, default=1)
+    combat = modes.add_parser("combat", help="two highest dark dice vs endurance")
+    combat.add_argument("--dark", type=int, required=True)
+    combat.add_argument("--endurance", type=int, required=True)
+    gold = modes.add_parser("gold", help="total of a gold roll")
+    gold.add_argument("--count", type=int, required=True)
+    for sub in (risk, combat, gold):
+        sub.add_argument("--rolls", type=int, default=1_000_000)
+        sub.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        sub.add_argument("--seed", type=int, help="seed for reproducible results")
+        sub.add_argument("--format", choices=("csv", "json"), default="csv")
+        sub.add_argument("--output", help="write results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.mode == "risk":
+        sim = Simulation("risk", light=args.light, dark=args.dark)
+    elif args.mode == "combat":
+        sim = Simulation("combat", dark=args.dark, endurance=args.endurance)
+    else:
+        sim = Simulation("gold", gold=args.count)
+    if sim.dice <= 0 or min(sim.light, sim.dark) < 0 or args.rolls <= 0:
+        parser.error("need a positive number of dice and rolls")
+    if sim.mode == "combat" and sim.dark <= 0:
+        parser.error("combat needs at least one dark die")
+    return args, sim
+
+
+def main(argv=None) -> None:
+    """Run a simulation from the command line."""
+    args, sim = _parse_args(argv)
+    start = time.perf_counter()
+    counts = run(sim, args.rolls, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    rows = outcomes(sim, counts)
+    engine = "numpy" if _numpy() is not None else "python"
+    rate = args.rolls / elapsed
+
+    stream = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            result = {
+                "simulation": sim._asdict(),
+                "rolls": args.rolls,
+                "seconds": elapsed,
+                "rolls_per_second": rate,
+                "engine": engine,
+                "workers": args.workers,
+                "summary": summary(sim, rows),
+                "outcomes": rows,
+            }
+            json.dump(result, stream, indent=2)
+            stream.write("\n")
+        else:
+            write_csv(rows, stream)
+    finally:
+        if args.output:
+            stream.close()
+    print(
+        f"{args.rolls:,} {sim.mode} rolls in {elapsed:.2f}s "
+        f"({rate:,.0f} rolls/s, {engine}, {args.workers} workers)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
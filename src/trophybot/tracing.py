@@ -0,0 +1,106 @@
+"""
+Per-request stage timings, reported in a ``Server-Timing`` header.
+
+A request being traced holds a :class:`Trace` in a context variable, and
+instrumented code times its stages with :func:`span`::
+
+    with tracing.span("verify"):
+        ...
+
+Time spent in spans of the same name is summed, so a handler that rolls two
+pools reports one ``dice`` entry. Outside a trace, :func:`span` returns a
+shared no-op context manager: the cost is one context-variable lookup. Tracing
+is turned on with ``TROPHYBOT_SERVER_TIMING=1``, and is also active for
+requests picked by the profiler (see :mod:`trophybot.profiling`).
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+enabled = os.environ.get("TROPHYBOT_SERVER_TIMING") == "1"
+
+
+class Trace:
+    """Total time per stage name for one request."""
+
+    __slots__ = ("start", "durations", "total")
+
+    def __init__(self):
+        """Start timing a request."""
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.total: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add ``seconds`` to the stage called ``name``."""
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def finish(self) -> None:
+        """Record the request's total time."""
+        self.total = time.perf_counter() - self.start
+
+    def header(self) -> str:
+        """Render the stages, in the order they started, as a Server-Timing value."""
+        entries = dict(self.durations)
+        if self.total is not None:
+            entries["total"] = self.total
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in entries.items()
+        )
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trophybot_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("_name", "_trace", "_start")
+
+    def __init__(self, name: str, trace: Trace):
+        self._name = name
+        self._trace = trace
+
+    def __enter__(self):
+        # Claim the stage's slot now, so stages are listed in the order they start.
+        self._trace.durations.setdefault(self._name, 0.0)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._trace.add(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """Return a context manager timing the ``name`` stage of the current trace."""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(name, trace)
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Trace the enclosed request; spans inside it are recorded on the Trace."""
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        current.finish()
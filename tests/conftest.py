@@ -0,0 +1,34 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+
+@pytest.fixture
+def fake_api():
+    """
+    Start local HTTP servers standing in for Discord's API.
+
+    Returns a factory taking a request handler class and initial server
+    attributes (readable from the handler as ``self.server.<name>``). Each
+    server listens on a free port, exposes its base URL as ``url`` and is shut
+    down when the test ends.
+    """
+    servers = []
+
+    def start(handler_cls, **attributes):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_cls)
+        for name, value in attributes.items():
+            setattr(server, name, value)
+        server.url = f"http://127.0.0.1:{server.server_address[1]}"
+        thread = threading.Thread(
+            target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        thread.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
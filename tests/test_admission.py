@@ -0,0 +1,68 @@
+import pytest
+
+from trophybot.admission import AdmissionController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_age_is_measured_from_the_signature_timestamp():
+    clock = FakeClock()
+    admission = AdmissionController(clock=clock)
+    clock.now = 1002.25
+    assert admission.age("1000") == 2.25
+    # A timestamp slightly ahead of our clock is treated as brand new.
+    assert admission.age("1003") == 0.0
+
+
+@pytest.mark.parametrize(
+    "age, expected",
+    [
+        (0.0, None),
+        (2.9, None),
+        # Could still have been signed 2.4 s ago: not shed.
+        (3.4, None),
+        (3.6, "deadline"),
+        (30.0, "deadline"),
+    ],
+)
+def test_deadline_allows_for_timestamp_resolution(age, expected):
+    admission = AdmissionController(deadline=3.0, margin=0.5)
+    assert admission.admit(age) == expected
+    assert admission.in_flight == (0 if expected else 1)
+
+
+def test_capacity_caps_in_flight_interactions():
+    admission = AdmissionController(max_in_flight=2)
+    assert admission.admit(0) is None
+    assert admission.admit(0) is None
+    assert admission.admit(0) == "capacity"
+    assert admission.in_flight == 2
+    admission.release()
+    assert admission.admit(0) is None
+
+
+def test_zero_disables_both_checks():
+    admission = AdmissionController(max_in_flight=0, deadline=0)
+    assert all(admission.admit(100.0) is None for _ in range(1000))
+
+
+def test_from_env():
+    admission = AdmissionController.from_env(
+        {
+            "TROPHYBOT_MAX_IN_FLIGHT": "8",
+            "TROPHYBOT_DEADLINE_SECONDS": "2.5",
+            "TROPHYBOT_DEADLINE_MARGIN": "0.25",
+        }
+    )
+    assert (admission.max_in_flight, admission.deadline, admission.margin) == (
+        8,
+        2.5,
+        0.25,
+    )
+    assert AdmissionController.from_env({}).max_in_flight == 64
@@ -0,0 +1,51 @@
+import pytest
+from nacl.signing import SigningKey
+
+from trophybot.applications import ApplicationTable
+from trophybot.commands import registry
+
+KEY = SigningKey.generate().verify_key.encode().hex()
+
+
+def test_lookup_by_application_id():
+    table = ApplicationTable()
+    table.add("111", KEY, registry)
+    assert table.get("111").verify_key.encode().hex() == KEY
+    assert table.get("222") is None
+    assert table.get(None) is None
+    assert len(table) == 1
+
+
+def test_command_sets():
+    table = ApplicationTable()
+    table.add("111", KEY, registry)
+    table.add("222", KEY, registry, ["roll", "odds"])
+    assert table.commands_for("111", registry) is registry
+    restricted = table.commands_for("222", registry)
+    assert [schema["name"] for schema in restricted.schemas()] == ["roll", "odds"]
+    assert "gold" not in restricted
+    assert table.commands_for("333", registry) is registry
+
+
+def test_subset_rejects_unknown_commands():
+    with pytest.raises(ValueError, match="banana"):
+        registry.subset(["roll", "banana"])
+
+
+@pytest.mark.parametrize("public_key", ["not hex", "abcd"])
+def test_malformed_key_names_the_application(public_key):
+    with pytest.raises(ValueError, match="application 111"):
+        ApplicationTable().add("111", public_key, registry)
+
+
+def test_from_json():
+    table = ApplicationTable.from_json(
+        '{"111": {"public_key": "%s"}, "222": {"public_key": "%s", '
+        '"commands": ["gold"]}}' % (KEY, KEY),
+        registry,
+    )
+    assert len(table) == 2
+    assert [s["name"] for s in table.commands_for("222", registry).schemas()] == [
+        "gold"
+    ]
+    assert len(ApplicationTable.from_json(None, registry)) == 0
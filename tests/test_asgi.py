@@ -0,0 +1,201 @@
+import json
+
+import pytest
+
+import asgi
+import main
+import trophybot.history
+from tests.test_interactions import TEST_PK, make_headers
+from trophybot.applications import ApplicationTable
+from trophybot.commands import Interaction, registry
+from trophybot.dedup import ResponseCache
+from trophybot.history import HistoryStore
+
+
+@pytest.fixture(autouse=True)
+def set_test_public_key(monkeypatch):
+    monkeypatch.setattr(main, "VERIFY_KEY", main._load_verify_key(TEST_PK))
+    # Identical test requests must not be answered from another test's cache
+    monkeypatch.setattr(main, "responses", ResponseCache())
+    yield
+
+
+async def call_app(body, headers, method="POST", path="/"):
+    """Drive the ASGI app with a single request and collect the response."""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    return sent[0]["status"], sent[1]["body"]
+
+
+@pytest.mark.asyncio
+async def test_ping():
+    body = json.dumps({"type": 1}).encode()
+    status, resp_body = await call_app(body, make_headers(body))
+    assert status == 200
+    assert json.loads(resp_body) == {"type": 1}
+
+
+@pytest.mark.asyncio
+async def test_roll_command(monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 4)
+    body = json.dumps({"type": 2, "data": {"name": "roll"}}).encode()
+    status, resp_body = await call_app(body, make_headers(body))
+    assert status == 200
+    assert json.loads(resp_body) == {
+        "type": 4,
+        "data": {"content": "🎲 You rolled: 4"},
+    }
+
+
+@pytest.mark.asyncio
+async def test_bad_signature():
+    body = json.dumps({"type": 1}).encode()
+    headers = make_headers(body)
+    headers["X-Signature-Ed25519"] = "00" * 64
+    status, _ = await call_app(body, headers)
+    assert status == 401
+
+
+@pytest.mark.asyncio
+async def test_payload_too_large():
+    body = b"x" * (asgi.MAX_BODY_SIZE + 1)
+    status, _ = await call_app(body, make_headers(body))
+    assert status == 413
+
+
+def _requests_total(status):
+    key = ("trophybot_requests_total", (status,))
+    return main.metrics.registry.collect().get(key, 0)
+
+
+@pytest.mark.asyncio
+async def test_declared_oversized_body_records_the_status_sent(monkeypatch):
+    headers = {"Content-Length": str(asgi.MAX_BODY_SIZE + 1)}
+    before_401, before_413 = _requests_total(401), _requests_total(413)
+    status, _ = await call_app(b"", headers)
+    assert status == 401
+    assert (_requests_total(401), _requests_total(413)) == (before_401 + 1, before_413)
+
+    # Checked against the application's key, not DISCORD_PUBLIC_KEY.
+    table = ApplicationTable()
+    table.add("111", TEST_PK, registry)
+    monkeypatch.setattr(main, "applications", table)
+    monkeypatch.setattr(main, "VERIFY_KEY", None)
+    headers = make_headers(b"{}")
+    headers["Content-Length"] = str(asgi.MAX_BODY_SIZE + 1)
+    status, _ = await call_app(b"", headers, path="/interactions/111")
+    assert status == 413
+    assert _requests_total(413) == before_413 + 1
+    status, _ = await call_app(b"", headers, path="/interactions/999")
+    assert status == 404
+
+
+@pytest.mark.asyncio
+async def test_wrong_method_and_path():
+    status, _ = await call_app(b"", {}, method="GET")
+    assert status == 405
+    status, _ = await call_app(b"", {}, path="/other")
+    assert status == 404
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint():
+    status, resp_body = await call_app(b"", {}, method="GET", path="/metrics")
+    assert status == 200
+    assert b"# TYPE trophybot_requests_total counter" in resp_body
+
+    status, _ = await call_app(b"", {}, method="POST", path="/metrics")
+    assert status == 405
+
+
+@pytest.mark.asyncio
+async def test_history_export_streams_ndjson(monkeypatch):
+    store = HistoryStore()
+    for i in range(3):
+        store.record(Interaction.from_payload({"type": 2, "channel_id": "c1"}), str(i))
+    monkeypatch.setattr(trophybot.history, "store", store)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+    status, _ = await call_app(b"", {}, method="GET", path="/history/export")
+    assert status == 403
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/history/export",
+        "query_string": b"channel=c1",
+        "headers": [(b"authorization", b"Bearer secret")],
+    }
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, None, send)
+    assert sent[0]["status"] == 200
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert [json.loads(line)["content"] for line in body.splitlines()] == [
+        "0",
+        "1",
+        "2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header(monkeypatch):
+    monkeypatch.setattr(main.tracing, "enabled", True)
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 4)
+    body = json.dumps({"type": 2, "data": {"name": "roll"}}).encode()
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [
+            (k.lower().encode(), v.encode()) for k, v in make_headers(body).items()
+        ],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    headers = dict(sent[0]["headers"])
+    assert headers[b"server-timing"].startswith(b"verify;dur=")
+    assert b"dice;dur=" in headers[b"server-timing"]
+
+
+@pytest.mark.asyncio
+async def test_application_endpoint(monkeypatch):
+    table = ApplicationTable()
+    table.add("111", TEST_PK, registry)
+    monkeypatch.setattr(main, "applications", table)
+    body = json.dumps({"type": 1, "application_id": "111"}).encode()
+    status, resp_body = await call_app(
+        body, make_headers(body), path="/interactions/111"
+    )
+    assert (status, json.loads(resp_body)) == (200, {"type": 1})
+    status, _ = await call_app(body, make_headers(body), path="/interactions/999")
+    assert status == 404
+    status, _ = await call_app(
+        body, make_headers(body), method="GET", path="/interactions/111"
+    )
+    assert status == 405
@@ -1,9 +1,23 @@
 # tests/test_commands.py
+import io
+import json
 from types import SimpleNamespace
 
 import pytest
 
-from trophybot.bot import roll_command
+from trophybot import dice, log
+from trophybot.bot import (
+    MAX_EXPRESSION_LENGTH,
+    MAX_POOL,
+    MESSAGE_LIMIT,
+    TOO_MANY_DICE,
+    combat_command,
+    dice_command,
+    gold_command,
+    odds_command,
+    roll_command,
+)
+from trophybot.commands import Interaction, registry
 
 
 @pytest.mark.asyncio
@@ -182,17 +196,273 @@ async def test_roll_command_scenarios(
     # The `responses` list is captured by `fake_send_message` closure.
     # A more robust way for call order dependent mocks might involve a class-based mock
     # or a more sophisticated counter, but for now, checking len(responses) works.
-    async def fake_send_message(message):
+    async def fake_send_message(message, components=None):
         responses.append(message)
 
-    # Simulate the interaction object structure
-    # The command handler receives an interaction object.
-    # We assume options are accessed via interaction.data.options
-    fake_interaction_data = SimpleNamespace(options=options_data)
-    fake_interaction = SimpleNamespace(
+    # Build the interaction the way main.py does, from a Discord payload,
+    # with a fake response that records the message.
+    fake_interaction = Interaction.from_payload(
+        {"type": 2, "data": {"name": "roll", "options": options_data}},
         response=SimpleNamespace(send_message=fake_send_message),
-        data=fake_interaction_data,
     )
 
     await roll_command.callback(fake_interaction)
     assert responses == [expected_message], f"Test case {test_id} failed."
+
+
+async def _run_command(command, name, options_data):
+    responses = []
+
+    async def fake_send_message(message, components=None):
+        responses.append(message)
+
+    fake_interaction = Interaction.from_payload(
+        {"type": 2, "data": {"name": name, "options": options_data}},
+        response=SimpleNamespace(send_message=fake_send_message),
+    )
+    await command.callback(fake_interaction)
+    return responses
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options_data, dice_mocks, expected_message",
+    [
+        (
+            [{"name": "dark", "value": 3}, {"name": "endurance", "value": 9}],
+            {
+                "roll_histogram": lambda count: (
+                    (0, 1, 0, 1, 0, 1)
+                    if count == 3
+                    else pytest.fail(f"Unexpected roll_histogram count: {count}")
+                )
+            },
+            "Dark 6 4 2 => 6 + 4 = 10 vs Endurance 9: Monster defeated!",
+        ),
+        (
+            [{"name": "dark", "value": 2}, {"name": "endurance", "value": 9}],
+            {"roll_histogram": lambda count: (0, 0, 1, 0, 1, 0)},
+            "Dark 5 3 => 5 + 3 = 8 vs Endurance 9: The monster endures.",
+        ),
+        (
+            [{"name": "dark", "value": 1}, {"name": "endurance", "value": 5}],
+            {"roll_histogram": lambda count: (0, 0, 0, 0, 1, 0)},
+            "Dark 5 => 5 vs Endurance 5: Monster defeated!",
+        ),
+        (
+            [{"name": "dark", "value": 0}, {"name": "endurance", "value": 5}],
+            {},
+            "🎲 No dice rolled.",
+        ),
+    ],
+    ids=["defeated", "endures", "single_die_meets_endurance", "no_dice"],
+)
+async def test_combat_command_scenarios(
+    monkeypatch, options_data, dice_mocks, expected_message
+):
+    if "roll_histogram" in dice_mocks:
+        monkeypatch.setattr(
+            "trophybot.dice.roll_histogram", dice_mocks["roll_histogram"]
+        )
+    responses = await _run_command(combat_command, "combat", options_data)
+    assert responses == [expected_message]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options_data, dice_mocks, expected_message",
+    [
+        (
+            [{"name": "count", "value": 3}],
+            {
+                "roll_histogram": lambda count: (
+                    (1, 0, 0, 0, 1, 1)
+                    if count == 3
+                    else pytest.fail(f"Unexpected roll_histogram count: {count}")
+                )
+            },
+            "Gold 6 5 1 => 12 gold",
+        ),
+        ([{"name": "count", "value": 0}], {}, "🎲 No dice rolled."),
+    ],
+    ids=["three_dice", "no_dice"],
+)
+async def test_gold_command_scenarios(
+    monkeypatch, options_data, dice_mocks, expected_message
+):
+    if "roll_histogram" in dice_mocks:
+        monkeypatch.setattr(
+            "trophybot.dice.roll_histogram", dice_mocks["roll_histogram"]
+        )
+    responses = await _run_command(gold_command, "gold", options_data)
+    assert responses == [expected_message]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options_data, dice_mocks, expected_message",
+    [
+        (
+            [{"name": "light", "value": 250}],
+            {
+                "roll_histogram": lambda count: (
+                    (40, 40, 40, 40, 40, 50)
+                    if count == 250
+                    else pytest.fail(f"Unexpected roll_histogram count: {count}")
+                ),
+            },
+            "Light: 6×50 5×40 4×40 3×40 2×40 1×40 => Light 6 is highest",
+        ),
+        (
+            [{"name": "light", "value": 2}, {"name": "dark", "value": 300}],
+            {
+                "roll_pool": lambda count: (
+                    [6, 3]
+                    if count == 2
+                    else pytest.fail(f"Unexpected roll_pool count: {count}")
+                ),
+                "roll_histogram": lambda count: (
+                    (100, 100, 0, 100, 0, 0)
+                    if count == 300
+                    else pytest.fail(f"Unexpected roll_histogram count: {count}")
+                ),
+            },
+            "Light 6 3 Dark: 4×100 2×100 1×100 => Light 6 is highest",
+        ),
+    ],
+    ids=["large_light", "small_light_large_dark"],
+)
+async def test_roll_command_large_pools(
+    monkeypatch, options_data, dice_mocks, expected_message
+):
+    for name, mock in dice_mocks.items():
+        monkeypatch.setattr(f"trophybot.dice.{name}", mock)
+    responses = await _run_command(roll_command, "roll", options_data)
+    assert responses == [expected_message]
+
+
+@pytest.mark.asyncio
+async def test_roll_command_huge_pool_fits_discord_limit():
+    responses = await _run_command(
+        roll_command,
+        "roll",
+        [{"name": "light", "value": MAX_POOL}, {"name": "dark", "value": MAX_POOL}],
+    )
+    assert len(responses[0]) < 2000
+    assert responses[0].endswith("Dark 6 is highest")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "command, name, option",
+    [
+        (roll_command, "roll", "light"),
+        (roll_command, "roll", "dark"),
+        (odds_command, "odds", "dark"),
+        (combat_command, "combat", "dark"),
+        (gold_command, "gold", "count"),
+    ],
+)
+async def test_pools_over_the_limit_are_refused(command, name, option, monkeypatch):
+    def no_dice(count):
+        raise AssertionError("no dice should be rolled")
+
+    monkeypatch.setattr(dice, "roll_histogram", no_dice)
+    monkeypatch.setattr(dice, "roll_pool", no_dice)
+    options = [{"name": option, "value": MAX_POOL + 1}]
+    if name == "combat":
+        options.append({"name": "endurance", "value": 5})
+    responses = await _run_command(command, name, options)
+    assert responses == [TOO_MANY_DICE]
+    schema = next(
+        opt for opt in command.to_schema()["options"] if opt["name"] == option
+    )
+    assert schema["max_value"] == MAX_POOL
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "expr, faces, expected_message",
+    [
+        ("d6", [4], "🎲 4"),
+        ("2L3D", [1, 5, 3, 4, 6], "Light 1 5 Dark 3 4 6 => Dark 6 is highest"),
+        ("gold 3", [6, 1, 5], "Gold 6 5 1 => 12 gold"),
+        (
+            "combat 3 vs 9",
+            [2, 6, 4],
+            "Dark 6 4 2 => 6 + 4 = 10 vs Endurance 9: Monster defeated!",
+        ),
+        (
+            "1L1D x2; gold 1",
+            [6, 6, 5, 3, 2],
+            "1. Light 6 Dark 6 => Dark 6 is highest\n"
+            "2. Light 5 Dark 3 => Light 5 is highest\n"
+            "3. Gold 2 => 2 gold",
+        ),
+    ],
+)
+async def test_dice_command_rolls_one_batch(monkeypatch, expr, faces, expected_message):
+    calls = []
+    monkeypatch.setattr(
+        "trophybot.dice.roll_pool", lambda count: calls.append(count) or faces
+    )
+    responses = await _run_command(
+        dice_command, "dice", [{"name": "expr", "value": expr}]
+    )
+    assert responses == [expected_message]
+    assert calls == [len(faces)]
+
+
+@pytest.mark.asyncio
+async def test_dice_command_summarises_large_pools():
+    responses = await _run_command(
+        dice_command, "dice", [{"name": "expr", "value": "150D"}]
+    )
+    assert responses[0].startswith("Dark: ")
+
+
+@pytest.mark.asyncio
+async def test_dice_command_rejects_bad_expression():
+    responses = await _run_command(
+        dice_command, "dice", [{"name": "expr", "value": "banana"}]
+    )
+    assert responses == ["🎲 Couldn't roll 'banana': can't read 'banana'."]
+
+
+@pytest.mark.asyncio
+async def test_dice_command_reply_fits_for_long_expressions():
+    responses = await _run_command(
+        dice_command, "dice", [{"name": "expr", "value": "banana " * 200}]
+    )
+    assert len(responses[0]) <= MESSAGE_LIMIT
+    assert "…" in responses[0]
+    assert f"at most {MAX_EXPRESSION_LENGTH} characters" in responses[0]
+    assert dice_command.to_schema()["options"][0]["max_length"] == (
+        MAX_EXPRESSION_LENGTH
+    )
+
+
+@pytest.mark.asyncio
+async def test_recorded_dispatch_logs_draws_that_replay_exactly():
+    stream = io.StringIO()
+    log.stop()
+    log.configure(stream=stream)
+    payload = {
+        "type": 2,
+        "id": "123",
+        "data": {"name": "dice", "options": [{"name": "expr", "value": "2L3D x3"}]},
+    }
+    try:
+        with dice.use_backend(dice.RecordingBackend(dice.SeededPool(5))):
+            original = await registry.dispatch(Interaction.from_payload(payload))
+        log.stop()
+    finally:
+        log.configure()
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Dice draws"
+    assert entry["interaction_id"] == "123"
+    assert len(entry["draws"]) == 15
+
+    with dice.use_backend(dice.ReplayBackend.from_digits(entry["draws"])):
+        replayed = await registry.dispatch(Interaction.from_payload(payload))
+    assert replayed == original
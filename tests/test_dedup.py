@@ -0,0 +1,107 @@
+import json
+import time
+
+import pytest
+
+import main
+from tests.test_interactions import TEST_SK, make_headers, sign
+from trophybot.dedup import ResponseCache, body_digest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=300, clock=clock)
+    cache.put("sig", {"type": 1})
+    clock.now += 299
+    assert cache.get("sig") == {"type": 1}
+    clock.now += 2
+    assert cache.get("sig") is None
+    assert len(cache) == 0
+
+
+def test_cache_is_bounded():
+    cache = ResponseCache(max_entries=3)
+    for i in range(100):
+        cache.put(i, {"n": i})
+    assert len(cache) == 3
+    assert cache.get(0) is None
+    assert cache.get(99) == {"n": 99}
+
+
+def test_expired_entries_are_purged_on_put():
+    clock = FakeClock()
+    cache = ResponseCache(ttl=10, clock=clock)
+    for i in range(5):
+        cache.put(i, i)
+    clock.now += 11
+    cache.put("new", 1)
+    assert len(cache) == 1
+
+
+def test_check_value_must_match():
+    cache = ResponseCache()
+    cache.put("sig", {"type": 1}, body_digest(b"one"))
+    assert cache.get("sig", body_digest(b"one")) == {"type": 1}
+    assert cache.get("sig", body_digest(b"two")) is None
+    assert cache.get(None) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "VERIFY_KEY", TEST_SK.verify_key)
+    monkeypatch.setattr(main, "responses", ResponseCache())
+    return main.app.test_client()
+
+
+def _roll_body(interaction_id="42"):
+    return json.dumps(
+        {"type": 2, "id": interaction_id, "data": {"name": "roll"}}
+    ).encode()
+
+
+def test_identical_redelivery_skips_verification_and_dice(client, monkeypatch):
+    rolls = iter([3, 5])
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: next(rolls))
+    body = _roll_body()
+    headers = make_headers(body)
+    first = client.post("/", data=body, headers=headers)
+
+    def fail_verification(_request, _verify_key=None):
+        pytest.fail("duplicate delivery should not be re-verified")
+
+    monkeypatch.setattr(main, "_check_signature", fail_verification)
+    second = client.post("/", data=body, headers=headers)
+    assert first.get_json() == second.get_json()
+    assert second.get_json()["data"]["content"] == "🎲 You rolled: 3"
+
+
+def test_resigned_redelivery_returns_original_response(client, monkeypatch):
+    rolls = iter([3, 5])
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: next(rolls))
+    body = _roll_body()
+    first = client.post("/", data=body, headers=make_headers(body))
+
+    timestamp = str(int(time.time()) - 1)
+    retry_headers = dict(make_headers(body))
+    retry_headers["X-Signature-Timestamp"] = timestamp
+    retry_headers["X-Signature-Ed25519"] = sign(body, timestamp)
+    second = client.post("/", data=body, headers=retry_headers)
+    assert second.get_json() == first.get_json()
+
+
+def test_same_signature_with_different_body_is_verified(client, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 3)
+    body = _roll_body()
+    headers = make_headers(body)
+    client.post("/", data=body, headers=headers)
+    tampered = _roll_body("43")
+    resp = client.post("/", data=tampered, headers=headers)
+    assert resp.status_code == 401
@@ -0,0 +1,121 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+import deploy
+
+COMMANDS_PATH = "/applications/app/commands"
+
+
+class _FakeCommandsAPI(BaseHTTPRequestHandler):
+    """Local fake of Discord's application commands endpoints."""
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.calls.append(("GET", self.path))
+        self._reply(200, self.server.commands)
+
+    def do_PUT(self):
+        self.server.calls.append(("PUT", self.path))
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        # Discord returns the stored commands with ids and drops false flags.
+        self.server.commands = [
+            {
+                "id": str(i),
+                "application_id": "app",
+                "version": "1",
+                "type": 1,
+                "name": cmd["name"],
+                "description": cmd["description"],
+                "options": [
+                    {k: v for k, v in opt.items() if not (k == "required" and not v)}
+                    for opt in cmd.get("options", [])
+                ],
+            }
+            for i, cmd in enumerate(body)
+        ]
+        self._reply(200, self.server.commands)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def commands_api(fake_api):
+    return fake_api(_FakeCommandsAPI, calls=[], commands=[])
+
+
+@pytest.fixture
+def url(commands_api):
+    return f"{commands_api.url}{COMMANDS_PATH}"
+
+
+def _sync(url, state_path, **kwargs):
+    with requests.Session() as session:
+        return deploy.sync_commands(
+            url, {}, deploy.COMMANDS, session, state_path=str(state_path), **kwargs
+        )
+
+
+def test_first_sync_overwrites_in_one_call(commands_api, url, tmp_path):
+    assert _sync(url, tmp_path / "state.json") == "updated"
+    assert commands_api.calls == [("GET", COMMANDS_PATH), ("PUT", COMMANDS_PATH)]
+    names = [cmd["name"] for cmd in commands_api.commands]
+    assert names == [cmd["name"] for cmd in deploy.COMMANDS]
+
+
+def test_unchanged_commands_skip_the_api(commands_api, url, tmp_path):
+    state = tmp_path / "state.json"
+    _sync(url, state)
+    commands_api.calls.clear()
+    assert _sync(url, state) == "cached"
+    assert commands_api.calls == []
+
+
+def test_matching_remote_is_not_rewritten(commands_api, url, tmp_path):
+    _sync(url, tmp_path / "first.json")
+    commands_api.calls.clear()
+    assert _sync(url, tmp_path / "fresh.json") == "unchanged"
+    assert commands_api.calls == [("GET", COMMANDS_PATH)]
+
+
+def test_force_always_overwrites(commands_api, url, tmp_path):
+    state = tmp_path / "state.json"
+    _sync(url, state)
+    commands_api.calls.clear()
+    assert _sync(url, state, force=True) == "updated"
+    assert commands_api.calls == [("PUT", COMMANDS_PATH)]
+
+
+def test_hash_ignores_server_fields_and_order():
+    remote = [
+        {"id": "9", "version": "3", "type": 1, "name": "b", "description": "B"},
+        {
+            "id": "8",
+            "name": "a",
+            "description": "A",
+            "options": [{"name": "x", "description": "X", "type": 4}],
+        },
+    ]
+    local = [
+        {
+            "name": "a",
+            "description": "A",
+            "options": [
+                {"name": "x", "description": "X", "type": 4, "required": False}
+            ],
+        },
+        {"name": "b", "description": "B", "options": []},
+    ]
+    assert deploy.commands_hash(remote) == deploy.commands_hash(local)
+    local[0]["description"] = "changed"
+    assert deploy.commands_hash(remote) != deploy.commands_hash(local)
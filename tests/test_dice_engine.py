@@ -1,4 +1,24 @@
-from trophybot.dice import roll_d6, roll_pool
+import pytest
+
+import trophybot.dice
+from trophybot.dice import (
+    EntropyPool,
+    RecordingBackend,
+    ReplayBackend,
+    SeededPool,
+    bytes_to_faces,
+    histogram,
+    histogram_faces,
+    histogram_highest,
+    histogram_size,
+    histogram_top,
+    histogram_total,
+    recording,
+    roll_d6,
+    roll_histogram,
+    roll_pool,
+    use_backend,
+)
 
 
 def test_roll_d6_range():
@@ -15,3 +35,92 @@ def test_roll_pool_range():
     pool = roll_pool(2)
     assert 1 <= pool[0] <= 6
     assert 1 <= pool[1] <= 6
+
+
+def test_bytes_to_faces_rejects_biased_bytes():
+    data = bytes(range(256))
+    faces = bytes_to_faces(data)
+    # 252 accepted bytes, 42 per face.
+    assert len(faces) == 252
+    assert all(faces.count(face) == 42 for face in range(1, 7))
+
+
+def test_entropy_pool_refills_across_chunks():
+    calls = []
+
+    def source(n):
+        calls.append(n)
+        return bytes([255] * 4 + [0, 1, 2, 3, 4, 5] * n)[:n]
+
+    pool = EntropyPool(chunk_size=8, source=source)
+    assert pool.faces(3) == bytes([1, 2, 3])
+    assert pool.faces(1) == bytes([4])
+    assert len(pool.faces(100)) == 100
+    assert len(calls) >= 2
+
+
+def test_entropy_pool_zero_or_negative():
+    pool = EntropyPool(source=lambda n: pytest.fail("source should not be read"))
+    assert pool.faces(0) == b""
+    assert pool.faces(-1) == b""
+
+
+def test_roll_pool_covers_all_faces():
+    assert set(roll_pool(600)) == {1, 2, 3, 4, 5, 6}
+
+
+def test_roll_histogram_counts_every_die(monkeypatch):
+    monkeypatch.setattr("trophybot.dice.HISTOGRAM_CHUNK_SIZE", 7)
+    counts = roll_histogram(3000)
+    assert len(counts) == 6
+    assert histogram_size(counts) == 3000
+    assert all(count > 0 for count in counts)
+
+
+def test_histogram_helpers():
+    counts = histogram([6, 1, 4, 6, 2])
+    assert counts == (1, 1, 0, 1, 0, 2)
+    assert histogram_total(counts) == 19
+    assert histogram_highest(counts) == 6
+    assert histogram_top(counts, 3) == [6, 6, 4]
+    assert histogram_top(counts, 10) == [6, 6, 4, 2, 1]
+    assert histogram_faces(counts) == [6, 6, 4, 2, 1]
+    assert histogram_highest((0,) * 6) == 0
+
+
+def test_seeded_pool_is_reproducible():
+    first = [roll_pool(5, backend=SeededPool(42)) for _ in range(2)]
+    assert first[0] == first[1]
+    pool = SeededPool(42)
+    assert roll_pool(3, backend=pool) + roll_pool(2, backend=pool) == first[0]
+    assert roll_pool(50, backend=SeededPool(42)) != roll_pool(50, backend=SeededPool(7))
+    assert set(roll_pool(600, backend=SeededPool("any seed"))) == set(range(1, 7))
+
+
+def test_use_backend_overrides_only_inside_the_block():
+    with use_backend(ReplayBackend(bytes([6, 6, 1]))):
+        assert roll_d6() == 6
+        assert roll_histogram(2) == (1, 0, 0, 0, 0, 1)
+    assert trophybot.dice.get_backend() is trophybot.dice._pool
+
+
+def test_set_backend_changes_process_default():
+    previous = trophybot.dice.set_backend(ReplayBackend(bytes([2, 3])))
+    try:
+        assert roll_pool(2) == [2, 3]
+    finally:
+        trophybot.dice.set_backend(previous)
+
+
+def test_recording_then_replay_reproduces_rolls():
+    recorder = RecordingBackend(SeededPool(1))
+    with use_backend(recorder), recording() as draws:
+        rolled = [roll_d6(), roll_pool(4), roll_histogram(3)]
+    roll_pool(2, backend=recorder)  # outside recording(): not kept
+    assert len(draws) == 8
+
+    digits = trophybot.dice.format_draws(draws)
+    with use_backend(ReplayBackend.from_digits(digits)):
+        assert [roll_d6(), roll_pool(4), roll_histogram(3)] == rolled
+        with pytest.raises(RuntimeError):
+            roll_d6()
@@ -0,0 +1,193 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+import main
+from tests.test_interactions import TEST_PK, make_headers
+from trophybot import metrics
+from trophybot.commands import CommandRegistry, Interaction
+from trophybot.dedup import ResponseCache
+from trophybot.followup import FOLLOWUP_ERROR, FollowupDispatcher
+
+
+class _FakeWebhookAPI(BaseHTTPRequestHandler):
+    """Local stand-in for Discord's interaction webhook endpoints."""
+
+    def do_PATCH(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append((self.path, json.loads(body)))
+        statuses = self.server.statuses
+        status = statuses.pop(0) if statuses else self.server.status
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0.01")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook_api(fake_api):
+    return fake_api(_FakeWebhookAPI, received=[], status=200, statuses=[])
+
+
+def _interaction(name, options=None, token="tok"):
+    return Interaction.from_payload(
+        {
+            "type": 2,
+            "application_id": "app",
+            "token": token,
+            "data": {
+                "name": name,
+                "options": [
+                    {"name": k, "value": v} for k, v in (options or {}).items()
+                ],
+            },
+        }
+    )
+
+
+def test_followup_edits_original_response(webhook_api, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 5)
+    dispatcher = FollowupDispatcher(base_url=webhook_api.url, workers=2)
+    assert dispatcher.submit(_interaction("roll"))
+    dispatcher.join()
+    dispatcher.stop()
+
+    assert webhook_api.received == [
+        ("/webhooks/app/tok/messages/@original", {"content": "🎲 You rolled: 5"})
+    ]
+    stats = dispatcher.stats()
+    assert stats["completed"] == 1
+    assert stats["failed"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["last_ack_to_followup"] is not None
+
+
+def _recorded(name, *labels):
+    value = metrics.registry.collect().get((name, labels), 0)
+    # A histogram's cells are its buckets followed by the sum of observations.
+    return sum(value[:-1]) if isinstance(value, list) else value
+
+
+def test_followup_reports_queue_depth_and_latency(webhook_api):
+    completed = _recorded("trophybot_followups_total", "completed")
+    depths = _recorded("trophybot_followup_queue_depth")
+    latencies = _recorded("trophybot_ack_to_followup_seconds")
+    dispatcher = FollowupDispatcher(base_url=webhook_api.url, workers=1)
+    for i in range(3):
+        assert dispatcher.submit(_interaction("roll", token=str(i)))
+    dispatcher.join()
+    dispatcher.stop()
+
+    assert _recorded("trophybot_followups_total", "completed") == completed + 3
+    assert _recorded("trophybot_followup_queue_depth") == depths + 3
+    assert _recorded("trophybot_ack_to_followup_seconds") == latencies + 3
+    rendered = metrics.registry.render()
+    assert "trophybot_followup_queue_depth_bucket" in rendered
+    assert "trophybot_ack_to_followup_seconds_count" in rendered
+
+
+def test_followup_counts_webhook_failures(webhook_api):
+    webhook_api.status = 500
+    dispatcher = FollowupDispatcher(
+        base_url=webhook_api.url, workers=1, retries=2, backoff=0
+    )
+    assert dispatcher.submit(_interaction("roll"))
+    dispatcher.join()
+    dispatcher.stop()
+    assert dispatcher.stats()["failed"] == 1
+    assert len(webhook_api.received) == 3
+
+
+def test_followup_retries_rate_limits_and_server_errors(webhook_api, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 4)
+    webhook_api.statuses = [429, 502]
+    dispatcher = FollowupDispatcher(base_url=webhook_api.url, workers=1, backoff=0)
+    assert dispatcher.submit(_interaction("roll"))
+    dispatcher.join()
+    dispatcher.stop()
+
+    assert webhook_api.received == 3 * [
+        ("/webhooks/app/tok/messages/@original", {"content": "🎲 You rolled: 4"})
+    ]
+    assert dispatcher.stats()["completed"] == 1
+    assert dispatcher.stats()["failed"] == 0
+
+
+def test_failed_command_finishes_with_an_error_message(webhook_api):
+    commands = CommandRegistry()
+
+    @commands.command("broken", "Always fails")
+    async def _broken(interaction):
+        raise RuntimeError("boom")
+
+    dispatcher = FollowupDispatcher(
+        base_url=webhook_api.url, workers=1, commands=commands
+    )
+    assert dispatcher.submit(_interaction("broken"))
+    dispatcher.join()
+    dispatcher.stop()
+
+    assert webhook_api.received == [
+        ("/webhooks/app/tok/messages/@original", {"content": FOLLOWUP_ERROR})
+    ]
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_full_queue_rejects_submission(webhook_api):
+    release = threading.Event()
+    commands = CommandRegistry()
+
+    @commands.command("slow", "Blocks until released")
+    async def _slow(interaction):
+        release.wait(5)
+        return await interaction.response.send_message("done")
+
+    dispatcher = FollowupDispatcher(
+        base_url=webhook_api.url, workers=1, max_queue=1, commands=commands
+    )
+    submitted = [
+        dispatcher.submit(_interaction("slow", token=str(i))) for i in range(5)
+    ]
+    release.set()
+    dispatcher.join()
+    dispatcher.stop()
+
+    assert submitted[0] is True
+    assert submitted[-1] is False
+    stats = dispatcher.stats()
+    assert stats["rejected"] >= 1
+    assert stats["completed"] + stats["rejected"] == 5
+
+
+def test_endpoint_defers_configured_commands(webhook_api, monkeypatch):
+    monkeypatch.setattr(main, "VERIFY_KEY", main._load_verify_key(TEST_PK))
+    monkeypatch.setattr(main, "responses", ResponseCache())
+    monkeypatch.setattr(main, "DEFERRED_COMMANDS", frozenset({"gold"}))
+    dispatcher = FollowupDispatcher(base_url=webhook_api.url, workers=1)
+    monkeypatch.setattr(main, "followups", dispatcher)
+    monkeypatch.setattr("trophybot.dice.roll_histogram", lambda n: (0, 0, 0, 0, 0, n))
+
+    body = json.dumps(
+        {
+            "type": 2,
+            "application_id": "app",
+            "token": "tok",
+            "data": {"name": "gold", "options": [{"name": "count", "value": 2}]},
+        }
+    ).encode()
+    resp = main.app.test_client().post("/", data=body, headers=make_headers(body))
+    assert resp.get_json() == {"type": 5}
+
+    dispatcher.join()
+    dispatcher.stop()
+    assert webhook_api.received == [
+        ("/webhooks/app/tok/messages/@original", {"content": "Gold 6 6 => 12 gold"})
+    ]
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+import pytest_asyncio
+from aiohttp import WSMsgType, web
+from aiohttp.test_utils import TestServer
+
+from trophybot import gateway
+from trophybot.gateway import GatewayClient, GatewayError, shard_groups
+
+TOKEN = "test-token"
+
+
+class FakeConnection:
+    """One client connection to the fake gateway."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.received = asyncio.Queue()
+        self._deflate = zlib.compressobj()
+
+    async def send(self, op, data=None, t=None, s=None, split=False):
+        """Send a zlib-stream payload, optionally split over two frames."""
+        raw = json.dumps({"op": op, "d": data, "t": t, "s": s}).encode()
+        packet = self._deflate.compress(raw) + self._deflate.flush(zlib.Z_SYNC_FLUSH)
+        if split:
+            await self.ws.send_bytes(packet[:3])
+            packet = packet[3:]
+        await self.ws.send_bytes(packet)
+
+    async def next(self, op):
+        """Return the next payload with ``op``, skipping heartbeats."""
+        while True:
+            payload = await asyncio.wait_for(self.received.get(), 2)
+            if payload["op"] == op:
+                return payload
+
+
+class FakeGateway:
+    """A local Gateway and interaction callback endpoint."""
+
+    def __init__(self, heartbeat_interval=50, ack=True):
+        self.heartbeat_interval = heartbeat_interval
+        self.ack = ack
+        self.connections = asyncio.Queue()
+        self.callbacks = asyncio.Queue()
+        self.queries = []
+        app = web.Application()
+        app.router.add_get("/gateway", self._gateway)
+        app.router.add_post("/api/interactions/{id}/{token}/callback", self._callback)
+        self.server = TestServer(app)
+
+    async def _gateway(self, request):
+        self.queries.append(dict(request.query))
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        conn = FakeConnection(ws)
+        await conn.send(10, {"heartbeat_interval": self.heartbeat_interval})
+        await self.connections.put(conn)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                break
+            payload = json.loads(message.data)
+            if payload["op"] == 1 and self.ack:
+                await conn.send(11)
+            await conn.received.put(payload)
+        return ws
+
+    async def _callback(self, request):
+        await self.callbacks.put((request.match_info["id"], await request.json()))
+        return web.Response(status=204)
+
+    def client(self, **kwargs):
+        return GatewayClient(
+            TOKEN,
+            str(self.server.make_url("/gateway")),
+            api_base=str(self.server.make_url("/api")),
+            backoff=(0, 0.01),
+            **kwargs,
+        )
+
+    async def next_connection(self):
+        return await asyncio.wait_for(self.connections.get(), 2)
+
+
+@pytest_asyncio.fixture
+async def fake_gateway():
+    fake = FakeGateway()
+    await fake.server.start_server()
+    yield fake
+    await fake.server.close()
+
+
+async def _ready(conn, session_id="session-1", seq=1):
+    await conn.send(0, {"session_id": session_id}, t="READY", s=seq)
+
+
+@pytest.mark.asyncio
+async def test_identify_heartbeat_and_answer_interaction(fake_gateway, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 4)
+    client = fake_gateway.client(shard=(1, 2))
+    task = asyncio.create_task(client.run())
+    conn = await fake_gateway.next_connection()
+
+    identify = await conn.next(2)
+    assert identify["d"]["token"] == TOKEN
+    assert identify["d"]["shard"] == [1, 2]
+    assert fake_gateway.queries[0]["compress"] == "zlib-stream"
+    await _ready(conn)
+    assert (await conn.next(1))["d"] == 1
+
+    interaction = {
+        "id": "123",
+        "token": "abc",
+        "type": 2,
+        "data": {"name": "roll"},
+        "channel_id": "c1",
+    }
+    await conn.send(0, interaction, t="INTERACTION_CREATE", s=2, split=True)
+    interaction_id, body = await asyncio.wait_for(fake_gateway.callbacks.get(), 2)
+    assert interaction_id == "123"
+    assert body == {"type": 4, "data": {"content": "🎲 You rolled: 4"}}
+    assert client.sequence == 2
+
+    await client.close()
+    await asyncio.wait_for(task, 2)
+
+
+@pytest.mark.asyncio
+async def test_reconnect_request_resumes_session(fake_gateway):
+    client = fake_gateway.client()
+    task = asyncio.create_task(client.run())
+    conn = await fake_gateway.next_connection()
+    await conn.next(2)
+    await _ready(conn, seq=5)
+    await conn.send(7)
+
+    conn = await fake_gateway.next_connection()
+    resume = await conn.next(6)
+    assert resume["d"] == {"token": TOKEN, "session_id": "session-1", "seq": 5}
+
+    await client.close()
+    await asyncio.wait_for(task, 2)
+
+
+@pytest.mark.asyncio
+async def test_invalid_session_identifies_again(fake_gateway):
+    client = fake_gateway.client()
+    task = asyncio.create_task(client.run())
+    conn = await fake_gateway.next_connection()
+    await conn.next(2)
+    await _ready(conn)
+    await conn.send(9, False)
+
+    conn = await fake_gateway.next_connection()
+    await conn.next(2)
+    assert client.session_id is None
+
+    await client.close()
+    await asyncio.wait_for(task, 2)
+
+
+@pytest.mark.asyncio
+async def test_missed_heartbeat_ack_resumes(fake_gateway):
+    fake_gateway.ack = False
+    client = fake_gateway.client()
+    task = asyncio.create_task(client.run())
+    conn = await fake_gateway.next_connection()
+    await conn.next(2)
+    await _ready(conn)
+
+    conn = await fake_gateway.next_connection()
+    await conn.next(6)
+
+    await client.close()
+    await asyncio.wait_for(task, 2)
+
+
+@pytest.mark.asyncio
+async def test_fatal_close_code_raises(fake_gateway):
+    client = fake_gateway.client()
+    task = asyncio.create_task(client.run())
+    conn = await fake_gateway.next_connection()
+    await conn.next(2)
+    await conn.ws.close(code=4004)
+
+    with pytest.raises(GatewayError, match="4004"):
+        await asyncio.wait_for(task, 2)
+
+
+@pytest.mark.asyncio
+async def test_run_shards_identifies_each_shard(fake_gateway):
+    task = asyncio.create_task(
+        gateway.run_shards(
+            TOKEN,
+            str(fake_gateway.server.make_url("/gateway")),
+            [0, 2],
+            4,
+            max_concurrency=16,
+        )
+    )
+    shards = []
+    for _ in range(2):
+        conn = await fake_gateway.next_connection()
+        shards.append((await conn.next(2))["d"]["shard"])
+    assert sorted(shards) == [[0, 4], [2, 4]]
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+@pytest.mark.parametrize(
+    "count, processes, expected",
+    [
+        (1, 4, [[0]]),
+        (4, 2, [[0, 2], [1, 3]]),
+        (5, 2, [[0, 2, 4], [1, 3]]),
+        (3, 8, [[0], [1], [2]]),
+    ],
+)
+def test_shard_groups(count, processes, expected):
+    assert shard_groups(count, processes) == expected
+
+
+def test_main_requires_token(monkeypatch):
+    from trophybot.bot import main
+
+    monkeypatch.setenv("K_SERVICE", "test")
+    monkeypatch.delenv("DISCORD_TOKEN", raising=False)
+    with pytest.raises(SystemExit, match="DISCORD_TOKEN"):
+        main()
+
+
+def test_main_configures_logging(monkeypatch, capsys):
+    from trophybot import log
+    from trophybot.bot import main
+    from trophybot.commands import draws_log
+
+    def fake_run(token, **kwargs):
+        # Recorded draws are logged at INFO whatever the configured level is.
+        draws_log.info("Dice draws", draws="352616")
+
+    monkeypatch.setenv("K_SERVICE", "test")
+    monkeypatch.setenv("DISCORD_TOKEN", "token")
+    monkeypatch.setattr(gateway, "run", fake_run)
+    # As in Gateway mode, where main.py never runs to configure logging.
+    log.stop()
+    try:
+        main()
+        record = json.loads(capsys.readouterr().out)
+    finally:
+        log.stop()
+        log.configure()
+    assert record["message"] == "Dice draws"
+    assert record["draws"] == "352616"
@@ -0,0 +1,139 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import trophybot.history
+from trophybot.bot import MESSAGE_LIMIT, history_command, roll_command
+from trophybot.commands import Interaction
+from trophybot.history import HistoryStore
+
+
+def make_interaction(channel_id="c1", name="roll", options=None, responses=None):
+    async def fake_send_message(message):
+        responses.append(message)
+
+    payload = {
+        "type": 2,
+        "channel_id": channel_id,
+        "member": {"nick": "Ash", "user": {"id": "u1", "username": "ash"}},
+        "data": {"name": name, "options": options or []},
+    }
+    response = SimpleNamespace(send_message=fake_send_message)
+    return Interaction.from_payload(payload, response=response)
+
+
+def test_interaction_identity_fields():
+    interaction = make_interaction()
+    assert interaction.channel_id == "c1"
+    assert interaction.user_id == "u1"
+    assert interaction.user_name == "Ash"
+    dm = Interaction.from_payload({"type": 2, "user": {"id": "u2", "username": "b"}})
+    assert (dm.guild_id, dm.user_id, dm.user_name) == (None, "u2", "b")
+
+
+def test_ring_buffer_is_bounded_per_channel_and_by_channels():
+    store = HistoryStore(per_channel=3, max_channels=2)
+    for i in range(5):
+        store.record(make_interaction("c1"), f"roll {i}")
+    assert [e.content for e in store.recent("c1", 10)] == ["roll 4", "roll 3", "roll 2"]
+    assert [e.content for e in store.recent("c1", 1)] == ["roll 4"]
+
+    store.record(make_interaction("c2"), "two")
+    store.record(make_interaction("c1"), "again")  # c1 is now most recent
+    store.record(make_interaction("c3"), "three")  # evicts c2
+    assert store.recent("c2", 10) == []
+    assert store.recent("c1", 1)[0].content == "again"
+
+
+def test_sqlite_writes_in_batches_and_exports_in_pages(tmp_path):
+    store = HistoryStore(
+        db_path=str(tmp_path / "history.db"), per_channel=5, batch_size=100
+    )
+    for i in range(250):
+        store.record(make_interaction("c1" if i % 2 else "c2"), f"roll {i}")
+    store.join()
+    assert store.stats()["written"] == 250
+
+    chunks = list(store.export(page_size=100))
+    assert len(chunks) == 3
+    entries = [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+    assert [e["content"] for e in entries] == [f"roll {i}" for i in range(250)]
+    assert entries[0]["user_name"] == "Ash"
+
+    c1 = [
+        json.loads(line) for chunk in store.export("c1") for line in chunk.splitlines()
+    ]
+    assert len(c1) == 125
+    assert {e["channel_id"] for e in c1} == {"c1"}
+    store.stop()
+
+
+def test_recent_reads_every_workers_rolls_from_the_database(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    worker_a = HistoryStore(db_path=db_path, linger=0)
+    worker_b = HistoryStore(db_path=db_path, linger=60, batch_size=1000)
+    worker_a.record(make_interaction("c1"), "a1")
+    worker_a.join()
+    worker_b.record(make_interaction("c1"), "b1")  # Still waiting for the writer.
+    worker_a.record(make_interaction("c1"), "a2")
+    worker_a.record(make_interaction("c2"), "other channel")
+    worker_a.join()
+
+    assert [e.content for e in worker_b.recent("c1", 10)] == ["a2", "b1", "a1"]
+    assert [e.content for e in worker_b.recent("c1", 2)] == ["a2", "b1"]
+    worker_b.stop()
+    # Written rolls are not listed twice.
+    assert [e.content for e in worker_b.recent("c1", 10)] == ["a2", "b1", "a1"]
+    worker_a.stop()
+
+
+def test_export_without_database_uses_memory():
+    store = HistoryStore()
+    store.record(make_interaction("c1"), "one")
+    store.record(make_interaction("c2"), "two")
+    lines = b"".join(store.export()).splitlines()
+    assert [json.loads(line)["content"] for line in lines] == ["one", "two"]
+
+
+@pytest.mark.asyncio
+async def test_history_command_shows_recent_rolls(monkeypatch):
+    monkeypatch.setattr(trophybot.history, "store", HistoryStore())
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 5)
+    responses = []
+    await history_command.callback(make_interaction(responses=responses))
+    assert responses == ["🎲 No rolls in this channel yet."]
+
+    await roll_command.callback(make_interaction(responses=responses))
+    await history_command.callback(
+        make_interaction(name="history", responses=responses)
+    )
+    lines = responses[-1].splitlines()
+    assert lines[0] == "Recent rolls (newest first):"
+    assert lines[1].endswith("Ash: 🎲 You rolled: 5")
+
+
+@pytest.mark.asyncio
+async def test_history_command_fits_message_limit(monkeypatch):
+    store = HistoryStore()
+    monkeypatch.setattr(trophybot.history, "store", store)
+    for _ in range(25):
+        store.record(make_interaction(), "x" * 300)
+    responses = []
+    await history_command.callback(
+        make_interaction(options=[{"name": "count", "value": 50}], responses=responses)
+    )
+    assert len(responses[0]) <= MESSAGE_LIMIT
+    assert len(responses[0].splitlines()) > 2
+
+
+@pytest.mark.asyncio
+async def test_history_command_reads_the_database(monkeypatch, tmp_path):
+    db_path = str(tmp_path / "history.db")
+    other_worker = HistoryStore(db_path=db_path, linger=0)
+    other_worker.record(make_interaction(), "from another worker")
+    other_worker.stop()
+    monkeypatch.setattr(trophybot.history, "store", HistoryStore(db_path=db_path))
+    responses = []
+    await history_command.callback(make_interaction(responses=responses))
+    assert responses[0].splitlines()[1].endswith("Ash: from another worker")
@@ -1,11 +1,20 @@
 # tests/test_interactions.py
 import json
+import threading
 import time
 
 import pytest
 from nacl.signing import SigningKey
 
+import main
+import trophybot.history
 from main import app  # your Flask app
+from trophybot.admission import AdmissionController
+from trophybot.applications import ApplicationTable
+from trophybot.commands import Interaction, registry
+from trophybot.dedup import ResponseCache
+from trophybot.history import HistoryStore
+from trophybot.ratelimit import RateLimiter, TokenBucketLimiter
 
 # Generate a test keypair once
 TEST_SK = SigningKey.generate()
@@ -14,8 +23,10 @@ TEST_PK = TEST_SK.verify_key.encode().hex()
 
 @pytest.fixture(autouse=True)
 def set_test_public_key(monkeypatch):
-    # Point your code at the test key
-    monkeypatch.setenv("DISCORD_PUBLIC_KEY", TEST_PK)
+    # Point your code at the test key (normally loaded once at startup)
+    monkeypatch.setattr(main, "VERIFY_KEY", main._load_verify_key(TEST_PK))
+    # Identical test requests must not be answered from another test's cache
+    monkeypatch.setattr(main, "responses", ResponseCache())
     yield
 
 
@@ -47,6 +58,28 @@ def test_ping(client):
     assert resp.get_json() == {"type": 1}
 
 
+def test_missing_public_key_is_unauthorized(client, monkeypatch):
+    monkeypatch.setattr(main, "VERIFY_KEY", None)
+    payload = json.dumps({"type": 1}).encode()
+    resp = client.post("/", data=payload, headers=make_headers(payload))
+    assert resp.status_code == 401
+
+
+def test_bad_signature_is_unauthorized(client):
+    payload = json.dumps({"type": 1}).encode()
+    headers = make_headers(payload)
+    headers["X-Signature-Ed25519"] = "00" * 64
+    resp = client.post("/", data=payload, headers=headers)
+    assert resp.status_code == 401
+
+
+def test_malformed_public_key_fails_fast():
+    with pytest.raises(RuntimeError):
+        main._load_verify_key("not-hex")
+    with pytest.raises(RuntimeError):
+        main._load_verify_key("abcd")
+
+
 def test_roll_endpoint_no_options(client, monkeypatch):
     """Tests the /roll endpoint with no options (plain /roll)."""
     monkeypatch.setattr(
@@ -98,3 +131,384 @@ def test_roll_endpoint_with_light_and_dark_options(client, monkeypatch):
     assert data["type"] == 4
     expected_content = "Light 1 6 Dark 2 5 3 => Light 6 is highest"
     assert data["data"]["content"] == expected_content
+
+
+def test_odds_endpoint(client):
+    """Tests the /odds endpoint routes to the odds handler."""
+    body = json.dumps(
+        {
+            "type": 2,
+            "data": {"name": "odds", "options": [{"name": "dark", "value": 2}]},
+        }
+    ).encode()
+    resp = client.post("/", data=body, headers=make_headers(body))
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["type"] == 4
+    assert data["data"]["content"].startswith("Odds for Light 0 Dark 2:")
+    assert data["data"]["content"].endswith("Dark die highest: 100.0%")
+
+
+def test_gold_endpoint(client, monkeypatch):
+    """Tests the /gold endpoint routes to the gold handler."""
+    monkeypatch.setattr(
+        "trophybot.dice.roll_histogram", lambda count: (0, 2, 0, 0, 0, 0)
+    )
+    body = json.dumps(
+        {
+            "type": 2,
+            "data": {"name": "gold", "options": [{"name": "count", "value": 2}]},
+        }
+    ).encode()
+    resp = client.post("/", data=body, headers=make_headers(body))
+    assert resp.status_code == 200
+    assert resp.get_json()["data"]["content"] == "Gold 2 2 => 4 gold"
+
+
+def test_metrics_endpoint_counts_verification_outcomes(client):
+    body = b'{"type": 1}'
+    headers = make_headers(body)
+    headers["X-Signature-Ed25519"] = "00" * 64
+    client.post("/", data=body, headers=headers)
+    client.post("/", data=body, headers=make_headers(body))
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.get_data(as_text=True)
+    assert 'trophybot_verifications_total{outcome="bad_signature"}' in text
+    assert 'trophybot_requests_total{status="401"}' in text
+    assert 'trophybot_interactions_total{type="1"}' in text
+    assert "trophybot_request_duration_seconds_count" in text
+
+
+def test_metric_shards_do_not_grow_with_requests(client):
+    # Flask runs each async view on a new thread; their shards must not pile up.
+    registry = main.metrics.registry
+    line = 'trophybot_commands_total{command="roll"}'
+    before = registry.collect().get(("trophybot_commands_total", ("roll",)), 0)
+    for i in range(50):
+        body = json.dumps({"type": 2, "id": f"shard-{i}", "data": {"name": "roll"}})
+        client.post("/", data=body.encode(), headers=make_headers(body.encode()))
+    assert f"{line} {before + 50}" in registry.render()
+    assert len(registry._shards) <= 2
+
+
+class _CountingLock:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+
+    def acquire(self, blocking=True):
+        self.acquisitions += 1
+        return self._lock.acquire(blocking)
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def test_recording_metrics_takes_no_lock(client, monkeypatch):
+    # Each request runs on a new thread, which registers and retires a shard.
+    main.metrics.registry.collect()
+    lock = _CountingLock()
+    monkeypatch.setattr(main.metrics.registry, "_lock", lock)
+    for i in range(20):
+        body = json.dumps({"type": 2, "id": f"lock-{i}", "data": {"name": "roll"}})
+        resp = client.post("/", data=body.encode(), headers=make_headers(body.encode()))
+        assert resp.status_code == 200
+    assert lock.acquisitions == 0
+
+
+def test_history_export_requires_admin_token(client, monkeypatch):
+    store = HistoryStore()
+    store.record(Interaction.from_payload({"type": 2, "channel_id": "c1"}), "roll")
+    monkeypatch.setattr(trophybot.history, "store", store)
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+    assert client.get("/history/export").status_code == 403
+    headers = {"Authorization": "Bearer wrong"}
+    assert client.get("/history/export", headers=headers).status_code == 403
+
+    headers = {"Authorization": "Bearer secret"}
+    response = client.get("/history/export?channel=c1", headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert json.loads(response.get_data())["content"] == "roll"
+
+
+def test_rate_limited_command_gets_ephemeral_reply(client, monkeypatch):
+    monkeypatch.setattr(
+        main, "limiter", RateLimiter(user=TokenBucketLimiter(rate=0.001, burst=1))
+    )
+    rolls = []
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: rolls.append(1) or 3)
+
+    def roll(interaction_id):
+        body = json.dumps(
+            {
+                "type": 2,
+                "id": interaction_id,
+                "member": {"user": {"id": "u1"}},
+                "data": {"name": "roll"},
+            }
+        ).encode()
+        return client.post("/", data=body, headers=make_headers(body)).get_json()
+
+    assert roll("1")["data"]["content"] == "🎲 You rolled: 3"
+    limited = roll("2")
+    assert limited == main.RATE_LIMITED_RESPONSE
+    assert limited["data"]["flags"] == 64
+    assert len(rolls) == 1
+    assert (
+        'trophybot_rate_limited_total{scope="user"}' in main.metrics.registry.render()
+    )
+
+
+def _post(client, payload):
+    body = json.dumps(payload).encode()
+    resp = client.post("/", data=body, headers=make_headers(body))
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def _click(client, custom_id, interaction_id="c1"):
+    return _post(
+        client,
+        {
+            "type": 3,
+            "id": interaction_id,
+            "channel_id": "chan",
+            "data": {"custom_id": custom_id, "component_type": 2},
+        },
+    )
+
+
+def _custom_ids(response):
+    (row,) = response["data"]["components"]
+    return [button["custom_id"] for button in row["components"]]
+
+
+def test_pool_roll_carries_reroll_and_push_buttons(client, monkeypatch):
+    monkeypatch.setattr(
+        "trophybot.dice.roll_pool", lambda count: {2: [1, 6], 3: [2, 5, 3]}[count]
+    )
+    data = _post(
+        client,
+        {
+            "type": 2,
+            "data": {
+                "name": "roll",
+                "options": [
+                    {"name": "light", "value": 2},
+                    {"name": "dark", "value": 3},
+                ],
+            },
+        },
+    )
+    assert _custom_ids(data) == ["reroll:2.3", "push:16.253"]
+
+
+def test_reroll_button_rolls_the_same_pool(client, monkeypatch):
+    monkeypatch.setattr(
+        "trophybot.dice.roll_pool", lambda count: {2: [4, 4], 3: [1, 2, 3]}[count]
+    )
+    data = _click(client, "reroll:2.3")
+    assert data["type"] == 4
+    assert data["data"]["content"] == "Light 4 4 Dark 1 2 3 => Light 4 is highest"
+    assert _custom_ids(data) == ["reroll:2.3", "push:44.123"]
+
+
+def test_push_button_adds_a_dark_die_to_the_previous_result(client, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_pool", lambda count: [6] * count)
+    data = _click(client, "push:16.253")
+    assert data["data"]["content"] == (
+        "Pushed: Light 1 6 Dark 2 5 3 6 => Dark 6 is highest"
+    )
+    assert _custom_ids(data) == ["reroll:2.4", "push:16.2536"]
+
+    data = _click(client, "push:5.", interaction_id="c2")
+    assert data["data"]["content"] == "Pushed: Light 5 Dark 6 => Dark 6 is highest"
+
+
+def test_large_pool_reroll_has_no_push_button(client):
+    data = _click(client, "reroll:150.0")
+    assert data["data"]["content"].startswith("Light: ")
+    assert _custom_ids(data) == ["reroll:150.0"]
+
+
+@pytest.mark.parametrize(
+    "custom_id",
+    [
+        "push:17.2",
+        "push:.",
+        "reroll:0.0",
+        "reroll:x",
+        "reroll:10001.0",
+        "reroll:0.999999",
+    ],
+)
+def test_malformed_button_gets_ephemeral_reply(client, custom_id):
+    data = _click(client, custom_id)
+    assert data["data"] == {
+        "content": "🎲 Couldn't read that button.",
+        "flags": 64,
+    }
+
+
+def test_unknown_component_prefix(client):
+    data = _click(client, "nope:1")
+    assert data["data"]["content"] == "Unknown component: nope"
+
+
+def _roll_body(interaction_id, timestamp):
+    body = json.dumps({"type": 2, "id": interaction_id, "data": {"name": "roll"}})
+    body = body.encode()
+    headers = make_headers(body)
+    headers["X-Signature-Timestamp"] = timestamp
+    headers["X-Signature-Ed25519"] = sign(body, timestamp)
+    return body, headers
+
+
+def test_late_interaction_is_shed_and_not_cached(client, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_d6", lambda: 5)
+    body, headers = _roll_body("late", str(int(time.time()) - 10))
+    resp = client.post("/", data=body, headers=headers)
+    assert resp.status_code == 200
+    assert resp.get_json() == main.BUSY_RESPONSE
+    assert resp.get_json()["data"]["flags"] == 64
+    assert main.admission.in_flight == 0
+
+    # Discord's retry of the same interaction gets a real answer.
+    body, headers = _roll_body("late", str(int(time.time())))
+    resp = client.post("/", data=body, headers=headers)
+    assert resp.get_json()["data"]["content"] == "🎲 You rolled: 5"
+    rendered = main.metrics.registry.render()
+    assert 'trophybot_shed_total{reason="deadline"}' in rendered
+    assert "trophybot_request_age_seconds_bucket" in rendered
+
+
+def test_interaction_over_capacity_is_shed(client, monkeypatch):
+    monkeypatch.setattr(main, "admission", AdmissionController(max_in_flight=1))
+    main.admission.admit(0)  # another interaction in progress
+    body, headers = _roll_body("busy", str(int(time.time())))
+    assert client.post("/", data=body, headers=headers).get_json() == (
+        main.BUSY_RESPONSE
+    )
+    main.admission.release()
+    body, headers = _roll_body("busy", str(int(time.time())))
+    assert "content" in client.post("/", data=body, headers=headers).get_json()["data"]
+    assert main.admission.in_flight == 0
+
+
+def test_ping_is_never_shed(client, monkeypatch):
+    monkeypatch.setattr(main, "admission", AdmissionController(max_in_flight=1))
+    main.admission.admit(0)
+    payload = json.dumps({"type": 1}).encode()
+    resp = client.post("/", data=payload, headers=make_headers(payload))
+    assert resp.get_json() == {"type": 1}
+
+
+def test_server_timing_header_is_off_by_default(client):
+    payload = json.dumps({"type": 1}).encode()
+    resp = client.post("/", data=payload, headers=make_headers(payload))
+    assert "Server-Timing" not in resp.headers
+
+
+def test_server_timing_reports_each_stage(client, monkeypatch):
+    monkeypatch.setattr(main.tracing, "enabled", True)
+    body = json.dumps(
+        {
+            "type": 2,
+            "data": {"name": "roll", "options": [{"name": "light", "value": 2}]},
+        }
+    ).encode()
+    resp = client.post("/", data=body, headers=make_headers(body))
+    assert resp.status_code == 200
+    stages = [
+        entry.split(";")[0] for entry in resp.headers["Server-Timing"].split(", ")
+    ]
+    assert stages == ["verify", "parse", "dispatch", "handler", "dice", "total"]
+
+    resp = client.post("/", data=b"{}", headers=make_headers(b"not json"))
+    assert resp.status_code == 401
+    assert resp.headers["Server-Timing"].startswith("verify;dur=")
+
+
+def test_admin_header_profiles_the_request(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(main, "profiler", main.Profiler(str(tmp_path)))
+    payload = json.dumps({"type": 1}).encode()
+
+    headers = make_headers(payload)
+    headers["X-Trophybot-Profile"] = "wrong"
+    resp = client.post("/", data=payload, headers=headers)
+    assert "Server-Timing" not in resp.headers
+    assert not list(tmp_path.iterdir())
+
+    headers["X-Trophybot-Profile"] = "s3cret"
+    resp = client.post("/", data=payload, headers=headers)
+    assert resp.get_json() == {"type": 1}
+    assert "Server-Timing" in resp.headers
+    assert [path.suffix for path in tmp_path.iterdir()] == [".prof"]
+
+
+OTHER_SK = SigningKey.generate()
+
+
+@pytest.fixture
+def two_applications(monkeypatch):
+    table = ApplicationTable()
+    table.add("111", TEST_PK, registry)
+    table.add("222", OTHER_SK.verify_key.encode().hex(), registry, ["gold"])
+    monkeypatch.setattr(main, "applications", table)
+    return table
+
+
+def _signed_with(key, payload):
+    body = json.dumps(payload).encode()
+    ts = str(int(time.time()))
+    headers = make_headers(body)
+    headers["X-Signature-Ed25519"] = key.sign(ts.encode() + body).signature.hex()
+    headers["X-Signature-Timestamp"] = ts
+    return body, headers
+
+
+def test_each_application_verifies_with_its_own_key(client, two_applications):
+    body, headers = _signed_with(OTHER_SK, {"type": 1, "application_id": "222"})
+    assert client.post("/interactions/222", data=body, headers=headers).get_json() == {
+        "type": 1
+    }
+    # Another application's key, or the default endpoint, doesn't verify it.
+    assert client.post("/interactions/111", data=body, headers=headers).status_code == (
+        401
+    )
+    assert client.post("/", data=body, headers=headers).status_code == 401
+
+
+def test_unknown_application_is_not_found(client, two_applications):
+    body, headers = _signed_with(OTHER_SK, {"type": 1})
+    resp = client.post("/interactions/333", data=body, headers=headers)
+    assert resp.status_code == 404
+
+
+def test_application_command_sets(client, two_applications, monkeypatch):
+    monkeypatch.setattr("trophybot.dice.roll_histogram", lambda n: (0, 0, 0, 0, 0, n))
+    gold = {
+        "type": 2,
+        "application_id": "222",
+        "data": {"name": "gold", "options": [{"name": "count", "value": 2}]},
+    }
+    body, headers = _signed_with(OTHER_SK, gold)
+    resp = client.post("/interactions/222", data=body, headers=headers)
+    assert resp.get_json()["data"]["content"] == "Gold 6 6 => 12 gold"
+
+    roll = {"type": 2, "id": "r", "application_id": "222", "data": {"name": "roll"}}
+    body, headers = _signed_with(OTHER_SK, roll)
+    resp = client.post("/interactions/222", data=body, headers=headers)
+    assert resp.get_json()["data"]["content"] == "Unknown command: roll"
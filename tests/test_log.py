@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from trophybot import log
+
+
+@pytest.fixture
+def captured():
+    """Route trophybot logging to a buffer, restoring stdout logging afterwards."""
+    log.stop()
+    stream = io.StringIO()
+    yield stream
+    log.stop()
+    log.configure()
+
+
+class _CountingStr:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "value"
+
+
+def test_records_are_json_with_fields(captured):
+    log.configure("DEBUG", stream=captured)
+    log.get_logger("test").debug("Routed %s", "roll", command="roll", light=2)
+    log.stop()
+    entry = json.loads(captured.getvalue())
+    assert entry["severity"] == "DEBUG"
+    assert entry["message"] == "Routed roll"
+    assert entry["logger"] == "trophybot.test"
+    assert entry["command"] == "roll"
+    assert entry["light"] == 2
+
+
+def test_disabled_level_skips_formatting(captured):
+    log.configure("WARNING", stream=captured)
+    value = _CountingStr()
+    log.get_logger("test").debug("Value %s", value, field=value)
+    log.stop()
+    assert captured.getvalue() == ""
+    assert value.calls == 0
+
+
+def test_formatting_happens_on_writer_thread(captured):
+    import threading
+
+    threads = []
+
+    class _RecordingStr:
+        def __str__(self):
+            threads.append(threading.current_thread())
+            return "value"
+
+    log.configure("INFO", stream=captured)
+    log.get_logger("test").info("Value %s", _RecordingStr())
+    log.stop()
+    assert threads and threads[0] is not threading.current_thread()
@@ -0,0 +1,192 @@
+import json
+import os
+import threading
+
+import pytest
+
+import trophybot.bot  # noqa: F401
+import trophybot.commands
+from trophybot import metrics
+from trophybot.commands import Interaction
+from trophybot.metrics import MetricsRegistry
+
+
+def _value(text, line_prefix):
+    """Return the value of the single exposition line starting with the prefix."""
+    (line,) = [line for line in text.splitlines() if line.startswith(line_prefix)]
+    return float(line.rsplit(" ", 1)[1])
+
+
+def test_counter_renders_with_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", "Hits.", ["path"])
+    counter.inc("/")
+    counter.inc("/", amount=2)
+    counter.inc('say "hi"')
+    text = registry.render()
+    assert "# HELP hits_total Hits." in text
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{path="/"} 3' in text.splitlines()
+    assert 'hits_total{path="say \\"hi\\""} 1' in text.splitlines()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert _value(text, "latency_seconds_sum") == pytest.approx(2.65)
+    assert "latency_seconds_count 4" in text
+
+
+def test_duplicate_metric_names_are_rejected():
+    registry = MetricsRegistry()
+    registry.counter("hits_total", "Hits.")
+    with pytest.raises(ValueError):
+        registry.counter("hits_total", "Hits again.")
+
+
+def test_threads_record_into_separate_shards():
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", "Hits.")
+
+    started = threading.Barrier(9)
+    finish = threading.Event()
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+        started.wait()
+        finish.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    assert len(registry._shards) == 8
+    assert "hits_total 8000" in registry.render()
+
+    # Ended threads' shards are folded into the process totals.
+    finish.set()
+    for thread in threads:
+        thread.join()
+    assert "hits_total 8000" in registry.render()
+    assert len(registry._shards) == 0
+
+
+def test_retired_shards_are_folded_without_a_scrape():
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", "Hits.")
+    for _ in range(metrics.FOLD_RETIRED_AFTER + 10):
+        thread = threading.Thread(target=counter.inc)
+        thread.start()
+        thread.join()
+    assert len(registry._shards) <= metrics.FOLD_RETIRED_AFTER
+    assert f"hits_total {metrics.FOLD_RETIRED_AFTER + 10}" in registry.render()
+
+
+def _define(registry):
+    counter = registry.counter("hits_total", "Hits.", ["path"])
+    histogram = registry.histogram("latency_seconds", "Latency.", buckets=(1.0,))
+    return counter, histogram
+
+
+def test_render_merges_other_workers_snapshots(tmp_path):
+    other = MetricsRegistry(snapshot_dir=str(tmp_path))
+    counter, histogram = _define(other)
+    counter.inc("/", amount=5)
+    histogram.observe(0.5)
+    other.flush()
+    # Pretend the snapshot was written by another worker process.
+    os.replace(tmp_path / f"{os.getpid()}.json", tmp_path / "1.json")
+
+    worker = MetricsRegistry(snapshot_dir=str(tmp_path))
+    counter, histogram = _define(worker)
+    counter.inc("/")
+    histogram.observe(3.0)
+    text = worker.render()
+    assert 'hits_total{path="/"} 6' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert "latency_seconds_count 2" in text
+
+    # A half-written snapshot is skipped rather than failing the scrape.
+    (tmp_path / "2.json").write_text("[")
+    assert 'hits_total{path="/"} 6' in worker.render()
+
+    worker.clear_snapshots()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_flush_writes_snapshot(tmp_path):
+    worker = MetricsRegistry(snapshot_dir=str(tmp_path))
+    worker.counter("hits_total", "Hits.").inc()
+    worker.flush()
+    entries = json.loads((tmp_path / f"{os.getpid()}.json").read_text())
+    assert entries == [["hits_total", [], 1]]
+
+
+def test_retire_folds_exited_workers_into_one_snapshot(tmp_path):
+    def exited_worker(pid, hits):
+        other = MetricsRegistry(snapshot_dir=str(tmp_path))
+        _define(other)[0].inc("/", amount=hits)
+        other.flush()
+        os.replace(tmp_path / f"{os.getpid()}.json", tmp_path / f"{pid}.json")
+
+    worker = MetricsRegistry(snapshot_dir=str(tmp_path))
+    _define(worker)
+    exited_worker(1, 2)
+    worker.retire(1)
+    # A later worker that happens to get the same pid adds to the total.
+    exited_worker(1, 3)
+    worker.retire(1)
+    worker.retire(99)  # No snapshot (killed before its first flush).
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["exited.json"]
+    assert 'hits_total{path="/"} 5' in worker.render()
+
+
+def test_snapshot_being_folded_is_not_counted_twice(tmp_path):
+    other = MetricsRegistry(snapshot_dir=str(tmp_path))
+    _define(other)[0].inc("/", amount=2)
+    other.flush()
+    os.replace(tmp_path / f"{os.getpid()}.json", tmp_path / "1.json")
+    # The master has written exited.json but not yet removed 1.json.
+    (tmp_path / "exited.json").write_text(
+        json.dumps(
+            {"generation": 1, "folded": [1], "entries": [["hits_total", ["/"], 2]]}
+        )
+    )
+
+    worker = MetricsRegistry(snapshot_dir=str(tmp_path))
+    _define(worker)
+    assert 'hits_total{path="/"} 2' in worker.render()
+
+
+def test_reset_drops_recorded_values():
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", "Hits.")
+    counter.inc()
+    registry.reset()
+    assert "hits_total 1" not in registry.render()
+    counter.inc()
+    assert "hits_total 1" in registry.render()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_records_command_time():
+    before = metrics.registry.render()
+    interaction = Interaction.from_payload(
+        {
+            "type": 2,
+            "data": {"name": "odds", "options": [{"name": "light", "value": 1}]},
+        }
+    )
+    await trophybot.commands.registry.dispatch(interaction)
+    after = metrics.registry.render()
+    line = 'trophybot_commands_total{command="odds"}'
+    assert _value(after, line) == (_value(before, line) if line in before else 0) + 1
+    assert 'trophybot_command_duration_seconds_count{command="odds"}' in after
@@ -0,0 +1,105 @@
+import itertools
+from fractions import Fraction
+from types import SimpleNamespace
+
+import pytest
+
+from trophybot.bot import odds_command
+from trophybot.commands import Interaction
+from trophybot.odds import (
+    EXACT_POOL_LIMIT,
+    _float_probabilities,
+    pool_odds,
+    pool_probabilities,
+)
+
+
+def _brute_force(light, dark):
+    """Enumerate every roll, applying the dark-wins-ties rule."""
+    counts = {}
+    for roll in itertools.product(range(1, 7), repeat=light + dark):
+        tagged = [(v, "Light") for v in roll[:light]]
+        tagged += [(v, "Dark") for v in roll[light:]]
+        key = max(tagged, key=lambda x: (x[0], 1 if x[1] == "Dark" else 0))
+        counts[key] = counts.get(key, 0) + 1
+    return counts, 6 ** (light + dark)
+
+
+@pytest.mark.parametrize(
+    "light, dark", [(1, 0), (0, 1), (2, 0), (0, 3), (1, 1), (2, 3), (3, 2)]
+)
+def test_pool_odds_matches_enumeration(light, dark):
+    counts, total = _brute_force(light, dark)
+    table = pool_odds(light, dark)
+    assert table.total == total
+    for face in range(1, 7):
+        for colour in ("Light", "Dark"):
+            expected = Fraction(counts.get((face, colour), 0), total)
+            assert table.probability(face, colour) == expected
+    assert sum(table.probability(face) for face in range(1, 7)) == 1
+
+
+def test_pool_odds_is_memoized():
+    assert pool_odds(4, 5) is pool_odds(4, 5)
+
+
+def test_pool_odds_rejects_negative_counts():
+    with pytest.raises(ValueError):
+        pool_odds(-1, 2)
+
+
+@pytest.mark.parametrize("light, dark", [(1, 0), (0, 3), (2, 3), (40, 60), (7, 0)])
+def test_floating_point_odds_match_exact_counts(light, dark):
+    table = pool_odds(light, dark)
+    approx = _float_probabilities(light, dark)
+    for face in range(1, 7):
+        for colour in ("Light", "Dark"):
+            assert approx.probability(face, colour) == pytest.approx(
+                float(table.probability(face, colour)), rel=1e-9, abs=1e-300
+            )
+
+
+def test_large_pool_probabilities_are_floating_point():
+    assert pool_probabilities(2, 3).probability(6) == float(
+        pool_odds(2, 3).probability(6)
+    )
+    large = pool_probabilities(50_000, EXACT_POOL_LIMIT)
+    assert sum(large.probability(face) for face in range(1, 7)) == pytest.approx(1)
+    assert large.probability(6, "Dark") == pytest.approx(1 - (5 / 6) ** 100)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "options_data, expected_lines",
+    [
+        (
+            [{"name": "light", "value": 1}, {"name": "dark", "value": 1}],
+            [
+                "Odds for Light 1 Dark 1:",
+                "6: 30.6% (Light 13.9%, Dark 16.7%)",
+                "5: 25.0% (Light 11.1%, Dark 13.9%)",
+                "4: 19.4% (Light 8.3%, Dark 11.1%)",
+                "3: 13.9% (Light 5.6%, Dark 8.3%)",
+                "2: 8.3% (Light 2.8%, Dark 5.6%)",
+                "1: 2.8% (Light 0.0%, Dark 2.8%)",
+                "Dark die highest: 58.3%",
+            ],
+        ),
+        ([], ["🎲 No dice to roll."]),
+        ([{"name": "dark", "value": -2}], ["🎲 Dice counts must not be negative."]),
+    ],
+    ids=["one_light_one_dark", "no_options", "negative"],
+)
+async def test_odds_command(options_data, expected_lines):
+    responses = []
+
+    async def fake_send_message(message):
+        responses.append(message)
+
+    fake_interaction = Interaction.from_payload(
+        {"type": 2, "data": {"name": "odds", "options": options_data}},
+        response=SimpleNamespace(send_message=fake_send_message),
+    )
+
+    await odds_command.callback(fake_interaction)
+    assert responses == ["\n".join(expected_lines)]
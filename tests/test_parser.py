@@ -0,0 +1,73 @@
+import pytest
+
+from trophybot.parser import (
+    MAX_DICE,
+    MAX_LENGTH,
+    MAX_ROLLS,
+    ExpressionError,
+    Roll,
+    compile_expression,
+)
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2L3D", (Roll("pool", light=2, dark=3),)),
+        ("2l 3d", (Roll("pool", light=2, dark=3),)),
+        ("3D", (Roll("pool", dark=3),)),
+        ("4L", (Roll("pool", light=4),)),
+        ("0L2D", (Roll("pool", dark=2),)),
+        ("d6", (Roll("d6"),)),
+        ("gold 4", (Roll("gold", gold=4),)),
+        ("combat 3 vs 7", (Roll("combat", dark=3, endurance=7),)),
+        ("Combat 3 VS 7", (Roll("combat", dark=3, endurance=7),)),
+        ("2L3D x3", (Roll("pool", light=2, dark=3),) * 3),
+        ("1D×2", (Roll("pool", dark=1),) * 2),
+        (
+            "2L3D; gold 4 ;",
+            (Roll("pool", light=2, dark=3), Roll("gold", gold=4)),
+        ),
+    ],
+)
+def test_compile_expression(text, expected):
+    assert compile_expression(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        ";",
+        "banana",
+        "0L0D",
+        "gold 0",
+        "combat 0 vs 5",
+        "2L3D x0",
+        f"1D x{MAX_ROLLS + 1}",
+        f"{MAX_DICE + 1}D",
+        "gold 200; gold 200",
+        # Longer than int() accepts from a string.
+        "9" * 5000 + "L",
+        "d6 x" + "9" * 5000,
+        "combat 1 vs " + "9" * 5000,
+        "d6;" + " " * MAX_LENGTH,
+    ],
+)
+def test_invalid_expressions_raise(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)
+
+
+def test_dice_counts_every_die():
+    assert Roll("d6").dice == 1
+    assert Roll("pool", light=2, dark=3).dice == 5
+    assert Roll("combat", dark=4, endurance=9).dice == 4
+
+
+def test_compiled_expressions_are_cached():
+    compile_expression.cache_clear()
+    compile_expression("2L3D x5")
+    compile_expression("2L3D x5")
+    info = compile_expression.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
@@ -0,0 +1,57 @@
+import pstats
+import threading
+
+import pytest
+
+from trophybot.profiling import Profiler
+
+
+def _work():
+    return sum(i * i for i in range(20_000))
+
+
+def test_sample_picks_one_in_every():
+    profiler = Profiler("unused", every=3)
+    assert [profiler.sample() for _ in range(6)] == [
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    assert not any(Profiler("unused").sample() for _ in range(10))
+
+
+def test_cprofile_dump(tmp_path):
+    profiler = Profiler(str(tmp_path / "profiles"))
+    with profiler.capture() as path:
+        _work()
+    stats = pstats.Stats(path)
+    assert any(func[2] == "_work" for func in stats.stats)
+    assert profiler.written == 1
+
+
+def test_stack_samples(tmp_path):
+    profiler = Profiler(str(tmp_path), mode="stack", interval=0.0005)
+    with profiler.capture() as path:
+        threading.Event().wait(0.05)
+    lines = open(path).read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "test_profiling.py:test_stack_samples" in stack
+    assert int(count) > 0
+
+
+def test_one_capture_at_a_time(tmp_path):
+    profiler = Profiler(str(tmp_path))
+    with profiler.capture() as outer:
+        with profiler.capture() as inner:
+            pass
+    assert outer is not None and inner is None
+    assert profiler.written == 1
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        Profiler("unused", mode="perf")
@@ -0,0 +1,80 @@
+from trophybot.commands import Interaction
+from trophybot.ratelimit import RateLimiter, TokenBucketLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_interaction(user_id="u1", guild_id="g1"):
+    payload = {"type": 2, "data": {"name": "roll"}}
+    if guild_id is not None:
+        payload["guild_id"] = guild_id
+        payload["member"] = {"user": {"id": user_id}}
+    else:
+        payload["user"] = {"id": user_id}
+    return Interaction.from_payload(payload)
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=3, clock=clock)
+    assert [limiter.allow("u1") for _ in range(4)] == [True, True, True, False]
+    clock.now += 0.5  # one token back
+    assert limiter.allow("u1") is True
+    assert limiter.allow("u1") is False
+    clock.now += 60  # refills to the burst size, not beyond
+    assert [limiter.allow("u1") for _ in range(4)] == [True, True, True, False]
+
+
+def test_buckets_are_independent_per_key():
+    limiter = TokenBucketLimiter(rate=1, burst=1, clock=FakeClock())
+    assert limiter.allow("u1") is True
+    assert limiter.allow("u1") is False
+    assert limiter.allow("u2") is True
+
+
+def test_least_recently_used_bucket_is_evicted():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_entries=2, clock=FakeClock())
+    limiter.allow("u1")
+    limiter.allow("u2")
+    limiter.allow("u1")  # u1 is now the most recently used
+    limiter.allow("u3")  # evicts u2
+    assert len(limiter) == 2
+    assert limiter.allow("u2") is True  # a fresh, full bucket; evicts u1
+    assert limiter.allow("u3") is False  # still held, still empty
+
+
+def test_user_limit_is_checked_before_guild():
+    clock = FakeClock()
+    limiter = RateLimiter(
+        user=TokenBucketLimiter(rate=1, burst=1, clock=clock),
+        guild=TokenBucketLimiter(rate=1, burst=2, clock=clock),
+    )
+    assert limiter.check(make_interaction("u1")) is None
+    # u1 is limited without spending the guild's remaining token...
+    assert limiter.check(make_interaction("u1")) == "user"
+    assert limiter.check(make_interaction("u2")) is None
+    # ...which u2 used, so the guild is now exhausted for everyone.
+    assert limiter.check(make_interaction("u3")) == "guild"
+    # Direct messages have no guild and are only limited per user.
+    assert limiter.check(make_interaction("u4", guild_id=None)) is None
+
+
+def test_from_env_reads_limits_and_disables_zero_rates():
+    limiter = RateLimiter.from_env(
+        {
+            "TROPHYBOT_USER_RATE": "0.5",
+            "TROPHYBOT_USER_BURST": "2",
+            "TROPHYBOT_GUILD_RATE": "0",
+            "TROPHYBOT_RATELIMIT_ENTRIES": "7",
+        }
+    )
+    assert (limiter.user.rate, limiter.user.burst) == (0.5, 2)
+    assert limiter.user.max_entries == 7
+    assert limiter.guild is None
+    assert RateLimiter().check(make_interaction()) is None
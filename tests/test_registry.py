@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from trophybot.commands import (
+    Command,
+    CommandRegistry,
+    Interaction,
+    Option,
+    Response,
+    registry,
+)
+
+
+def test_interaction_from_payload_parses_options_once():
+    interaction = Interaction.from_payload(
+        {
+            "type": 2,
+            "data": {
+                "name": "roll",
+                "options": [
+                    {"name": "light", "type": 4, "value": 2},
+                    {"name": "dark", "type": 4, "value": 3},
+                ],
+            },
+        }
+    )
+    assert interaction.name == "roll"
+    assert interaction.options == {"light": 2, "dark": 3}
+    with pytest.raises(AttributeError):
+        interaction.extra = 1
+
+
+def test_interaction_from_payload_without_options():
+    interaction = Interaction.from_payload({"type": 2, "data": {"name": "roll"}})
+    assert interaction.options == {}
+
+
+@pytest.mark.asyncio
+async def test_dispatch_routes_by_name():
+    local_registry = CommandRegistry()
+
+    @local_registry.command("echo", "Echo the word", [Option("word", "Word", 3)])
+    async def _echo(interaction):
+        return await interaction.response.send_message(interaction.options["word"])
+
+    interaction = Interaction("echo", {"word": "hi"})
+    assert await local_registry.dispatch(interaction) == {
+        "type": 4,
+        "data": {"content": "hi"},
+    }
+
+
+@pytest.mark.asyncio
+async def test_dispatch_unknown_and_schema_only_commands():
+    local_registry = CommandRegistry()
+    local_registry.add(Command("later", "Not implemented yet"))
+    sent = []
+
+    async def send_message(content):
+        sent.append(content)
+
+    response = SimpleNamespace(send_message=send_message)
+    await local_registry.dispatch(Interaction("later", {}, response))
+    await local_registry.dispatch(Interaction("missing", {}, response))
+    assert sent == ["Unknown command: later", "Unknown command: missing"]
+
+
+def test_schemas_cover_bot_commands():
+    import trophybot.bot  # noqa: F401
+
+    schemas = {schema["name"]: schema for schema in registry.schemas()}
+    assert set(schemas) >= {"roll", "odds", "combat", "gold"}
+    assert schemas["roll"]["options"][0] == {
+        "name": "light",
+        "description": "Number of light dice",
+        "type": 4,
+        "required": False,
+        "max_value": 10_000,
+    }
+
+
+def test_response_has_no_instance_dict():
+    assert not hasattr(Response(), "__dict__")
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import trophybot.dice
+import trophybot.rules
+import trophybot.simulate
+from trophybot.simulate import Simulation, outcomes, run, summary
+
+
+def _outcome_probability(rows, **match):
+    return sum(
+        row["probability"]
+        for row in rows
+        if all(row[key] == value for key, value in match.items())
+    )
+
+
+@pytest.mark.parametrize(
+    "sim",
+    [
+        Simulation("risk", light=2, dark=1),
+        Simulation("risk", light=3),
+        Simulation("risk", dark=2),
+        Simulation("combat", dark=1, endurance=4),
+        Simulation("combat", dark=4, endurance=9),
+        Simulation("gold", gold=3),
+    ],
+)
+def test_numpy_statistics_match_python(sim):
+    np = pytest.importorskip("numpy")
+    faces = np.random.default_rng(7).integers(1, 7, size=(500, sim.dice))
+    fast = trophybot.simulate.statistics_numpy(sim, faces.astype(np.uint8))
+    for row, expected in zip(faces.tolist(), fast.tolist()):
+        backend = trophybot.dice.ReplayBackend(row)
+        assert trophybot.simulate.statistic_python(sim, backend) == expected
+
+
+def test_risk_matches_exact_odds():
+    sim = Simulation("risk", light=2, dark=1)
+    rows = outcomes(sim, run(sim, 200_000, seed=1))
+    for row in rows:
+        assert row["probability"] == pytest.approx(row["exact"], abs=0.005)
+    assert summary(sim, rows)["dark_probability"] == pytest.approx(
+        _outcome_probability(rows, colour="Dark")
+    )
+
+
+def test_combat_uses_the_bot_rules():
+    sim = Simulation("combat", dark=3, endurance=9)
+    rows = outcomes(sim, run(sim, 10_000, seed=2))
+    assert rows
+    for row in rows:
+        assert row["defeated"] == trophybot.rules.defeats(row["total"], 9)
+        assert 2 <= row["total"] <= 12
+    assert sum(row["count"] for row in rows) == 10_000
+
+
+def test_same_seed_same_counts():
+    sim = Simulation("gold", gold=4)
+    assert run(sim, 5_000, seed=3) == run(sim, 5_000, seed=3)
+
+
+def test_python_fallback(monkeypatch):
+    monkeypatch.setattr("trophybot.simulate._numpy", lambda: None)
+    sim = Simulation("gold", gold=2)
+    rows = outcomes(sim, run(sim, 2_000, seed=4))
+    assert {row["gold"] for row in rows} <= set(range(2, 13))
+    assert summary(sim, rows)["mean_gold"] == pytest.approx(7, abs=0.3)
+
+
+def test_workers_split_the_rolls():
+    sim = Simulation("risk", dark=2)
+    counts = run(sim, 4_000, workers=2, seed=5)
+    assert sum(counts) == 4_000
+
+
+def test_main_writes_json(capsys):
+    trophybot.simulate.main(
+        ["combat", "--dark", "2", "--endurance", "7", "--rolls", "1000"]
+        + ["--workers", "1", "--seed", "6", "--format", "json"]
+    )
+    out, err = capsys.readouterr()
+    result = json.loads(out)
+    assert result["rolls"] == 1000
+    assert result["simulation"]["mode"] == "combat"
+    assert 0 < result["summary"]["defeat_probability"] < 1
+    assert "rolls/s" in err
+
+
+def test_main_writes_csv(tmp_path, capsys):
+    output = tmp_path / "risk.csv"
+    trophybot.simulate.main(
+        ["risk", "--light", "1", "--rolls", "100", "--workers", "1"]
+        + ["--output", str(output)]
+    )
+    lines = output.read_text().splitlines()
+    assert lines[0] == "colour,face,count,probability,exact"
+    assert len(lines) == 13
+
+
+def test_main_rejects_empty_pools():
+    with pytest.raises(SystemExit):
+        trophybot.simulate.main(["risk", "--light", "0", "--dark", "0"])
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+from tests.test_interactions import TEST_PK
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Import + init budget for the Cloud Run entry point, in milliseconds.
+STARTUP_BUDGET_MS = float(os.environ.get("TROPHYBOT_STARTUP_BUDGET_MS", "1000"))
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{target}
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"ms": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _probe(target, **env):
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(target=target)],
+        cwd=ROOT,
+        env=dict(os.environ, DISCORD_PUBLIC_KEY=TEST_PK, **env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def test_flask_startup_within_budget():
+    best = min(_probe("import main; main.app")["ms"] for _ in range(3))
+    assert best < STARTUP_BUDGET_MS, (
+        f"Start-up took {best:.0f} ms, budget is {STARTUP_BUDGET_MS:.0f} ms"
+    )
+
+
+def test_asgi_startup_skips_flask_and_deferred_dependencies():
+    modules = set(_probe("import asgi", K_SERVICE="trophybot")["modules"])
+    assert "nacl.signing" in modules
+    assert "trophybot.bot" in modules
+    assert not {"flask", "requests", "dotenv"} & modules
+
+
+def test_malformed_key_fails_at_startup():
+    result = subprocess.run(
+        [sys.executable, "-c", "import main"],
+        cwd=ROOT,
+        env=dict(os.environ, DISCORD_PUBLIC_KEY="abcd"),
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode != 0
+    assert "DISCORD_PUBLIC_KEY is malformed" in result.stderr
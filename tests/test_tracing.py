@@ -0,0 +1,31 @@
+import re
+
+from trophybot import tracing
+
+
+def test_span_outside_a_trace_is_a_no_op():
+    with tracing.span("verify") as first, tracing.span("parse") as second:
+        pass
+    assert first is second
+
+
+def test_spans_of_the_same_name_are_summed():
+    with tracing.trace() as trace:
+        with tracing.span("dice"):
+            pass
+        with tracing.span("verify"):
+            pass
+        with tracing.span("dice"):
+            pass
+    assert list(trace.durations) == ["dice", "verify"]
+    assert trace.total >= sum(trace.durations.values())
+    assert re.fullmatch(
+        r"dice;dur=\d+\.\d{3}, verify;dur=\d+\.\d{3}, total;dur=\d+\.\d{3}",
+        trace.header(),
+    )
+
+
+def test_trace_ends_with_its_block():
+    with tracing.trace():
+        pass
+    assert tracing._current.get() is None